@@ -0,0 +1,69 @@
+"""
+Peak memory of in-memory vs chunked aggregation on a large synthetic CSV.
+
+Run from the server-experiment directory:
+    python benchmarks/chunked_aggregation.py [rows]
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from services.datasets import RunningStats  # noqa: E402
+
+COLUMNS = 10
+CHUNK_ROWS = 100_000
+
+
+def write_synthetic(path: Path, rows: int):
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, CHUNK_ROWS):
+        count = min(CHUNK_ROWS, rows - start)
+        chunk = pd.DataFrame(rng.normal(size=(count, COLUMNS)), columns=[f"c{i}" for i in range(COLUMNS)])
+        chunk.to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def in_memory(path: Path):
+    column = pd.read_csv(path)["c0"]
+    return column.mean(), column.std()
+
+
+def chunked(path: Path):
+    stats = RunningStats()
+    for chunk in pd.read_csv(path, usecols=["c0"], chunksize=CHUNK_ROWS):
+        stats.update(chunk["c0"].to_numpy())
+    return stats.result("mean"), stats.result("std")
+
+
+def measure(func, path: Path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic.csv"
+        write_synthetic(path, rows)
+        print(f"{rows} rows x {COLUMNS} columns, {path.stat().st_size / 1024 / 1024:.0f} MB")
+        memory_result, memory_time, memory_peak = measure(in_memory, path)
+        chunk_result, chunk_time, chunk_peak = measure(chunked, path)
+        assert np.allclose(memory_result, chunk_result, rtol=1e-12)
+        print(f"{'mode':<12}{'seconds':>10}{'peak MB':>10}")
+        print(f"{'in-memory':<12}{memory_time:>10.2f}{memory_peak:>10.1f}")
+        print(f"{'chunked':<12}{chunk_time:>10.2f}{chunk_peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Cold vs warm reads of the bundled datasets through the columnar cache.
+
+Run from the server-experiment directory:
+    python benchmarks/execution_cache.py
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from services.datasets import ColumnCache  # noqa: E402
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data"
+REPEAT = 20
+
+
+def timed(func, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    print(f"{'dataset':<20}{'column':<16}{'read_csv ms':>14}{'cold ms':>12}{'warm ms':>12}")
+    for csv_path in sorted(DATA_PATH.glob("*.csv")):
+        column = pd.read_csv(csv_path, nrows=0).columns[1]
+
+        def read_csv():
+            return pd.read_csv(csv_path)[column].mean()
+
+        with tempfile.TemporaryDirectory() as cache_path:
+            cache = ColumnCache(str(DATA_PATH), cache_path)
+
+            def cold():
+                cache.invalidate(csv_path.name)
+                return np.nanmean(cache.get_column(csv_path.name, column))
+
+            def warm():
+                return np.nanmean(cache.get_column(csv_path.name, column))
+
+            assert np.isclose(read_csv(), cold())
+            print(f"{csv_path.name:<20}{column:<16}{timed(read_csv):>14.2f}{timed(cold):>12.2f}{timed(warm):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Database and converter calls of the filesystem watcher for typical event storms, applying
+every event at once vs coalescing the events of a file into one net change, and writing
+the resulting database operations in bulk.
+
+Run from the server-experiment directory:
+    python benchmarks/watcher_events.py [files]
+"""
+
+import logging
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from services.file_watcher import FileSystemSyncHandler  # noqa: E402
+
+USER = "bench"
+
+
+class Store:
+    """In-memory stand-in for the experiment and workflow handlers and the converter, counting calls."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.entries = {}
+        self.keys = {}
+        self.next_id = 0
+        # changes are applied on several threads
+        self.lock = threading.RLock()
+
+    def _call(self, kind):
+        with self.lock:
+            self.calls[kind] += 1
+
+    # converter
+    def dsl2experiment(self, name, content):
+        self._call("convert")
+        return [{"name": name, "content": content}]
+
+    def dsl2workflow(self, name, content):
+        self._call("convert")
+        return {"name": name, "content": content}
+
+    def dsl2experiments(self, documents):
+        return [{"success": True, "data": self.dsl2experiment(name, content), "error": None} for name, content in documents]
+
+    # database
+    def _find(self, username, name):
+        return self.entries.get((username, name))
+
+    def find_experiment_id(self, username, name):
+        self._call("db read")
+        entry = self._find(username, name)
+        return entry["id"] if entry else None
+
+    # write operations are plain tuples, applied by bulk_write_experiments
+    def find_experiment_ids(self, username, names):
+        self._call("db read")
+        with self.lock:
+            return {name: self.entries[(username, name)]["id"] for name in names if (username, name) in self.entries}
+
+    def upsert_experiment_operation(self, username, name, steps, entry_id=None):
+        return ("upsert", username, name, entry_id, steps)
+
+    def rename_experiment_operation(self, username, old_name, new_name, entry_id=None):
+        return ("rename", username, old_name, entry_id, new_name)
+
+    def delete_experiment_operation(self, username, name, entry_id=None):
+        return ("delete", username, name, entry_id, None)
+
+    def bulk_write_experiments(self, operations):
+        self._call("db write")
+        with self.lock:
+            self.calls["db operation"] += len(operations)
+            for kind, username, name, entry_id, value in operations:
+                key = self.keys.get(entry_id, (username, name))
+                entry = self.entries.pop(key, None)
+                if kind == "upsert" and entry is None:
+                    self.next_id += 1
+                    entry = {"id": entry_id or self.next_id}
+                if kind == "upsert":
+                    entry.update(name=name, data=value)
+                elif kind == "rename" and entry is not None:
+                    entry["name"] = value
+                if kind == "delete" or entry is None:
+                    self.keys.pop(entry_id, None)
+                    continue
+                self.entries[(username, entry["name"])] = entry
+                self.keys[entry["id"]] = (username, entry["name"])
+
+    def add(self, username, name, data):
+        """Store an entry directly, as if it had been imported before."""
+        self.next_id += 1
+        self.entries[(username, name)] = {"id": self.next_id, "name": name, "data": data}
+        self.keys[self.next_id] = (username, name)
+
+    def state(self):
+        return {key: entry["data"] for key, entry in self.entries.items()}
+
+
+def storms(directory: Path, files: int):
+    """Events of common operations, replayed after the files are in their final state."""
+    def path(name):
+        return str(directory / f"{name}.xxp")
+
+    events = []
+    for i in range(files):
+        # editor save: several writes of the same file
+        events += [FileModifiedEvent(path(f"edit{i}"))] * 3
+        # atomic save: the file is replaced
+        events += [FileDeletedEvent(path(f"atomic{i}")), FileCreatedEvent(path(f"atomic{i}")), FileModifiedEvent(path(f"atomic{i}"))]
+        # new file
+        events += [FileCreatedEvent(path(f"new{i}")), FileModifiedEvent(path(f"new{i}")), FileModifiedEvent(path(f"new{i}"))]
+        # rename, and a rename reported as delete + create as on macOS
+        events += [FileMovedEvent(path(f"old{i}"), path(f"renamed{i}")), FileModifiedEvent(path(f"renamed{i}"))]
+        # temporary file, gone before it matters
+        events += [FileCreatedEvent(path(f"tmp{i}")), FileModifiedEvent(path(f"tmp{i}")), FileDeletedEvent(path(f"tmp{i}"))]
+        # checkout: every file written twice
+        events += [FileModifiedEvent(path(f"checkout{i}")), FileModifiedEvent(path(f"checkout{i}"))]
+    mac_events = [
+        event
+        for i in range(files)
+        for event in (FileDeletedEvent(path(f"macold{i}")), FileCreatedEvent(path(f"macnew{i}")), FileModifiedEvent(path(f"macnew{i}")))
+    ]
+    return events, mac_events
+
+
+def setup(directory: Path, store: Store, files: int):
+    for i in range(files):
+        for name in ("edit", "atomic", "old", "checkout", "macold"):
+            store.add(USER, f"{name}{i}", [])
+        for name in ("edit", "atomic", "new", "renamed", "checkout", "macnew"):
+            (directory / f"{name}{i}.xxp").write_text(f"experiment {name}{i} {{}}\n", encoding="utf-8")
+
+
+def replay(debounce_seconds: float, files: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / USER / "experiments"
+        directory.mkdir(parents=True)
+        store = Store()
+        setup(directory, store, files)
+        store.calls.clear()
+        # applying every event at once also writes every operation at once
+        handler = FileSystemSyncHandler(store, store, None, store, debounce_seconds=debounce_seconds,
+                                        write_window_seconds=0.05 if debounce_seconds else 0)
+        handler.start()
+        events, mac_events = storms(directory, files)
+        start = time.perf_counter()
+        for event in events:
+            handler.dispatch(event)
+        # the macOS renames are one burst per directory, replayed one at a time
+        for i in range(0, len(mac_events), 3):
+            for event in mac_events[i:i + 3]:
+                handler.dispatch(event)
+            handler.coalescer.flush()
+        handler.stop()
+        elapsed = time.perf_counter() - start
+        return len(events) + len(mac_events), store.calls, elapsed, store.state(), handler.coalescer.get_stats()
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    logging.disable(logging.CRITICAL)
+    events, direct, direct_time, direct_state, _ = replay(0, files)
+    _, coalesced, coalesced_time, coalesced_state, stats = replay(60, files)
+    print(f"{events} events, {stats['changes']} net changes")
+    print(f"{'':<14}{'direct':>10}{'coalesced':>12}{'saved':>8}")
+    for kind in ("convert", "db read", "db operation", "db write"):
+        saved = 1 - coalesced[kind] / direct[kind] if direct[kind] else 0
+        print(f"{kind:<14}{direct[kind]:>10}{coalesced[kind]:>12}{saved:>8.0%}")
+    print(f"{'seconds':<14}{direct_time:>10.3f}{coalesced_time:>12.3f}")
+    # the direct replay recreates the macOS renames as new entries, the coalesced one renames them
+    same = {key: value for key, value in direct_state.items() if not key[1].startswith("mac")}
+    print("same final state:", same == {key: value for key, value in coalesced_state.items() if not key[1].startswith("mac")})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Polling a large workspace for changes: the cost of one poll with watchdog's generic
+snapshot (a stat of every file and directory) vs the workspace polling emitter, and how
+long the emitter takes to report each kind of change.
+
+Run from the server-experiment directory:
+    python benchmarks/watcher_polling.py [files] [users]
+"""
+
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+from watchdog.observers.api import ObservedWatch
+from watchdog.utils.dirsnapshot import DirectorySnapshot
+
+from workspace_reconcile import write_workspace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from services.file_watcher import WorkspacePollingEmitter  # noqa: E402
+
+
+def cpu(function, repeat=5):
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - started) / repeat
+
+
+def wait_for(events: queue.Queue, kind, path, timeout=30):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            event, _ = events.get(timeout=0.05)
+        except queue.Empty:
+            continue
+        if isinstance(event, kind) and path in (event.src_path, getattr(event, "dest_path", None)):
+            return time.perf_counter() - started
+    return None
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = Path(tmp) / "workspace"
+        write_workspace(workspace, files, users)
+        print(f"{files} files of {users} users")
+
+        snapshot = cpu(lambda: DirectorySnapshot(str(workspace), recursive=True))
+        print(f"  watchdog snapshot poll:      {snapshot * 1000:8.1f} ms cpu")
+
+        events = queue.Queue()
+        sweep_seconds = 60
+        emitter = WorkspacePollingEmitter(events, ObservedWatch(str(workspace), recursive=True),
+                                          min_interval=1, max_interval=10, sweep_seconds=sweep_seconds)
+        emitter.on_thread_start()
+        for interval in (1, 10):
+            emitter._interval = interval
+            idle = cpu(lambda: emitter._poll(emit=True))
+            stats = emitter.get_stats()["last_poll_stats"]
+            print(f"  workspace poll, idle, {interval:>2}s:  {idle * 1000:8.1f} ms cpu, {stats} stat calls "
+                  f"({idle / interval * 100:.2f}% of a core)")
+
+        # live: a short sweep so that writes in place show up within seconds
+        emitter = WorkspacePollingEmitter(events, ObservedWatch(str(workspace), recursive=True),
+                                          min_interval=0.5, max_interval=2, sweep_seconds=5)
+        emitter.start()
+        time.sleep(1)
+        directory = workspace / "user1" / "experiments"
+        new, old, renamed = directory / "new.xxp", directory / "exp1.xxp", directory / "renamed.xxp"
+        hot = directory / "exp101.xxp"
+        cold = workspace / "user2" / "experiments" / "exp2.xxp"
+
+        new.write_text("experiment new { }\n", encoding="utf-8")
+        print(f"  created:                      {wait_for(events, FileCreatedEvent, str(new)):.2f}s")
+        with open(hot, "a", encoding="utf-8") as f:
+            f.write("// in place, in a directory that just changed\n")
+        print(f"  written in place, hot dir:    {wait_for(events, FileModifiedEvent, str(hot)):.2f}s")
+        os.rename(old, renamed)
+        print(f"  renamed:                      {wait_for(events, FileMovedEvent, str(renamed)):.2f}s")
+        new.unlink()
+        print(f"  deleted:                      {wait_for(events, FileDeletedEvent, str(new)):.2f}s")
+        with open(cold, "a", encoding="utf-8") as f:
+            f.write("// in place, in an idle directory\n")
+        print(f"  written in place, idle dir:   {wait_for(events, FileModifiedEvent, str(cold)):.2f}s (sweep of 5s)")
+        emitter.stop()
+        emitter.join()
+        print(f"  emitter: {emitter.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
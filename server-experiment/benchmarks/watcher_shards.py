@@ -0,0 +1,104 @@
+"""
+Watching a workspace whose users keep other directories next to their experiments and
+workflows (results, checkouts): watchdog's recursive observer vs the scoped watches, with
+the inotify watches each takes, the time to start and the CPU spent on a burst of writes
+outside the experiments and workflows directories.
+
+Run from the server-experiment directory:
+    python benchmarks/watcher_shards.py [users] [directories per user] [shards]
+"""
+
+import glob
+import logging
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from services.file_watcher import ScopedInotifyObserver  # noqa: E402
+
+
+class Counter(FileSystemEventHandler):
+    def __init__(self):
+        self.events = 0
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        with self._lock:
+            self.events += 1
+
+
+def write_workspace(workspace: Path, users: int, directories: int):
+    for user in range(users):
+        for file_type in ("experiments", "workflows"):
+            (workspace / f"user{user}" / file_type).mkdir(parents=True)
+        for directory in range(directories):
+            (workspace / f"user{user}" / "results" / f"run{directory}").mkdir(parents=True)
+
+
+def inotify_watches() -> int:
+    """Number of inotify watches of this process."""
+    watches = 0
+    for path in glob.glob("/proc/self/fdinfo/*"):
+        try:
+            with open(path) as f:
+                watches += sum(1 for line in f if line.startswith("inotify"))
+        except OSError:
+            continue
+    return watches
+
+
+def burst(workspace: Path, users: int, files: int, name: str):
+    for i in range(files):
+        path = workspace / f"user{i % users}" / "results" / "run0" / f"{name}{i}.csv"
+        path.write_text("1,2,3\n", encoding="utf-8")
+    for i in range(files // 10):
+        path = workspace / f"user{i % users}" / "experiments" / f"{name}{i}.xxp"
+        path.write_text(f"experiment {name}{i} {{ }}\n", encoding="utf-8")
+
+
+def measure(label: str, observers, workspace: Path, users: int, name: str):
+    counter = Counter()
+    watches = inotify_watches()
+    started = time.perf_counter()
+    for observer, recursive in observers:
+        observer.schedule(counter, str(workspace), recursive=recursive)
+        observer.start()
+    startup = time.perf_counter() - started
+    watches = inotify_watches() - watches
+
+    cpu_started = time.process_time()
+    burst(workspace, users, 10_000, name)
+    time.sleep(1)
+    cpu = time.process_time() - cpu_started
+    print(f"  {label:<22} {watches:>7} watches, started in {startup:6.2f}s, burst {cpu:5.2f}s cpu, "
+          f"{counter.events} events to the handler")
+    for observer, _ in observers:
+        stats = observer.get_stats() if hasattr(observer, "get_stats") else None
+        if stats:
+            print(f"    {stats}")
+        observer.stop()
+        observer.join()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    directories = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    shards = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = Path(tmp) / "workspace"
+        write_workspace(workspace, users, directories)
+        print(f"{users} users with {directories} result directories each, 10000 result files and 1000 experiments written")
+        measure("watchdog, recursive", [(Observer(), True)], workspace, users, "a")
+        measure(f"scoped, {shards} shards", [(ScopedInotifyObserver(shard, shards), False) for shard in range(shards)],
+                workspace, users, "b")
+
+
+if __name__ == "__main__":
+    main()
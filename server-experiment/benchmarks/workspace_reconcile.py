@@ -0,0 +1,77 @@
+"""
+Startup reconciliation of a large workspace: a first start with an empty index, a start
+without changes, and a start after changes made while the service was down.
+
+Run from the server-experiment directory:
+    python benchmarks/workspace_reconcile.py [files] [users]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from watcher_events import Store
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+from services.file_watcher import ContentIndex, FileSystemSyncHandler, WorkspaceReconciler  # noqa: E402
+
+
+def write_workspace(workspace: Path, files: int, users: int):
+    for user in range(users):
+        (workspace / f"user{user}" / "experiments").mkdir(parents=True)
+    for i in range(files):
+        path = workspace / f"user{i % users}" / "experiments" / f"exp{i}.xxp"
+        path.write_text(f"experiment exp{i} {{ }}\n", encoding="utf-8")
+
+
+def change_workspace(workspace: Path, files: int, users: int):
+    """Modify, touch, delete and add 1% of the files each."""
+    def path(name, i):
+        return workspace / f"user{i % users}" / "experiments" / f"{name}{i}.xxp"
+
+    for i in range(0, files - 2, 100):
+        path("exp", i).write_text(f"experiment exp{i} {{ changed }}\n", encoding="utf-8")
+        os.utime(path("exp", i + 1), ns=(time.time_ns(), time.time_ns() + 10**9))
+        path("exp", i + 2).unlink()
+        path("new", i).write_text(f"experiment new{i} {{ }}\n", encoding="utf-8")
+
+
+def reconcile(workspace: Path, index: ContentIndex, store: Store):
+    handler = FileSystemSyncHandler(store, store, None, store, content_index=index)
+    store.calls.clear()
+    report = WorkspaceReconciler(str(workspace), handler, index).run()
+    print(
+        f"  {report['duration']:.2f}s (scan {report['scan_seconds']:.2f}s, apply {report['apply_seconds']:.2f}s): "
+        f"{report['files']} files, {report['unchanged']} unchanged, {report['added']} added, "
+        f"{report['modified']} modified, {report['removed']} removed; "
+        f"{store.calls['convert']} conversions, {store.calls['db operation']} db writes in {store.calls['db write']} bulk writes"
+    )
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        workspace = Path(tmp) / "workspace"
+        start = time.perf_counter()
+        write_workspace(workspace, files, users)
+        print(f"{files} files of {users} users written in {time.perf_counter() - start:.1f}s")
+        index = ContentIndex(str(Path(tmp) / "index.sqlite3"))
+        store = Store()
+
+        print("first start, empty index:")
+        reconcile(workspace, index, store)
+        print("restart without changes:")
+        reconcile(workspace, index, store)
+        change_workspace(workspace, files, users)
+        print("restart after 1% modified, touched, removed and added:")
+        reconcile(workspace, index, store)
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from flask import Flask, request, g
 from flask_cors import CORS, cross_origin
 from handlers import userAuthHandler, experimentHandler, workflowHandler, fileSystemHandler, convertorHandler
-from controllers import experiments, categories, tasks, workflows
+from controllers import experiments, categories, tasks, workflows, datasets
 from services.file_watcher import initialize_watcher, get_watcher
+from services.conversion_jobs import initialize_job_queue
+from services.experiment_runs import initialize_experiment_runner
+from handlers.convertorHandler import ConvertorHandler
 from config.logging_config import setup_logging
 import atexit
 
@@ -20,6 +23,7 @@ app.register_blueprint(experiments, url_prefix=f"{BASE_PREFIX}/experiments")
 app.register_blueprint(categories, url_prefix=f"{BASE_PREFIX}/categories")
 app.register_blueprint(tasks, url_prefix=f"{BASE_PREFIX}/tasks")
 app.register_blueprint(workflows, url_prefix=f"{BASE_PREFIX}/workflows")
+app.register_blueprint(datasets, url_prefix=f"{BASE_PREFIX}/datasets")
 
 # Initialize and start the filesystem watcher
 watcher = initialize_watcher(
@@ -31,11 +35,29 @@ watcher = initialize_watcher(
 )
 watcher.start()
 
+# Initialize and start the background conversion jobs, each job gets its own convertor
+job_queue = initialize_job_queue(
+    jobs_path="../jobs",
+    convertor_factory=ConvertorHandler,
+)
+job_queue.start()
+
+# Initialize and start the experiment space runner, progress is stored on the experiment steps
+experiment_runner = initialize_experiment_runner(
+    workflow_loader=lambda workflow_id: workflowHandler.get_workflow(workflow_id)["graphical_model"],
+    on_update=experimentHandler.update_experiment_graphical_model,
+)
+experiment_runner.start()
+
 # Register cleanup on app shutdown
 @atexit.register
 def cleanup():
     if watcher:
         watcher.stop()
+    if job_queue:
+        job_queue.stop()
+    if experiment_runner:
+        experiment_runner.stop()
 
 # there's a bug in flask_cors that headers is None when using before_request for OPTIONS request
 @app.before_request
@@ -67,6 +89,38 @@ def index():
     return {"message": "Experiment service is running."}, 200
 
 
+@app.route(f"{BASE_PREFIX}/workspace/sync", methods=["OPTIONS", "POST"])
+@cross_origin()
+def sync_workspace():
+    """
+    Re-import all workflow and experiment files of the user in batches,
+    e.g. after files were copied into or checked out in the workspace.
+    The resync runs in the background, GET on the same path reports its progress.
+    """
+    watcher = get_watcher()
+    if not watcher or not watcher.get_status()["running"]:
+        return {"error": "Error: Watcher not running", "message": "Filesystem watcher is not running"}, 503
+
+    resync = watcher.submit_resync(g.username)
+    return {"message": "workspace sync submitted", "data": {"sync": resync}}, 202
+
+
+@app.route(f"{BASE_PREFIX}/workspace/sync", methods=["GET"])
+@cross_origin()
+def get_workspace_sync():
+    """
+    Status of the last workspace sync of the user, with the files that failed once it is done.
+    """
+    watcher = get_watcher()
+    if not watcher:
+        return {"error": "Error: Watcher not running", "message": "Filesystem watcher is not running"}, 503
+
+    resync = watcher.get_resync(g.username)
+    if resync is None:
+        return {"error": "Error: No workspace sync", "message": "The workspace was not synchronized"}, 404
+    return {"data": {"sync": resync}}, 200
+
+
 @app.route(f"{BASE_PREFIX}/health/watcher", methods=["GET"])
 @cross_origin()
 def watcher_health():
@@ -2,10 +2,12 @@ from .experiments_controller import experiments
 from .categories_controller import categories
 from .tasks_controller import tasks
 from .workflows_controller import workflows
+from .datasets_controller import datasets
 
 
 __all__ = [
     "categories",
+    "datasets",
     "experiments",
     "tasks",
     "workflows",
@@ -0,0 +1,115 @@
+from flask import Blueprint, request
+from flask_cors import cross_origin
+from handlers import executionHandler
+from services.datasets import UploadConflict, UploadError
+
+datasets = Blueprint("datasets", __name__)
+
+ERROR_NOT_FOUND = "Error: Not found"
+MAX_PREVIEW_ROWS = 1000
+
+
+@datasets.route("/all", methods=["GET"])
+@cross_origin()
+def get_datasets():
+    datasets = executionHandler.list_datasets()
+    return {
+        "message": "datasets retrieved",
+        "data": {"datasets": datasets},
+    }, 200
+
+
+@datasets.route("/refresh", methods=["OPTIONS", "POST"])
+@cross_origin()
+def refresh_datasets():
+    changes = executionHandler.refresh_datasets()
+    return {"message": "datasets refreshed", "data": changes}, 200
+
+
+@datasets.route("/preview/<path:file_name>", methods=["GET"])
+@cross_origin()
+def preview_dataset(file_name):
+    head_rows = min(request.args.get("rows", 20, type=int), MAX_PREVIEW_ROWS)
+    sample_rows = min(request.args.get("sample", 20, type=int), MAX_PREVIEW_ROWS)
+    preview = executionHandler.preview_dataset(file_name, head_rows, sample_rows, request.args.get("seed", type=int))
+    if preview is None:
+        return {"error": ERROR_NOT_FOUND, "message": "dataset not found"}, 404
+    return {
+        "message": "dataset preview retrieved",
+        "data": {"preview": preview},
+    }, 200
+
+
+@datasets.route("/uploads", methods=["OPTIONS", "POST"])
+@cross_origin()
+def create_upload():
+    body = request.get_json(silent=True) or {}
+    try:
+        upload = executionHandler.create_upload(body.get("name"), body.get("size"), body.get("checksum"))
+    except UploadConflict as e:
+        return {"error": "Error: Conflict", "message": str(e)}, 409
+    except UploadError as e:
+        return {"error": "Error: Bad request", "message": str(e)}, 400
+    return {"message": "upload created", "data": {"upload": upload}}, 201
+
+
+@datasets.route("/uploads/<upload_id>", methods=["GET"])
+@cross_origin()
+def get_upload(upload_id):
+    upload = executionHandler.get_upload(upload_id)
+    if not upload:
+        return {"error": ERROR_NOT_FOUND, "message": "upload not found"}, 404
+    return {"message": "upload retrieved", "data": {"upload": upload}}, 200
+
+
+@datasets.route("/uploads/<upload_id>/chunks", methods=["OPTIONS", "PUT"])
+@cross_origin()
+def write_upload_chunk(upload_id):
+    offset = request.args.get("offset", type=int)
+    if offset is None or request.content_length is None:
+        return {"error": "Error: Bad request", "message": "offset and Content-Length are required"}, 400
+    try:
+        upload = executionHandler.write_upload_chunk(
+            upload_id, offset, request.stream, request.content_length, request.headers.get("X-Content-SHA256")
+        )
+    except UploadConflict as e:
+        return {"error": "Error: Conflict", "message": str(e)}, 409
+    except UploadError as e:
+        return {"error": "Error: Bad request", "message": str(e)}, 400
+    except KeyError:
+        return {"error": ERROR_NOT_FOUND, "message": "upload not found"}, 404
+    return {"message": "chunk received", "data": {"upload": upload}}, 200
+
+
+@datasets.route("/uploads/<upload_id>/complete", methods=["OPTIONS", "POST"])
+@cross_origin()
+def complete_upload(upload_id):
+    try:
+        dataset = executionHandler.complete_upload(upload_id)
+    except UploadConflict as e:
+        return {"error": "Error: Conflict", "message": str(e)}, 409
+    except UploadError as e:
+        return {"error": "Error: Bad request", "message": str(e)}, 400
+    except KeyError:
+        return {"error": ERROR_NOT_FOUND, "message": "upload not found"}, 404
+    return {"message": "upload completed", "data": {"dataset": dataset}}, 200
+
+
+@datasets.route("/uploads/<upload_id>", methods=["DELETE"])
+@cross_origin()
+def abort_upload(upload_id):
+    if not executionHandler.abort_upload(upload_id):
+        return {"error": ERROR_NOT_FOUND, "message": "upload not found"}, 404
+    return {"message": "upload aborted"}, 200
+
+
+@datasets.route("/<path:file_name>", methods=["GET"])
+@cross_origin()
+def get_dataset(file_name):
+    dataset = executionHandler.get_dataset(file_name)
+    if not dataset:
+        return {"error": ERROR_NOT_FOUND, "message": "dataset not found"}, 404
+    return {
+        "message": "dataset retrieved",
+        "data": {"dataset": dataset},
+    }, 200
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, Response, g
+import json
+import queue
+from flask import Blueprint, request, Response, g, send_file
 from flask_cors import cross_origin
-from handlers import taskHandler, experimentHandler, convertorHandler
+from handlers import taskHandler, experimentHandler, convertorHandler, executionHandler
+from services.conversion_jobs import get_job_queue
+from services.experiment_runs import get_experiment_runner
 
 tasks = Blueprint("tasks", __name__)
 
@@ -89,3 +93,125 @@ def convert_to_source_model(exp_id):
     if not convert_res["success"]:
         return {"error": "Error converting model", "message": convert_res["error"]}, 500
     return {"message": "source model converted", "data": convert_res["data"]}, 200
+
+
+@tasks.route("/exp/execute/convert/<exp_id>/jobs", methods=["OPTIONS", "POST"])
+@cross_origin()
+def submit_conversion_job(exp_id):
+    if not experimentHandler.experiment_exists(exp_id):
+        return {"error": ERROR_NOT_FOUND, "message": "experiment not found"}, 404
+    job_queue = get_job_queue()
+    if not job_queue:
+        return {"error": "Error converting model", "message": "conversion queue is not running"}, 503
+    exp = experimentHandler.get_experiment(exp_id)
+    try:
+        job = job_queue.submit(exp)
+    except queue.Full:
+        return {"error": "Error converting model", "message": "conversion queue is full"}, 503
+    return {"message": "conversion job submitted", "data": {"job": job}}, 202
+
+
+@tasks.route("/exp/execute/convert/jobs/stats", methods=["GET"])
+@cross_origin()
+def get_conversion_job_stats():
+    job_queue = get_job_queue()
+    if not job_queue:
+        return {"error": "Error converting model", "message": "conversion queue is not running"}, 503
+    return {"message": "conversion queue stats retrieved", "data": job_queue.get_stats()}, 200
+
+
+@tasks.route("/exp/execute/convert/jobs/<job_id>", methods=["GET"])
+@cross_origin()
+def get_conversion_job(job_id):
+    job_queue = get_job_queue()
+    job = job_queue.get_job(job_id) if job_queue else None
+    if not job:
+        return {"error": ERROR_NOT_FOUND, "message": "conversion job not found"}, 404
+    return {"message": "conversion job retrieved", "data": {"job": job}}, 200
+
+
+@tasks.route("/exp/execute/convert/jobs/<job_id>/events", methods=["GET"])
+@cross_origin()
+def stream_conversion_job(job_id):
+    job_queue = get_job_queue()
+    job = job_queue.get_job(job_id) if job_queue else None
+    if not job:
+        return {"error": ERROR_NOT_FOUND, "message": "conversion job not found"}, 404
+
+    def events(job):
+        # server-sent events: one message per job update, a comment line keeps idle connections open
+        yield f"data: {json.dumps(job, default=str)}\n\n"
+        while job["status"] not in ("done", "failed"):
+            update = job_queue.wait_for_update(job_id, job["version"], timeout=15)
+            if update is None:
+                return
+            if update["version"] == job["version"]:
+                yield ": keep-alive\n\n"
+                continue
+            job = update
+            yield f"data: {json.dumps(job, default=str)}\n\n"
+
+    return Response(events(job), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@tasks.route("/exp/execute/run/<exp_id>", methods=["OPTIONS", "POST"])
+@cross_origin()
+def run_experiment(exp_id):
+    if not experimentHandler.experiment_exists(exp_id):
+        return {"error": ERROR_NOT_FOUND, "message": "experiment not found"}, 404
+    runner = get_experiment_runner()
+    if not runner:
+        return {"error": "Error running experiment", "message": "experiment runner is not running"}, 503
+    exp = experimentHandler.get_experiment(exp_id)
+    run = runner.submit(exp_id, exp)
+    return {"message": "experiment run started", "data": {"run": run}}, 202
+
+
+@tasks.route("/exp/execute/runs/<run_id>", methods=["GET"])
+@cross_origin()
+def get_experiment_run(run_id):
+    runner = get_experiment_runner()
+    run = runner.get_run(run_id) if runner else None
+    if not run:
+        return {"error": ERROR_NOT_FOUND, "message": "experiment run not found"}, 404
+    return {"message": "experiment run retrieved", "data": {"run": run}}, 200
+
+
+@tasks.route("/exp/execute/runs/<run_id>/events", methods=["GET"])
+@cross_origin()
+def stream_experiment_run(run_id):
+    runner = get_experiment_runner()
+    run = runner.get_run(run_id) if runner else None
+    if not run:
+        return {"error": ERROR_NOT_FOUND, "message": "experiment run not found"}, 404
+
+    def events(run):
+        # server-sent events: one message per batch of results, a comment line keeps idle connections open
+        yield f"data: {json.dumps(run, default=str)}\n\n"
+        while run["status"] not in ("done", "failed"):
+            update = runner.wait_for_update(run_id, run["version"], timeout=15)
+            if update is None:
+                return
+            if update["version"] == run["version"]:
+                yield ": keep-alive\n\n"
+                continue
+            run = update
+            yield f"data: {json.dumps(run, default=str)}\n\n"
+
+    return Response(events(run), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@tasks.route("/exp/execute/results/stats", methods=["GET"])
+@cross_origin()
+def get_result_store_stats():
+    return {"message": "result store stats retrieved", "data": executionHandler.get_result_store_stats()}, 200
+
+
+@tasks.route("/exp/execute/results/<path:file_name>", methods=["GET"])
+@cross_origin()
+def get_execution_result(file_name):
+    path = executionHandler.get_data_file_path(file_name)
+    if not path:
+        return {"error": ERROR_NOT_FOUND, "message": "result file not found"}, 404
+    # streamed from disk; Range requests are answered with 206 and only the requested bytes
+    return send_file(path, mimetype=executionHandler.get_output_mimetype(file_name), conditional=True)
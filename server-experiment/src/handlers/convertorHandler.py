@@ -1,9 +1,15 @@
+import copy
 import json
+import hashlib
 import itertools
+import os
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from nanoid import generate
 from config.logging_config import get_logger
-from typing import Optional, Dict
+from services import dsl
+from typing import Optional, Dict, List, Tuple
 
 logger = get_logger(__name__)
 
@@ -13,12 +19,21 @@ class ConvertorHandler:
     def __init__(self):
         self.url = "http://emf-cloud-service:8081/api/v2"
         self.convert_base_url = "http://host.docker.internal:8866/api"
+        # "http" uses the DSL conversion service, "native" converts .xxp documents in process
+        self.dsl_converter = os.environ.get("DSL_CONVERTER", "http")
+        # number of documents a batch conversion sends to the DSL service at the same time
+        self.batch_concurrency = int(os.environ.get("DSL_BATCH_CONCURRENCY", "8"))
+        # seconds a batch conversion waits for the DSL service per document
+        self.batch_timeout = float(os.environ.get("DSL_BATCH_TIMEOUT", "30"))
+        # reference compact shared domains instead of one parameterdomain object per (parameter, value) pair
+        self.compact_domains = os.environ.get("CONVERTOR_COMPACT_DOMAINS", "false").lower() == "true"
         # self.meta_model_loc = self.__init_meta_model_location()
         self.root_type = "Specification"
         self.workflow = []
         self.workflow_tasks_dict = {}
         self.task_variant_map = {}
         self.experiment_space = []
+        self.parameter_domains = {}
         self.primitive_types = []
         self.primitive_types_map = {
             "integer": "NUMBER",
@@ -43,16 +58,28 @@ class ConvertorHandler:
         self.workflow_tasks_dict = {}
         self.task_variant_map = {}
         self.experiment_space = []
+        self.parameter_domains = {}
         self.primitive_types = []
 
-    def convert(self, exp):
-        """Convert the graphical model to the EMF model."""
+    def convert(self, exp, progress=None, compact_domains=None):
+        """Convert the graphical model to the EMF model.
+
+        Args:
+            exp: The experiment to convert
+            progress: Optional callable receiving (stage, fraction) as the conversion advances
+            compact_domains: Reference compact shared domains from each experiment space instead of
+                enumerating every parameter value (default: the CONVERTOR_COMPACT_DOMAINS setting)
+        """
 
         self.__clear_maps()
+        if compact_domains is None:
+            compact_domains = self.compact_domains
+        self.__report(progress, "converting workflows", 0.1)
         self.workflow = [{"$id": "workflow-0", "name": "main", "node": [], "link": []}]
         self.workflow[0] = self.__convert_workflow(
             exp["graphical_model"], self.workflow[0]
         )
+        self.__report(progress, "generating deployed workflows", 0.4)
         deployed_workflow_combinations = self.__compute_deployed_workflow_combinations()
         deployed_workflows = self.__generate_all_deployed_workflows(
             deployed_workflow_combinations
@@ -65,8 +92,15 @@ class ConvertorHandler:
             "deployedworkflow": deployed_workflows,
             "experimentspace": self.experiment_space,
         }
+        if compact_domains:
+            emf_model["parameterdomain"] = list(self.parameter_domains.values())
+        else:
+            emf_model = self.expand_parameter_domains(
+                dict(emf_model, parameterdomain=list(self.parameter_domains.values()))
+            )
 
         data = json.dumps({"data": emf_model})
+        self.__report(progress, "storing model", 0.7)
 
         # avoid name conflicts
         work_name = f"{exp['name']}-{generate(size=3)}.workflow"
@@ -87,18 +121,119 @@ class ConvertorHandler:
             }
 
         emf_model = response_json["data"]
+        self.__report(progress, "fetching xmi model", 0.9)
         xmi_model = self.__get_xmi_model(work_name)["data"]
 
         requests.delete(f"{self.url}/models", params={"modeluri": work_name}, timeout=5)
 
         return {"success": True, "data": {"json": emf_model, "xmi": xmi_model}}
 
+    def __report(self, progress, stage, fraction):
+        """Forward the conversion progress to the caller, if it asked for it."""
+        if progress:
+            progress(stage, fraction)
+
     def __convert_workflow(self, graphical_model, workflow):
-        """Convert the workflow structure"""
+        """Convert the workflow structure, including all nested composite subflows."""
+
+        converted = self.__convert_subflows(graphical_model)
+        return self.__merge_workflow(
+            converted, self.__graph_key(graphical_model), workflow
+        )
+
+    def __convert_subflows(self, graphical_model):
+        """Convert the graph and every distinct subflow below it.
+
+        Subflows are converted level by level on the calling thread: the conversion is
+        CPU-bound, so threads would only contend for the GIL. Graphs with identical content
+        are converted only once, whichever variants reference them.
+        """
+        converted = {}
+        pending = {self.__graph_key(graphical_model): graphical_model}
+        while pending:
+            level = {key: self.__convert_graph(graph) for key, graph in pending.items()}
+            converted.update(level)
+
+            pending = {}
+            for result in level.values():
+                for _, variants in result["tasks"]:
+                    for variant in variants:
+                        if not variant["is_composite"]:
+                            continue
+                        key = self.__graph_key(variant["graphical_model"])
+                        if key not in converted and key not in pending:
+                            pending[key] = variant["graphical_model"]
+        return converted
+
+    def __merge_workflow(self, converted, key, workflow, merged=None):
+        """Fill the workflow from converted graphs in the same order as a serial recursion."""
+
+        merged = set() if merged is None else merged
+        result = converted[key]
+        nodes = result["node"]
+        if key in merged:
+            # another copy of a graph converted once, its conditions get ids of their own
+            nodes = self.__renew_condition_ids(nodes)
+        merged.add(key)
+        workflow["node"].extend(nodes)
+        workflow["link"].extend(result["link"])
+
+        for node_id, variants in result["tasks"]:
+            self.workflow_tasks_dict.setdefault(workflow["$id"], {})[node_id] = []
+            for variant in variants:
+                self.workflow_tasks_dict[workflow["$id"]][node_id].append(
+                    variant["id_task"]
+                )
+                self.task_variant_map[variant["id_task"]] = (
+                    variant  # both composite and non-composite tasks are added to the task map
+                )
+
+                if variant["is_composite"]:
+                    subflow = {
+                        "$id": variant["id_task"],
+                        "name": variant["name"],
+                        "node": [],
+                        "link": [],
+                    }
+                    self.workflow.append(
+                        self.__merge_workflow(
+                            converted,
+                            self.__graph_key(variant["graphical_model"]),
+                            subflow,
+                            merged,
+                        )
+                    )
+
+        return workflow
+
+    def __renew_condition_ids(self, nodes):
+        """Copy converted nodes, giving the conditions of operators and their cases new ids."""
+
+        renewed = []
+        for node in nodes:
+            if "condition" in node or "conditions" in node:
+                node = copy.deepcopy(node)
+                conditions = node.get("conditions", []) + ([node["condition"]] if "condition" in node else [])
+                for condition in conditions:
+                    condition["$id"] = f"condition-{generate(size=5)}"
+                    for case in condition["cases"]:
+                        case["$id"] = f"case-{generate(size=5)}"
+            renewed.append(node)
+        return renewed
+
+    def __graph_key(self, graphical_model):
+        """Content key of a graphical model, used to convert identical subflows once."""
+        return hashlib.sha1(
+            json.dumps(graphical_model, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def __convert_graph(self, graphical_model):
+        """Convert the nodes and links of a single graph without touching the conversion maps."""
 
         nodes = graphical_model["nodes"]
         links = graphical_model["edges"]
         node_type_map = {}
+        result = {"node": [], "link": [], "tasks": []}
 
         for node in nodes:
             emf_node = {}
@@ -115,12 +250,13 @@ class ConvertorHandler:
                     "name": "END",
                 }
             elif node_type == "task":
-                emf_node = self.__convert_task_node_to_emf(workflow["$id"], node)
+                emf_node = self.__convert_task_node_to_emf(node)
+                result["tasks"].append((node["id"], node["data"]["variants"]))
             elif node_type in ("opParallel", "opExclusive", "opInclusive", "opComplex"):
                 emf_node = self.__convert_operator_node_to_emf(node, nodes, links)
 
             if emf_node:
-                workflow["node"].append(emf_node)
+                result["node"].append(emf_node)
                 node_type_map[emf_node["$id"]] = emf_node["$type"]
 
         for link in links:
@@ -143,39 +279,18 @@ class ConvertorHandler:
                         "$ref": target,
                     },
                 }
-            workflow["link"].append(emf_link)
+            result["link"].append(emf_link)
 
-        return workflow
+        return result
 
-    def __convert_task_node_to_emf(self, workflow_id, node):
+    def __convert_task_node_to_emf(self, node):
         """Convert the task node structure"""
-        self.workflow_tasks_dict.setdefault(workflow_id, {})[node["id"]] = []
-
-        emf_node = {
+        return {
             "$type": f"{self.meta_model_loc}Task",
             "$id": node["id"],
             "name": node["id"],
         }
 
-        for variant in node["data"]["variants"]:
-            self.workflow_tasks_dict[workflow_id][node["id"]].append(variant["id_task"])
-            self.task_variant_map[variant["id_task"]] = (
-                variant  # both composite and non-composite tasks are added to the task map
-            )
-
-            if variant["is_composite"]:
-                subflow = {
-                    "$id": variant["id_task"],
-                    "name": variant["name"],
-                    "node": [],
-                    "link": [],
-                }
-                self.workflow.append(
-                    self.__convert_workflow(variant["graphical_model"], subflow)
-                )
-
-        return emf_node
-
     def __convert_operator_node_to_emf(self, node, nodes, links):
         """Convert the operator node structure"""
 
@@ -325,22 +440,27 @@ class ConvertorHandler:
         return deployed_workflows
 
     def __generate_experiment_space(self, deployed_workflow_id, parameters):
-        """Generate the experiment space."""
+        """Generate the experiment space.
 
-        parameter_domain = [
-            {
-                "$id": f"parameterdomain-{generate(size=10)}",
-                "name": parameter.get("name"),
-                "type": self.__generate_primitive_type(parameter.get("type")),
-                "value": value,
-                "staticparameter": {
+        Each parameter references one shared domain, which lists the static parameters of
+        every deployed workflow using it. Use expand_parameter_domains() for the enumerated form.
+        """
+
+        parameter_domain = []
+        for parameter in parameters:
+            domain = self.__shared_parameter_domain(parameter)
+            domain["staticparameter"].append(
+                {
                     "$type": self.__emf_object_type("StaticParameter"),
                     "$ref": deployed_workflow_id + parameter.get("id"),
-                },
-            }
-            for parameter in parameters
-            for value in parameter.get("values", [])
-        ]
+                }
+            )
+            parameter_domain.append(
+                {
+                    "$type": self.__emf_object_type("ParameterDomain"),
+                    "$ref": domain["$id"],
+                }
+            )
 
         return {
             "$id": f"experimentspace-{generate(size=10)}",
@@ -351,6 +471,99 @@ class ConvertorHandler:
             "parameterdomain": parameter_domain,
         }
 
+    def __shared_parameter_domain(self, parameter):
+        """Get the domain of a parameter, shared by every deployed workflow using the parameter."""
+
+        values = parameter.get("values", [])
+        key = (parameter.get("id"), json.dumps(values, default=str))
+        domain = self.parameter_domains.get(key)
+        if domain is None:
+            domain = {
+                "$type": self.__emf_object_type("ParameterDomain"),
+                "$id": f"parameterdomain-{len(self.parameter_domains)}-{parameter.get('id')}",
+                "name": parameter.get("name"),
+                "type": self.__generate_primitive_type(parameter.get("type")),
+                **self.__compact_values(values),
+                "staticparameter": [],
+            }
+            self.parameter_domains[key] = domain
+        return domain
+
+    def __compact_values(self, values):
+        """Describe values as a range when expand_range() gives them back exactly, anything else as a set."""
+
+        value_type = type(values[0]) if values else None
+        if value_type in (int, float) and len(values) > 2 and all(type(value) is value_type for value in values):
+            value_range = {
+                "start": values[0],
+                "step": values[1] - values[0],
+                "count": len(values),
+            }
+            if value_range["step"] != 0 and self.expand_range(value_range) == list(values):
+                return {"range": value_range}
+        return {"values": list(values)}
+
+    @staticmethod
+    def expand_range(value_range):
+        """Enumerate the values of a compact range."""
+        start = value_range["start"]
+        step = value_range["step"]
+        return [start + i * step for i in range(value_range["count"])]
+
+    def expand_parameter_domains(self, emf_model):
+        """Turn a model with compact shared domains into one parameterdomain object per value."""
+
+        domains = {domain["$id"]: domain for domain in emf_model.get("parameterdomain", [])}
+        static_parameters = {
+            deployed_workflow["$id"]: {
+                parameter["$id"]
+                for configured_task in deployed_workflow["configuredtask"]
+                for parameter in configured_task["parameters"]
+            }
+            for deployed_workflow in emf_model["deployedworkflow"]
+        }
+        experiment_spaces = []
+        for space in emf_model["experimentspace"]:
+            deployed_workflow_id = space["deployedworkflow"]["$ref"]
+            parameter_domain = []
+            for domain_ref in space["parameterdomain"]:
+                domain = domains.get(domain_ref.get("$ref"))
+                if domain is None:
+                    # already enumerated
+                    parameter_domain.append(domain_ref)
+                    continue
+                # every static parameter of the domain in this deployed workflow, once each;
+                # a parameter used twice has one domain reference per use
+                matches = list({
+                    ref["$ref"]: ref
+                    for ref in domain["staticparameter"]
+                    if ref["$ref"] in static_parameters[deployed_workflow_id]
+                }.values())
+                if not matches:
+                    logger.warning(f"{domain['$id']} has no static parameter in {deployed_workflow_id}, skipping")
+                    continue
+                values = (
+                    self.expand_range(domain["range"])
+                    if "range" in domain
+                    else domain["values"]
+                )
+                parameter_domain.extend(
+                    {
+                        "$id": f"parameterdomain-{generate(size=10)}",
+                        "name": domain["name"],
+                        "type": domain["type"],
+                        "value": value,
+                        "staticparameter": static_parameter,
+                    }
+                    for static_parameter in matches
+                    for value in values
+                )
+            experiment_spaces.append(dict(space, parameterdomain=parameter_domain))
+
+        expanded = {k: v for k, v in emf_model.items() if k != "parameterdomain"}
+        expanded["experimentspace"] = experiment_spaces
+        return expanded
+
     def __generate_primitive_type(self, type_name):
         """Generate the primitive type."""
         type_name = self.primitive_types_map.get(type_name, "STRING")
@@ -413,8 +626,20 @@ class ConvertorHandler:
 
         return self.__emf_object_type(type_map.get(node["type"], None))
 
+    def __convert_native(self, convert, name: str, content, description: str):
+        """Run an in-process DSL conversion with the same contract as the HTTP service."""
+        try:
+            result = convert(name, content)
+        except (dsl.DslSyntaxError, TypeError, AttributeError, KeyError) as e:
+            logger.error(f"Error converting {description}: {str(e)}")
+            return None
+        logger.info(f"Successfully converted {description}")
+        return result
+
     def workflow2dsl(self, workflow_name: str, json_content: dict) -> Optional[str]:
         logger.info(f"Converting json to DSL for workflow {workflow_name}")
+        if self.dsl_converter == "native":
+            return self.__convert_native(dsl.workflow2dsl, workflow_name, json_content, f"workflow {workflow_name} to DSL")
         response = requests.post(f"{self.convert_base_url}/workflow2dsl?name={workflow_name}", json=json_content)
         if response.status_code == 200:
             dsl_content = response.text
@@ -426,6 +651,8 @@ class ConvertorHandler:
 
     def experiment2dsl(self, experiment_name: str, json_content: dict) -> Optional[str]:
         logger.info(f"Converting json to DSL for experiment {experiment_name}")
+        if self.dsl_converter == "native":
+            return self.__convert_native(dsl.experiment2dsl, experiment_name, json_content, f"experiment {experiment_name} to DSL")
         response = requests.post(f"{self.convert_base_url}/experiment2dsl?name={experiment_name}", json=json_content)
         if response.status_code == 200:
             dsl_content = response.text
@@ -437,6 +664,8 @@ class ConvertorHandler:
 
     def dsl2experiment(self, experiment_name: str, dsl_content: str) -> Optional[Dict]:
         logger.info(f"Converting DSL to json for experiment {experiment_name}")
+        if self.dsl_converter == "native":
+            return self.__convert_native(dsl.dsl2experiment, experiment_name, dsl_content, f"DSL to json for experiment {experiment_name}")
         response = requests.post(f"{self.convert_base_url}/dsl2experiment?name={experiment_name}", data=dsl_content)
         if response.status_code == 200:
             json_content = response.json()
@@ -448,6 +677,8 @@ class ConvertorHandler:
 
     def dsl2workflow(self, workflow_name: str, dsl_content: str) -> Optional[Dict]:
         logger.info(f"Converting DSL to json for workflow {workflow_name}")
+        if self.dsl_converter == "native":
+            return self.__convert_native(dsl.dsl2workflow, workflow_name, dsl_content, f"DSL to json for workflow {workflow_name}")
         response = requests.post(f"{self.convert_base_url}/dsl2workflow?name={workflow_name}", data=dsl_content)
         if response.status_code == 200:
             json_content = response.json()
@@ -457,5 +688,72 @@ class ConvertorHandler:
             logger.error(f"Error converting DSL to json: {response.text}")
             return None
 
+    def dsl2experiments(self, documents: List[Tuple[str, str]], max_workers: Optional[int] = None) -> List[Dict]:
+        """Convert many experiment documents, given as (name, dsl_content) pairs.
+
+        Returns one {"name", "success", "data" | "error"} entry per document, in input order.
+        """
+        return self.__batch_dsl2json("experiment", documents, max_workers)
+
+    def dsl2workflows(self, documents: List[Tuple[str, str]], max_workers: Optional[int] = None) -> List[Dict]:
+        """Convert many workflow documents, given as (name, dsl_content) pairs.
+
+        Returns one {"name", "success", "data" | "error"} entry per document, in input order.
+        """
+        return self.__batch_dsl2json("workflow", documents, max_workers)
+
+    def __batch_dsl2json(self, kind: str, documents: List[Tuple[str, str]], max_workers: Optional[int]) -> List[Dict]:
+        if not documents:
+            return []
+        logger.info(f"Converting {len(documents)} {kind} documents from DSL to json")
+
+        if self.dsl_converter == "native":
+            results = [self.__dsl2json_item(None, kind, name, content) for name, content in documents]
+        else:
+            workers = min(max_workers or self.batch_concurrency, len(documents))
+            # one session per thread keeps its connection to the conversion service open for
+            # the whole batch, sessions are not thread-safe
+            local = threading.local()
+            sessions = []
+
+            def convert(document):
+                session = getattr(local, "session", None)
+                if session is None:
+                    session = local.session = requests.Session()
+                    sessions.append(session)
+                return self.__dsl2json_item(session, kind, *document)
+
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(convert, documents))
+            finally:
+                for session in sessions:
+                    session.close()
+
+        failed = [result["name"] for result in results if not result["success"]]
+        if failed:
+            logger.error(f"Error converting {len(failed)} of {len(documents)} {kind} documents: {failed}")
+        else:
+            logger.info(f"Successfully converted {len(documents)} {kind} documents from DSL to json")
+        return results
+
+    def __dsl2json_item(self, session, kind: str, name: str, dsl_content: str) -> Dict:
+        """Convert one document of a batch, reporting its error instead of raising it."""
+        try:
+            if session is None:
+                convert = dsl.dsl2experiment if kind == "experiment" else dsl.dsl2workflow
+                data = convert(name, dsl_content)
+            else:
+                response = session.post(
+                    f"{self.convert_base_url}/dsl2{kind}", params={"name": name}, data=dsl_content,
+                    timeout=self.batch_timeout,
+                )
+                if response.status_code != 200:
+                    return {"name": name, "success": False, "error": response.text}
+                data = response.json()
+        except Exception as e:
+            return {"name": name, "success": False, "error": str(e)}
+        return {"name": name, "success": True, "data": data}
+
 
 convertorHandler = ConvertorHandler() 
@@ -3,9 +3,125 @@ The implementation of the execution handler is for demo purposes only.
 It is not the final implementation of the execution handler as the result of the thesis.
 """
 
+import io
+import json
 import os
+import time
+import uuid
+from typing import List, NamedTuple
 import pandas as pd
 from dbClient import mongo_client
+from services.datasets import (
+    ColumnCache,
+    DatasetRegistry,
+    ResultStore,
+    UploadManager,
+    aggregate,
+    aggregate_csv_in_chunks,
+    preview_csv,
+    quantile_of,
+    resolve_data_path,
+    validate_operations,
+)
+from services.execution import DagExecutor, ExecutionError, current_variant
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# part of every stored result key, bump it when the results of an operation change
+ENGINE_VERSION = "2"
+
+# output formats by file extension, a data node can also set "format" explicitly
+OUTPUT_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+OUTPUT_MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+class ExecutionPlan(NamedTuple):
+    """What a graphical model asks the demo executor to do, parsed once from its nodes."""
+
+    input_file: str
+    input_field: str
+    output_file: str
+    output_fields: List[str]
+    operations: List[str]
+    output_format: str = "csv"
+
+    @classmethod
+    def from_graphical_model(cls, graphical_model) -> "ExecutionPlan":
+        """
+        Parse the task node and the input and output data nodes in one scan of the nodes.
+
+        The task node asks for its aggregations with "operations", a list, or "operation",
+        a single name or names separated by ','. Parameters of the selected task variant
+        with a value (set e.g. by a point of an experiment space) override these, and a
+        parameter "input_field" overrides the field of the input data node. Output fields are separated by ',' as well;
+        with fewer fields than operations the columns are named <field>_<operation>. The
+        output is written as CSV, Parquet or Arrow IPC, after the "format" of the output
+        data node or the extension of its name.
+
+        Raises:
+            ValueError: If a node is missing or an operation is not supported
+        """
+        task_node = None
+        data_nodes = []
+        for node in graphical_model["nodes"]:
+            if node.get("type") == "task" and task_node is None:
+                task_node = node
+            elif node.get("type") == "data":
+                data_nodes.append(node)
+
+        if task_node is None:
+            raise ValueError("Task does not exist.")
+        if len(data_nodes) < 2:
+            raise ValueError("Missing input or output data node.")
+
+        task_data = {**task_node.get("data", {}), **cls.parameter_values(task_node)}
+        operations = task_data.get("operations") or task_data.get("operation", "mean")
+        if isinstance(operations, str):
+            operations = operations.split(",")
+        operations = validate_operations(operations) or ["mean"]
+
+        output_field = data_nodes[1]["data"].get("field", "result")
+        output_fields = [field.strip() for field in output_field.split(",") if field.strip()]
+        if len(output_fields) != len(operations):
+            base = output_fields[0] if output_fields else "result"
+            if len(operations) == 1:
+                output_fields = [base]
+            else:
+                output_fields = [f"{base}_{operation}" for operation in operations]
+
+        output_file = data_nodes[1]["data"].get("name", "output.csv")
+        output_format = data_nodes[1]["data"].get("format") or OUTPUT_FORMATS.get(
+            os.path.splitext(output_file)[1].lower(), "csv"
+        )
+        if output_format not in OUTPUT_MIMETYPES:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        return cls(
+            input_file=data_nodes[0]["data"].get("name", ""),
+            input_field=task_data.get("input_field") or data_nodes[0]["data"].get("field", ""),
+            output_file=output_file,
+            output_fields=output_fields,
+            operations=operations,
+            output_format=output_format,
+        )
+
+
+    @staticmethod
+    def parameter_values(task_node) -> dict:
+        """Values of the parameters of the selected variant of a task node that have one."""
+        parameters = (current_variant(task_node) or {}).get("parameters") or []
+        return {parameter["name"]: parameter["value"] for parameter in parameters if "name" in parameter and "value" in parameter}
 
 
 class ExecutionHandler(object):
@@ -13,112 +129,238 @@ class ExecutionHandler(object):
         self.client = mongo_client
         # self.db = self.client.experiments
         # self.collection_specification = self.db.specification
+        self.data_path = os.path.join("..", "data")
+        self.column_cache = ColumnCache(self.data_path)
+        # inputs larger than this are aggregated chunk by chunk instead of loaded at once
+        self.streaming_threshold_bytes = int(os.environ.get("EXECUTION_STREAMING_THRESHOLD_MB", "256")) * 1024 * 1024
+        self.chunk_rows = int(os.environ.get("EXECUTION_CHUNK_ROWS", "100000"))
+        # schema, checksum and statistics of every dataset, kept up to date incrementally
+        self.dataset_registry = DatasetRegistry(self.data_path, chunk_rows=self.chunk_rows)
+        # results of unchanged reruns are answered from here
+        self.result_store = ResultStore(
+            os.path.join(self.data_path, ".results"),
+            int(os.environ.get("EXECUTION_RESULT_STORE_MB", "64")) * 1024 * 1024,
+        )
+        # resumable uploads, indexed and converted to columns while the chunks arrive
+        self.upload_manager = UploadManager(
+            self.data_path,
+            self.dataset_registry,
+            self.column_cache,
+            int(os.environ.get("DATASET_UPLOAD_MAX_CHUNK_MB", "16")) * 1024 * 1024,
+        )
+        # independent branches of a workflow run concurrently on this many threads
+        self.dag_executor = DagExecutor(self.run_task_node, int(os.environ.get("EXECUTION_WORKERS", "4")))
 
-    def execute_experiment(self, graphical_model):
-        if not self.is_task_node_exist(graphical_model):
-            return {"verified": False, "error": "Task does not exist."}
+    def execute_workflow(self, graphical_model, variables=None):
+        """
+        Run a whole workflow graph, following its links, gateways and subflows.
 
-        if not self.exists_at_least_two_data_nodes(graphical_model):
-            return {"verified": False, "error": "Missing input or output data node."}
+        Every task with an input and an output data node linked to it runs the demo
+        aggregation of execute_experiment; other tasks only take part in the flow.
 
-        file_name = self.get_input_file_name(graphical_model)
-        file_path = os.path.join("..", "data", file_name)
-        if not os.path.exists(file_path):
-            return {"verified": False, "error": "Input data file does not exist."}
-        df = pd.read_csv(file_path)
+        Args:
+            graphical_model: The workflow graphical model
+            variables: Initial values the gateway conditions can refer to
+
+        Returns:
+            Execution report with per-node status, results and timings and the critical path
+        """
+        try:
+            report = self.dag_executor.run(graphical_model, variables)
+        except ExecutionError as e:
+            return {"verified": False, "error": str(e)}
+        return {"verified": report["success"], "error": report["error"], "report": report}
 
-        input_field = self.get_input_field(graphical_model)
+    def run_task_node(self, task_node, graphical_model, variables):
+        """Run the demo aggregation of one task node of a workflow graph."""
+        data_nodes = {node["id"]: node for node in graphical_model["nodes"] if node.get("type") == "data"}
+        edges = graphical_model.get("edges", [])
+        inputs = [data_nodes[edge["source"]] for edge in edges
+                  if edge["target"] == task_node["id"] and edge["source"] in data_nodes]
+        outputs = [data_nodes[edge["target"]] for edge in edges
+                   if edge["source"] == task_node["id"] and edge["target"] in data_nodes]
+        if not inputs or not outputs:
+            return None
 
-        # check if input field exists in input file
-        if input_field not in df.columns:
+        result = self.execute_experiment({"nodes": [task_node, inputs[0], outputs[0]]})
+        if not result["verified"]:
+            raise ExecutionError(result["error"])
+        return json.loads(result["result"])[0]
+
+    def execute_experiment(self, graphical_model, streaming=None):
+        """
+        Run the demo aggregation of a graphical model.
+
+        All aggregations requested by the task node are computed together, reading the
+        input column once.
+
+        Args:
+            graphical_model: The workflow graphical model
+            streaming: Aggregate the input in chunks with bounded memory. By default this is
+                done for inputs larger than the streaming threshold.
+        """
+        try:
+            plan = ExecutionPlan.from_graphical_model(graphical_model)
+        except ValueError as e:
+            return {"verified": False, "error": str(e)}
+
+        # the names come from the request, neither may lead outside the data directory
+        file_path = resolve_data_path(self.data_path, plan.input_file)
+        if file_path is None:
+            return {"verified": False, "error": "Input data file does not exist."}
+        output_file_path = resolve_data_path(self.data_path, plan.output_file)
+        if output_file_path is None:
+            return {"verified": False, "error": "Invalid output data file name."}
+
+        # validated against the dataset registry, the input is only read if it changed
+        dataset = self.dataset_registry.get(plan.input_file)
+        if dataset is None:
+            return {"verified": False, "error": "Input data file does not exist."}
+        if not any(column["name"] == plan.input_field for column in dataset["columns"]):
             return {"verified": False, "error": "Input field does not exist."}
 
+        key = self.result_store.key(dataset["checksum"], plan.input_field, plan.operations, ENGINE_VERSION)
+        entry = self.result_store.get(key)
+        if entry is not None:
+            results = entry["results"]
+        else:
+            started = time.perf_counter()
+            results, error = self.compute_results(plan, file_path, streaming)
+            if error:
+                return {"verified": False, "error": error}
+            self.result_store.put(key, {"results": results, "compute_seconds": time.perf_counter() - started})
+
+        df_output = pd.DataFrame(
+            {field: [results[operation]] for field, operation in zip(plan.output_fields, plan.operations)}
+        )
         try:
-            if self.get_operation(graphical_model) == "mean":
-                result = df[input_field].mean()
-            elif self.get_operation(graphical_model) == "sum":
-                result = df[input_field].sum()
-            elif self.get_operation(graphical_model) == "min":
-                result = df[input_field].min()
-            elif self.get_operation(graphical_model) == "max":
-                result = df[input_field].max()
+            output = self.serialize_output(df_output, plan.output_format)
+            # an unchanged rerun leaves the output file as it is
+            if entry is None or not self._has_content(output_file_path, output):
+                # replaced in one step, the file may be being served at the same time
+                tmp_path = f"{output_file_path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(output)
+                os.replace(tmp_path, output_file_path)
         except Exception as e:
-            print(f"Error calculating result: {e}")
-            return {"verified": False, "error": "Error calculating result."}
+            logger.error(f"Error writing output file {plan.output_file}: {str(e)}", exc_info=True)
+
+        json_data = df_output.to_json(orient="records")
+
+        return {
+            "verified": True,
+            "result": json_data,
+            "filename": plan.output_file,
+            "format": plan.output_format,
+            "cached": entry is not None,
+        }
 
-        output_file_name = self.get_output_file_name(graphical_model)
-        output_field = self.get_output_field(graphical_model)
-        output_file_path = os.path.join("..", "data", output_file_name)
+    def compute_results(self, plan, file_path, streaming=None):
+        """
+        Compute the aggregations of a plan.
+
+        Returns:
+            tuple: The value of every operation, or None and an error message
+        """
+        if streaming is None:
+            streaming = os.path.getsize(file_path) > self.streaming_threshold_bytes
+        if streaming:
+            # exact quantiles need the whole column, running statistics cannot provide them
+            if any(quantile_of(operation) is not None for operation in plan.operations):
+                return None, "Quantiles are not supported for streamed inputs."
+            try:
+                stats = self.aggregate_in_chunks(file_path, plan.input_field)
+            except Exception as e:
+                logger.error(f"Error calculating result: {str(e)}", exc_info=True)
+                return None, "Error calculating result."
+            if stats is not None:
+                return {operation: stats.result(operation) for operation in plan.operations}, None
+            # a text column has no running statistics, pandas aggregates it from the columnar copy
+
+        # check if input field exists in input file
+        if plan.input_field not in self.column_cache.get_columns(plan.input_file):
+            return None, "Input field does not exist."
+
+        # memory-mapped column, only the values of the input field are read
+        column = self.column_cache.get_column(plan.input_file, plan.input_field)
 
-        df_output = pd.DataFrame({output_field: [result]})
         try:
-            df_output.to_csv(output_file_path, index=False)
+            return aggregate(column, plan.operations), None
         except Exception as e:
-            print(f"Error writing output file: {e}")
+            logger.error(f"Error calculating result: {str(e)}", exc_info=True)
+            return None, "Error calculating result."
 
-        json_data = df_output.to_json(orient="records")
+    @staticmethod
+    def serialize_output(df_output, output_format):
+        """Bytes of an output frame in CSV, Parquet or Arrow IPC file format."""
+        if output_format == "csv":
+            return df_output.to_csv(index=False).encode("utf-8")
+        buffer = io.BytesIO()
+        if output_format == "parquet":
+            df_output.to_parquet(buffer, index=False)
+        else:
+            # uncompressed, so readers can memory-map the columns without copying them
+            df_output.to_feather(buffer, compression="uncompressed")
+        return buffer.getvalue()
 
-        return {"verified": True, "result": json_data, "filename": output_file_name}
-
-    def get_input_file_name(self, graphical_model):
-        # from the first data node get "name"
-        data_nodes = [
-            node for node in graphical_model["nodes"] if node.get("type") == "data"
-        ]
-        if len(data_nodes) > 0:
-            return data_nodes[0]["data"].get("name", "")
-        return ""
-
-    def get_input_field(self, graphical_model):
-        data_nodes = [
-            node for node in graphical_model["nodes"] if node.get("type") == "data"
-        ]
-        if len(data_nodes) > 0:
-            return data_nodes[0]["data"].get("field", "")
-        return ""
-
-    def get_operation(self, graphical_model):
-        task_node = next(
-            (node for node in graphical_model["nodes"] if node.get("type") == "task"),
-            None,
-        )
-        if task_node:
-            operation_value = task_node["data"].get("operation", "mean")
-            return operation_value
-        return "mean"
-
-    def get_output_field(self, graphical_model):
-        data_nodes = [
-            node for node in graphical_model["nodes"] if node.get("type") == "data"
-        ]
-        if len(data_nodes) > 0:
-            return data_nodes[1]["data"].get("field", "result")
-        return "result"
-
-    def get_output_file_name(self, graphical_model):
-        data_nodes = [
-            node for node in graphical_model["nodes"] if node.get("type") == "data"
-        ]
-        if len(data_nodes) > 0:
-            return data_nodes[1]["data"].get("name", "output.csv")
-        return "output.csv"
-
-    def is_task_node_exist(self, graphical_model):
-        task_node = next(
-            (node for node in graphical_model["nodes"] if node.get("type") == "task"),
-            None,
-        )
-        if task_node:
-            return True
-        return False
-
-    def exists_at_least_two_data_nodes(self, graphical_model):
-        data_nodes = [
-            node for node in graphical_model["nodes"] if node.get("type") == "data"
-        ]
-        if len(data_nodes) > 1:
-            return True
-        return False
+    def get_data_file_path(self, file_name):
+        """
+        Absolute path of a dataset or stored output file, or None if it does not exist or
+        lies outside the data directory or inside one of its hidden cache directories.
+        """
+        path = resolve_data_path(self.data_path, file_name)
+        return path if path is not None and os.path.isfile(path) else None
+
+    @staticmethod
+    def get_output_mimetype(file_name):
+        output_format = OUTPUT_FORMATS.get(os.path.splitext(file_name)[1].lower())
+        return OUTPUT_MIMETYPES.get(output_format, "application/octet-stream")
+
+    def list_datasets(self):
+        return self.dataset_registry.list()
+
+    def get_dataset(self, file_name):
+        return self.dataset_registry.get(file_name)
+
+    def refresh_datasets(self):
+        return self.dataset_registry.refresh()
+
+    def preview_dataset(self, file_name, head_rows=20, sample_rows=20, seed=None):
+        """Header, first rows and a random sample of a dataset, or None if it does not exist."""
+        path = self.get_data_file_path(file_name)
+        if not path:
+            return None
+        return preview_csv(path, head_rows, sample_rows, seed)
+
+    def create_upload(self, name, size, checksum=None):
+        return self.upload_manager.create(name, size, checksum)
+
+    def get_upload(self, upload_id):
+        return self.upload_manager.get(upload_id)
+
+    def write_upload_chunk(self, upload_id, offset, stream, length, sha256):
+        return self.upload_manager.write_chunk(upload_id, offset, stream, length, sha256)
+
+    def complete_upload(self, upload_id):
+        return self.upload_manager.complete(upload_id)
+
+    def abort_upload(self, upload_id):
+        return self.upload_manager.abort(upload_id)
+
+    def get_result_store_stats(self):
+        return self.result_store.get_stats()
+
+    @staticmethod
+    def _has_content(file_path, content):
+        try:
+            with open(file_path, "rb") as f:
+                return f.read(len(content) + 1) == content
+        except OSError:
+            return False
+
+    def aggregate_in_chunks(self, file_path, field):
+        """Running statistics of one column of a CSV, or None if it is not numeric."""
+        return aggregate_csv_in_chunks(file_path, field, self.chunk_rows)
 
 
 executionHandler = ExecutionHandler()
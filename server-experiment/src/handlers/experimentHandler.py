@@ -1,8 +1,11 @@
 import pymongo
+import re
 import json
 import time
 import calendar
 from dbClient import mongo_client
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
 import uuid
 from config.logging_config import get_logger
 from typing import Optional, Dict
@@ -86,7 +89,7 @@ class ExperimentHandler(object):
 
     def update_experiment_name_from_file_name(self, username: str, old_experiment_name: str, new_experiment_name: str) -> bool:
         update_time = calendar.timegm(time.gmtime())
-        query = {"id_experiment": {"$regex": username}, "name": old_experiment_name}
+        query = self._file_name_query(username, old_experiment_name)
         new_values = {"$set": {"name": new_experiment_name, "update_at": update_time}}
         self.collection_experiment.update_one(query, new_values)
         return True
@@ -114,15 +117,86 @@ class ExperimentHandler(object):
 
     def update_experiment_steps_from_file_name(self, username: str, experiment_name: str, steps: dict) -> bool:
         update_time = calendar.timegm(time.gmtime())
-        query = {"id_experiment": {"$regex": username}, "name": experiment_name}
+        query = self._file_name_query(username, experiment_name)
         new_values = {"$set": {"steps": steps, "update_at": update_time}}
         self.collection_experiment.update_one(query, new_values)
         return True
 
     def get_experiment_from_file_name(self, username: str, experiment_name: str) -> Optional[Dict]:
-        query = {"id_experiment": {"$regex": username}, "name": experiment_name}
+        query = self._file_name_query(username, experiment_name)
         document = self.collection_experiment.find_one(query)
         return json.loads(json.dumps(document, default=str)) if document else None
 
+    def ensure_indexes(self) -> None:
+        """Create the indexes of the lookups by id and by file name, if they are missing."""
+        try:
+            self.collection_experiment.create_index("id_experiment")
+            self.collection_experiment.create_index([("name", pymongo.ASCENDING), ("id_experiment", pymongo.ASCENDING)])
+        except PyMongoError as e:
+            logger.warning(f"Could not create the experiment indexes: {str(e)}")
+
+    def find_experiment_id(self, username: str, experiment_name: str) -> Optional[str]:
+        document = self.collection_experiment.find_one(self._file_name_query(username, experiment_name), projection={"id_experiment": True})
+        return document["id_experiment"] if document else None
+
+    def find_experiment_ids(self, username: str, experiment_names: list) -> Dict[str, str]:
+        """Ids of the experiments of workspace files by name, in one query."""
+        query = {"name": {"$in": list(experiment_names)}, "id_experiment": {"$regex": f"^{re.escape(username)}-"}}
+        return {document["name"]: document["id_experiment"] for document in self.collection_experiment.find(query, projection={"name": True, "id_experiment": True})}
+
+    @staticmethod
+    def new_experiment_id(username: str) -> str:
+        """A new experiment id, for an experiment stored with an id chosen before it is written."""
+        return username + "-" + str(uuid.uuid4()) + "-" + str(calendar.timegm(time.gmtime()))
+
+    def upsert_experiment_operation(self, username: str, experiment_name: str, steps: dict, experiment_id: Optional[str] = None) -> UpdateOne:
+        """
+        Bulk write operation storing the steps of a workspace file, creating the experiment if it does not exist.
+
+        Args:
+            username: The username who owns the file
+            experiment_name: The name of the file (without extension)
+            steps: The converted content of the file
+            experiment_id: The id of the experiment, if known, otherwise it is matched by name
+
+        Returns:
+            The operation
+        """
+        update_time = calendar.timegm(time.gmtime())
+        new_values = {
+            "$set": {"name": experiment_name, "steps": steps, "update_at": update_time},
+            "$setOnInsert": {"create_at": update_time},
+        }
+        if experiment_id is not None:
+            return UpdateOne({"id_experiment": experiment_id}, new_values, upsert=True)
+        # only used if the experiment is created, an existing one keeps its id
+        new_values["$setOnInsert"]["id_experiment"] = self.new_experiment_id(username)
+        return UpdateOne(self._file_name_query(username, experiment_name), new_values, upsert=True)
+
+    def rename_experiment_operation(self, username: str, old_experiment_name: str, new_experiment_name: str, experiment_id: Optional[str] = None) -> UpdateOne:
+        new_values = {"$set": {"name": new_experiment_name, "update_at": calendar.timegm(time.gmtime())}}
+        return UpdateOne(self._file_query(username, old_experiment_name, experiment_id), new_values)
+
+    def delete_experiment_operation(self, username: str, experiment_name: str, experiment_id: Optional[str] = None) -> DeleteOne:
+        return DeleteOne(self._file_query(username, experiment_name, experiment_id))
+
+    def bulk_write_experiments(self, operations: list) -> None:
+        """
+        Apply operations in one ordered bulk write.
+
+        Raises:
+            BulkWriteError: If an operation failed, the following ones are not applied
+        """
+        self.collection_experiment.bulk_write(operations, ordered=True)
+
+    def _file_query(self, username: str, experiment_name: str, experiment_id: Optional[str] = None) -> dict:
+        # by the known id, or by name if the id is stale
+        query = self._file_name_query(username, experiment_name)
+        return {"$or": [{"id_experiment": experiment_id}, query]} if experiment_id else query
+
+    def _file_name_query(self, username: str, experiment_name: str) -> dict:
+        # ids start with the username, an anchored prefix is a range scan of the (name, id_experiment) index
+        return {"name": experiment_name, "id_experiment": {"$regex": f"^{re.escape(username)}-"}}
+
 
 experimentHandler = ExperimentHandler()
\ No newline at end of file
@@ -2,6 +2,8 @@ import os
 import json
 from pathlib import Path
 import shutil
+import stat
+import uuid
 from datetime import datetime
 from services.file_watcher import register_api_event
 from config.logging_config import get_logger
@@ -19,10 +21,9 @@ class FileSystemHandler:
         filepath = self.workspace_path / username / "experiments" / f"{exp_name}.xxp"
         if filepath.exists():
             return {"message": f"experiment name {exp_name} already exists"}, 406
-        register_api_event('create', username, "experiments", exp_name)
+        register_api_event('create', username, "experiments", exp_name, content="")
         os.makedirs(self.workspace_path / username / "experiments", exist_ok=True)
-        with open(filepath, 'w') as fileobject:
-            fileobject.write("")
+        self._write_atomic(filepath, "")
 
         return {"message": f"experiment started with name {exp_name}"}, 201
 
@@ -30,9 +31,9 @@ class FileSystemHandler:
         filepath = self.workspace_path / username / "workflows" / f"{workflow_name}.xxp"
         if filepath.exists():
             return {"message": f"workflow name {workflow_name} already exists"}, 406
-        register_api_event('create', username, "workflows", workflow_name)
+        register_api_event('create', username, "workflows", workflow_name, content="")
         filepath.parent.mkdir(parents=True, exist_ok=True)
-        filepath.write_text("", encoding='utf-8')
+        self._write_atomic(filepath, "")
 
         return {"message": f"workflow started with name {workflow_name}"}, 201
 
@@ -42,7 +43,8 @@ class FileSystemHandler:
             return {"message": f"experiment name {old_experiment_name} does not exist"}, 404
 
         if new_experiment_name:
-            register_api_event('rename', username, "experiments", old_experiment_name)
+            register_api_event('rename', username, "experiments", old_experiment_name,
+                               content=filepath.read_bytes(), new_file_name=new_experiment_name)
             os.rename(filepath, self.workspace_path / username / "experiments" / f"{new_experiment_name}.xxp")
             return {"message": f"experiment {old_experiment_name} was renamed to {new_experiment_name}"}, 200
 
@@ -55,7 +57,8 @@ class FileSystemHandler:
             return {"message": f"workflow name {old_workflow_name} does not exist"}, 404
 
         if new_workflow_name:
-            register_api_event('rename', username, "workflows", old_workflow_name)
+            register_api_event('rename', username, "workflows", old_workflow_name,
+                               content=sourcePath.read_bytes(), new_file_name=new_workflow_name)
             os.rename(sourcePath, targetPath)
             return {"message": f"workflow {old_workflow_name} was renamed to {new_workflow_name}"}, 200
 
@@ -90,14 +93,12 @@ class FileSystemHandler:
         if not filepath.exists():
             return {"message": f"experiment name {experiment_name} does not exist"}, 404
 
-        # Register this modification to prevent watcher from processing it
-        register_api_event('modify', username, "experiments", experiment_name)
-
         dsl_content = convertorHandler.experiment2dsl(experiment_name, content)
 
         if dsl_content:
-            with open(filepath, 'w', encoding='utf-8') as fileobject:
-                fileobject.write(dsl_content)
+            # Register this modification to prevent watcher from processing it
+            register_api_event('modify', username, "experiments", experiment_name, content=dsl_content)
+            self._write_atomic(filepath, dsl_content)
             return {"message": f"experiment {experiment_name} updated successfully"}, 200
         else:
             return {"message": f"Error converting experiment {experiment_name} to DSL"}, 500
@@ -107,14 +108,12 @@ class FileSystemHandler:
         if not filepath.exists():
             return {"message": f"workflow name {workflow_name} does not exist"}, 404
 
-        # Register this modification to prevent watcher from processing it
-        register_api_event('modify', username, "workflows", workflow_name)
-
         dsl_content = convertorHandler.workflow2dsl(workflow_name, content)
 
         if dsl_content:
-            with open(filepath, 'w', encoding='utf-8') as fileobject:
-                fileobject.write(dsl_content)
+            # Register this modification to prevent watcher from processing it
+            register_api_event('modify', username, "workflows", workflow_name, content=dsl_content)
+            self._write_atomic(filepath, dsl_content)
             return {"message": f"workflow {workflow_name} updated successfully"}, 200
         else:
             return {"message": f"Error converting workflow {workflow_name} to DSL"}, 500
@@ -165,6 +164,41 @@ class FileSystemHandler:
 
         return {"message": f"{experiment_name} has been archived"}, 200
     
+    def _write_atomic(self, filepath: Path, content: str):
+        """
+        Write a workspace file through a temporary file in the same directory, replaced in one
+        step: readers such as the watcher see the old or the new content, never a partial one,
+        and the save is one event. The temporary name is hidden and does not end in .xxp, so
+        the watcher never looks at it.
+        """
+        tmp_path = filepath.parent / f".{filepath.name}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, 'x', encoding='utf-8') as fileobject:
+                fileobject.write(content)
+                fileobject.flush()
+                os.fsync(fileobject.fileno())
+            if filepath.exists():
+                # keep the permissions of the file it replaces
+                os.chmod(tmp_path, stat.S_IMODE(filepath.stat().st_mode))
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        # the rename itself is durable once the directory is synced
+        try:
+            directory = os.open(filepath.parent, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(directory)
+        except OSError:
+            pass
+        finally:
+            os.close(directory)
+
     def detect_missing_file(self, username: str, fileType: str, fileName: str) -> bool:
         filePath = self.workspace_path / username / fileType / f"{fileName}.xxp"
         return filePath.exists()
@@ -1,9 +1,12 @@
 from __future__ import annotations
 import pymongo
+import re
 import json
 import time
 import calendar
 from dbClient import mongo_client
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
 import uuid
 from config.logging_config import get_logger
 from typing import Optional, Dict
@@ -117,7 +120,7 @@ class WorkflowHandler(object):
 
     def update_workflow_name_from_file_name(self, username: str, old_workflow_name: str, new_workflow_name: str) -> bool:
         update_time = calendar.timegm(time.gmtime())
-        query = {"id_workflow": {"$regex": username}, "name": old_workflow_name}
+        query = self._file_name_query(username, old_workflow_name)
         new_values = {"$set": {"name": new_workflow_name, "update_at": update_time}}
         self.collection_workflow.update_one(query, new_values)
         return True
@@ -145,15 +148,86 @@ class WorkflowHandler(object):
     
     def update_workflow_graphical_model_from_file_name(self, username: str, workflow_name: str, graphical_model: dict) -> bool:
         update_time = calendar.timegm(time.gmtime())
-        query = {"id_workflow": {"$regex": username}, "name": workflow_name}
+        query = self._file_name_query(username, workflow_name)
         new_values = {"$set": {"graphical_model": graphical_model, "update_at": update_time}}
         self.collection_workflow.update_one(query, new_values)
         return True
 
     def get_workflow_from_file_name(self, username: str, workflow_name: str) -> Optional[Dict]:
-        query = {"id_workflow": {"$regex": username}, "name": workflow_name}
+        query = self._file_name_query(username, workflow_name)
         document = self.collection_workflow.find_one(query)
         return json.loads(json.dumps(document, default=str)) if document else None
 
+    def ensure_indexes(self) -> None:
+        """Create the indexes of the lookups by id and by file name, if they are missing."""
+        try:
+            self.collection_workflow.create_index("id_workflow")
+            self.collection_workflow.create_index([("name", pymongo.ASCENDING), ("id_workflow", pymongo.ASCENDING)])
+        except PyMongoError as e:
+            logger.warning(f"Could not create the workflow indexes: {str(e)}")
+
+    def find_workflow_id(self, username: str, workflow_name: str) -> Optional[str]:
+        document = self.collection_workflow.find_one(self._file_name_query(username, workflow_name), projection={"id_workflow": True})
+        return document["id_workflow"] if document else None
+
+    def find_workflow_ids(self, username: str, workflow_names: list) -> Dict[str, str]:
+        """Ids of the workflows of workspace files by name, in one query."""
+        query = {"name": {"$in": list(workflow_names)}, "id_workflow": {"$regex": f"^{re.escape(username)}-"}}
+        return {document["name"]: document["id_workflow"] for document in self.collection_workflow.find(query, projection={"name": True, "id_workflow": True})}
+
+    @staticmethod
+    def new_workflow_id(username: str) -> str:
+        """A new workflow id, for a workflow stored with an id chosen before it is written."""
+        return username + "-" + str(uuid.uuid4()) + "-" + str(calendar.timegm(time.gmtime()))
+
+    def upsert_workflow_operation(self, username: str, workflow_name: str, graphical_model: dict, workflow_id: Optional[str] = None) -> UpdateOne:
+        """
+        Bulk write operation storing the graphical model of a workspace file, creating the workflow if it does not exist.
+
+        Args:
+            username: The username who owns the file
+            workflow_name: The name of the file (without extension)
+            graphical_model: The converted content of the file
+            workflow_id: The id of the workflow, if known, otherwise it is matched by name
+
+        Returns:
+            The operation
+        """
+        update_time = calendar.timegm(time.gmtime())
+        new_values = {
+            "$set": {"name": workflow_name, "graphical_model": graphical_model, "update_at": update_time},
+            "$setOnInsert": {"create_at": update_time},
+        }
+        if workflow_id is not None:
+            return UpdateOne({"id_workflow": workflow_id}, new_values, upsert=True)
+        # only used if the workflow is created, an existing one keeps its id
+        new_values["$setOnInsert"]["id_workflow"] = self.new_workflow_id(username)
+        return UpdateOne(self._file_name_query(username, workflow_name), new_values, upsert=True)
+
+    def rename_workflow_operation(self, username: str, old_workflow_name: str, new_workflow_name: str, workflow_id: Optional[str] = None) -> UpdateOne:
+        new_values = {"$set": {"name": new_workflow_name, "update_at": calendar.timegm(time.gmtime())}}
+        return UpdateOne(self._file_query(username, old_workflow_name, workflow_id), new_values)
+
+    def delete_workflow_operation(self, username: str, workflow_name: str, workflow_id: Optional[str] = None) -> DeleteOne:
+        return DeleteOne(self._file_query(username, workflow_name, workflow_id))
+
+    def bulk_write_workflows(self, operations: list) -> None:
+        """
+        Apply operations in one ordered bulk write.
+
+        Raises:
+            BulkWriteError: If an operation failed, the following ones are not applied
+        """
+        self.collection_workflow.bulk_write(operations, ordered=True)
+
+    def _file_query(self, username: str, workflow_name: str, workflow_id: Optional[str] = None) -> dict:
+        # by the known id, or by name if the id is stale
+        query = self._file_name_query(username, workflow_name)
+        return {"$or": [{"id_workflow": workflow_id}, query]} if workflow_id else query
+
+    def _file_name_query(self, username: str, workflow_name: str) -> dict:
+        # ids start with the username, an anchored prefix is a range scan of the (name, id_workflow) index
+        return {"name": workflow_name, "id_workflow": {"$regex": f"^{re.escape(username)}-"}}
+
 
 workflowHandler = WorkflowHandler()
\ No newline at end of file
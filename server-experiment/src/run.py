@@ -1,4 +1,5 @@
-from api import app
-
 if __name__ == '__main__':
+    # imported here: the spawned workers of the experiment runner import this module again,
+    # and must not start the watcher and the other services of the app
+    from api import app
     app.run(host = '0.0.0.0', port = 5050, debug = False)
\ No newline at end of file
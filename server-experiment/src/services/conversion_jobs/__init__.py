@@ -0,0 +1,7 @@
+from .job_queue import ConversionJobQueue, initialize_job_queue, get_job_queue
+
+__all__ = [
+    'ConversionJobQueue',
+    'initialize_job_queue',
+    'get_job_queue',
+]
@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional, Dict
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_PENDING_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+_FINISHED_STATUSES = (JOB_DONE, JOB_FAILED)
+
+
+class ConversionJobQueue:
+    """
+    Runs EMF model conversions in the background on a bounded pool of worker threads.
+    Every job is persisted as a JSON file, so queued jobs survive a restart of the service.
+    Finished jobs, with their results, are kept for finished_ttl_seconds and at most
+    max_finished of them, in memory and on disk.
+    """
+
+    def __init__(self, jobs_path: str, convertor_factory: Callable, workers: int = 2, max_pending: int = 100,
+                 finished_ttl_seconds: float = 24 * 3600, max_finished: int = 1000):
+        """
+        Initialize the job queue.
+
+        Args:
+            jobs_path: Directory where the job files are stored
+            convertor_factory: Callable returning a fresh ConvertorHandler for each job
+            workers: Number of worker threads running conversions
+            max_pending: Maximum number of queued jobs before submissions are rejected
+            finished_ttl_seconds: How long a finished job is kept
+            max_finished: Maximum number of finished jobs kept, the oldest are dropped first
+        """
+        self.jobs_path = Path(jobs_path)
+        self.convertor_factory = convertor_factory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self.max_finished = max_finished
+        # unbounded: jobs persisted before a restart are all queued again, max_pending only limits submit
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._pending_keys = {}
+        self._durations = deque(maxlen=100)
+        self._condition = threading.Condition()
+        # job files are written outside the condition, one at a time, newest version wins
+        self._write_lock = threading.Lock()
+        self._written_versions = {}
+        self._threads = []
+        self._running = False
+        logger.info(f"ConversionJobQueue created for path: {jobs_path}")
+
+    def start(self):
+        """
+        Load persisted jobs, re-queue the unfinished ones and start the worker threads.
+        """
+        with self._condition:
+            if self._running:
+                logger.warning("Job queue is already running")
+                return
+            self._running = True
+
+        self.jobs_path.mkdir(parents=True, exist_ok=True)
+        self._load_jobs()
+        self._prune()
+
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"conversion-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"ConversionJobQueue started with {self.workers} workers")
+
+    def stop(self):
+        """
+        Stop the worker threads. Jobs still queued are picked up again on the next start.
+        """
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        logger.info("ConversionJobQueue stopped")
+
+    def submit(self, exp: dict) -> Dict:
+        """
+        Queue the conversion of an experiment. An identical pending job is returned instead
+        of queueing the same conversion twice.
+
+        Args:
+            exp: The experiment to convert
+
+        Returns:
+            dict: The job
+
+        Raises:
+            queue.Full: If the queue holds max_pending jobs already
+        """
+        key = hashlib.sha1(json.dumps(exp, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+        with self._condition:
+            job_id = self._pending_keys.get(key)
+            if job_id is not None:
+                logger.info(f"Conversion of {exp.get('id_experiment')} already pending as job {job_id}")
+                return self._public(self._jobs[job_id])
+
+            if self._queue.qsize() >= self.max_pending:
+                raise queue.Full(f"{self.max_pending} conversion jobs are already queued")
+
+            job = {
+                "id": str(uuid.uuid4()),
+                "key": key,
+                "exp_id": exp.get("id_experiment"),
+                "status": JOB_QUEUED,
+                "stage": "queued",
+                "progress": 0.0,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "duration": None,
+                "result": None,
+                "error": None,
+                "version": 0,
+                "experiment": exp,
+            }
+            self._queue.put_nowait(job["id"])
+            self._jobs[job["id"]] = job
+            self._pending_keys[key] = job["id"]
+            version, data, public = job["version"], self._serialize(job), self._public(job)
+        self._write(job["id"], version, data)
+
+        logger.info(f"Conversion job {job['id']} queued for experiment {job['exp_id']}")
+        return public
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def wait_for_update(self, job_id: str, version: int, timeout: float) -> Optional[Dict]:
+        """
+        Block until the job has a version newer than the given one, or until the timeout.
+
+        Returns:
+            dict: The job, or None if it does not exist
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job["version"] > version:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._public(job) if job else None
+
+    def get_stats(self) -> Dict:
+        with self._condition:
+            durations = list(self._durations)
+            statuses = [job["status"] for job in self._jobs.values()]
+            return {
+                "running": self._running,
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "jobs_running": statuses.count(JOB_RUNNING),
+                "jobs_done": statuses.count(JOB_DONE),
+                "jobs_failed": statuses.count(JOB_FAILED),
+                "recent_durations": durations,
+                "average_duration": sum(durations) / len(durations) if durations else None,
+            }
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error(f"Unexpected error running conversion job {job_id}: {str(e)}", exc_info=True)
+
+    def _run(self, job_id: str):
+        with self._condition:
+            job = self._jobs[job_id]
+            exp = job["experiment"]
+        self._update(job, status=JOB_RUNNING, stage="started", started_at=time.time())
+
+        def report(stage, progress):
+            self._update(job, stage=stage, progress=progress)
+
+        try:
+            convert_res = self.convertor_factory().convert(exp, progress=report)
+            if convert_res["success"]:
+                self._finish(job, JOB_DONE, result=convert_res["data"])
+            else:
+                self._finish(job, JOB_FAILED, error=convert_res["error"])
+        except Exception as e:
+            logger.error(f"Error converting experiment {job['exp_id']}: {str(e)}", exc_info=True)
+            self._finish(job, JOB_FAILED, error=str(e))
+
+    def _finish(self, job: dict, status: str, **fields):
+        finished_at = time.time()
+        duration = finished_at - job["started_at"]
+        with self._condition:
+            self._pending_keys.pop(job["key"], None)
+            self._durations.append(duration)
+        self._update(job, status=status, stage=status, progress=1.0,
+                     finished_at=finished_at, duration=duration, experiment=None, **fields)
+        logger.info(f"Conversion job {job['id']} {status} in {duration:.3f}s")
+        self._prune()
+
+    def _update(self, job: dict, **fields):
+        with self._condition:
+            job.update(fields)
+            job["version"] += 1
+            version, data = job["version"], self._serialize(job)
+            self._condition.notify_all()
+        self._write(job["id"], version, data)
+
+    @staticmethod
+    def _serialize(job: dict) -> str:
+        """Snapshot of a job to write, taken with the condition held."""
+        return json.dumps(job, default=str)
+
+    def _write(self, job_id: str, version: int, data: str):
+        """
+        Write a job file through a temporary file so a crash never leaves it half written.
+        A snapshot older than the one already written, by a thread that was overtaken, or of a
+        job dropped meanwhile, is dropped.
+        """
+        path = self.jobs_path / f"{job_id}.json"
+        with self._write_lock:
+            if self._written_versions.get(job_id, -1) >= version or job_id not in self._jobs:
+                return
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._written_versions[job_id] = version
+
+    def _prune(self):
+        """Drop the finished jobs past finished_ttl_seconds or beyond max_finished, oldest first."""
+        expired_before = time.time() - self.finished_ttl_seconds
+        with self._condition:
+            finished = sorted(
+                (job for job in self._jobs.values() if job["status"] in _FINISHED_STATUSES),
+                key=lambda job: job.get("finished_at") or 0,
+            )
+            excess = len(finished) - self.max_finished
+            dropped = [
+                job["id"] for index, job in enumerate(finished)
+                if index < excess or (job.get("finished_at") or 0) < expired_before
+            ]
+            for job_id in dropped:
+                del self._jobs[job_id]
+        if not dropped:
+            return
+        with self._write_lock:
+            for job_id in dropped:
+                self._written_versions.pop(job_id, None)
+                try:
+                    os.remove(self.jobs_path / f"{job_id}.json")
+                except FileNotFoundError:
+                    pass
+        logger.info(f"Dropped {len(dropped)} finished conversion jobs")
+
+    def _load_jobs(self):
+        jobs = []
+        for path in self.jobs_path.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping unreadable job file {path}: {str(e)}")
+
+        # re-queued in the order they were submitted
+        jobs.sort(key=lambda job: job.get("submitted_at") or 0)
+        with self._condition:
+            for job in jobs:
+                self._jobs[job["id"]] = job
+                self._written_versions[job["id"]] = job["version"]
+                if job["status"] in _PENDING_STATUSES:
+                    job.update(status=JOB_QUEUED, stage="queued", progress=0.0)
+                    self._pending_keys[job["key"]] = job["id"]
+                    self._queue.put_nowait(job["id"])
+                    logger.info(f"Re-queued conversion job {job['id']}")
+            if self._queue.qsize() > self.max_pending:
+                logger.warning(f"{self._queue.qsize()} conversion jobs re-queued, more than the {self.max_pending} accepted by submit")
+
+    @staticmethod
+    def _public(job: dict) -> Dict:
+        return {k: v for k, v in job.items() if k not in ("key", "experiment")}
+
+
+# Global job queue instance
+_job_queue_instance: "ConversionJobQueue | None" = None
+
+
+def initialize_job_queue(jobs_path: str, convertor_factory: Callable, workers: int = 2, max_pending: int = 100,
+                         finished_ttl_seconds: float = 24 * 3600, max_finished: int = 1000) -> "ConversionJobQueue":
+    """
+    Initialize the global job queue instance.
+
+    Args:
+        jobs_path: Directory where the job files are stored
+        convertor_factory: Callable returning a fresh ConvertorHandler for each job
+        workers: Number of worker threads running conversions
+        max_pending: Maximum number of queued jobs before submissions are rejected
+        finished_ttl_seconds: How long a finished job is kept
+        max_finished: Maximum number of finished jobs kept
+
+    Returns:
+        ConversionJobQueue: The initialized job queue
+    """
+    global _job_queue_instance
+
+    if _job_queue_instance is not None:
+        logger.warning("Job queue already initialized, returning existing instance")
+        return _job_queue_instance
+
+    _job_queue_instance = ConversionJobQueue(jobs_path, convertor_factory, workers, max_pending,
+                                             finished_ttl_seconds, max_finished)
+    return _job_queue_instance
+
+
+def get_job_queue() -> "ConversionJobQueue | None":
+    """
+    Get the global job queue instance.
+
+    Returns:
+        ConversionJobQueue: The job queue instance, or None if not initialized
+    """
+    return _job_queue_instance
@@ -0,0 +1,24 @@
+from .paths import resolve_data_path
+from .column_cache import ColumnCache
+from .result_store import ResultStore
+from .registry import DatasetRegistry, index_csv
+from .preview import preview_csv
+from .uploads import UploadManager, UploadError, UploadConflict
+from .aggregation import RunningStats, aggregate, aggregate_csv_in_chunks, validate_operations, quantile_of
+
+__all__ = [
+    'resolve_data_path',
+    'ColumnCache',
+    'ResultStore',
+    'DatasetRegistry',
+    'index_csv',
+    'preview_csv',
+    'UploadManager',
+    'UploadError',
+    'UploadConflict',
+    'RunningStats',
+    'aggregate',
+    'aggregate_csv_in_chunks',
+    'validate_operations',
+    'quantile_of',
+]
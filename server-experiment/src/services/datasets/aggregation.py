@@ -0,0 +1,273 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+
+# aggregations that RunningStats can compute from partial states
+MERGEABLE_OPERATIONS = ("mean", "sum", "min", "max", "count", "var", "std")
+
+# numpy dtype kinds aggregated with numpy, other columns (text) are left to pandas
+_NUMERIC_KINDS = "biuf"
+
+
+def _combined_kind(first: Optional[str], second: Optional[str]) -> Optional[str]:
+    """Dtype kind of a column made of chunks of two kinds, as pandas would parse it at once."""
+    if first is None or first == second:
+        return second
+    if second is None:
+        return first
+    if "f" in (first, second):
+        return "f"
+    return "i"
+
+
+def _native(value, kind: Optional[str]):
+    """A sum, min or max as the Python type of the column: bool, int or float."""
+    if kind == "b":
+        return bool(value)
+    if kind in ("i", "u"):
+        return int(value)
+    return float(value)
+
+
+class RunningStats:
+    """
+    Mergeable partial aggregation state of a numeric column: count, sum, min, max, and
+    mean and variance kept with Welford's method. Chunks are folded in with the pairwise
+    update of Chan et al., so the state of any split of the data merges to the same result.
+
+    The dtype kind of the chunks is kept too, so that sum, min and max of an integer or
+    boolean column are integers or booleans, as pandas returns them.
+    """
+
+    __slots__ = ("count", "sum", "min", "max", "mean", "m2", "kind")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.kind = None
+
+    def update(self, values) -> "RunningStats":
+        """
+        Fold a chunk of values in, ignoring NaN like pandas does.
+
+        Raises:
+            TypeError: If the values are not numeric
+        """
+        values = np.asarray(values)
+        kind = "i" if values.dtype.kind == "u" else values.dtype.kind
+        if kind not in _NUMERIC_KINDS:
+            raise TypeError(f"Cannot aggregate {values.dtype} values in chunks")
+        if kind == "f":
+            values = values[~np.isnan(values)]
+        chunk = RunningStats()
+        chunk.kind = kind
+        if values.size:
+            chunk.count = int(values.size)
+            chunk.sum = values.sum().item()
+            chunk.min = values.min().item()
+            chunk.max = values.max().item()
+            chunk.mean = chunk.sum / chunk.count
+            chunk.m2 = float(np.square(values.astype(np.float64) - chunk.mean).sum())
+        return self.merge(chunk)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Fold another partial state in."""
+        # a chunk of missing values only still makes an integer column float, as in pandas
+        kind = _combined_kind(self.kind, other.kind)
+        if other.count == 0:
+            self.kind = kind
+            return self
+        if self.count == 0:
+            for name in self.__slots__:
+                setattr(self, name, getattr(other, name))
+            self.kind = kind
+            return self
+        self.kind = kind
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def variance(self, ddof: int = 1) -> float:
+        if self.count <= ddof:
+            return math.nan
+        return self.m2 / (self.count - ddof)
+
+    def result(self, operation: str):
+        """
+        Value of an aggregation over everything folded in so far.
+
+        Raises:
+            ValueError: If the operation is not supported
+        """
+        if operation == "sum":
+            return _native(self.sum, "i" if self.kind == "b" else self.kind)
+        if operation == "count":
+            return self.count
+        if self.count == 0:
+            return math.nan
+        if operation == "mean":
+            return self.mean
+        if operation == "min":
+            return _native(self.min, self.kind)
+        if operation == "max":
+            return _native(self.max, self.kind)
+        if operation == "var":
+            return self.variance()
+        if operation == "std":
+            return math.sqrt(self.variance())
+        raise ValueError(f"Unsupported operation: {operation}")
+
+
+def aggregate_csv_in_chunks(file_path, field: str, chunk_rows: int) -> Optional[RunningStats]:
+    """
+    Fold one column of a CSV into running statistics, reading chunk_rows rows at a time.
+
+    Returns:
+        RunningStats: The statistics of the column, or None if it is not numeric
+    """
+    stats = RunningStats()
+    for chunk in pd.read_csv(file_path, usecols=[field], chunksize=chunk_rows):
+        values = chunk[field]
+        if not pd.api.types.is_numeric_dtype(values.dtype):
+            return None
+        stats.update(values.to_numpy())
+    return stats
+
+
+def quantile_of(operation: str) -> Optional[float]:
+    """
+    Quantile requested by an operation name, "median" or a percentile such as "p95" or
+    "p99.9", or None if the operation is not a quantile.
+
+    Raises:
+        ValueError: If the percentile is out of range
+    """
+    if operation == "median":
+        return 0.5
+    if len(operation) > 1 and operation[0] == "p":
+        try:
+            percent = float(operation[1:])
+        except ValueError:
+            return None
+        if not 0 <= percent <= 100:
+            raise ValueError(f"Percentile out of range: {operation}")
+        return percent / 100
+    return None
+
+
+def validate_operations(operations: Sequence[str]) -> List[str]:
+    """
+    Normalized list of operations, without duplicates and in the requested order.
+
+    Raises:
+        ValueError: If an operation is not supported
+    """
+    validated = []
+    for operation in operations:
+        operation = str(operation).strip().lower()
+        if not operation or operation in validated:
+            continue
+        if operation not in MERGEABLE_OPERATIONS and quantile_of(operation) is None:
+            raise ValueError(f"Unsupported operation: {operation}")
+        validated.append(operation)
+    return validated
+
+
+def aggregate(values, operations: Sequence[str]) -> Dict[str, Any]:
+    """
+    Compute several aggregations of a column at once, ignoring NaN like pandas does.
+
+    The column is read once to drop missing values, the shared intermediates (count,
+    sum, mean) are computed only once, and all quantiles come from one np.quantile call,
+    so asking for more statistics costs little more than asking for one.
+
+    Sum, min and max keep the dtype of the column, integers stay integers. Text columns
+    are aggregated by pandas, with the results (or errors) of pandas.
+
+    Args:
+        values: Column, possibly memory-mapped
+        operations: Validated operation names, see validate_operations
+
+    Returns:
+        Mapping of operation name to value, in the order of operations
+
+    Raises:
+        TypeError: If an operation does not apply to the values, e.g. the mean of text
+    """
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    if kind not in _NUMERIC_KINDS:
+        return _aggregate_series(values, operations)
+    valid = values[~np.isnan(values)] if kind == "f" else values
+    count = int(valid.size)
+
+    results = {}
+    quantiles = {}
+    total = mean = variance = None
+    for operation in operations:
+        if operation == "count":
+            results[operation] = count
+            continue
+        if operation == "sum":
+            if total is None:
+                total = valid.sum().item()
+            results[operation] = _native(total, "i" if kind == "b" else kind)
+            continue
+        q = quantile_of(operation)
+        if q is not None:
+            quantiles[operation] = q
+            results[operation] = math.nan
+            continue
+        if count == 0:
+            results[operation] = math.nan
+            continue
+        if operation == "min":
+            results[operation] = _native(valid.min(), kind)
+        elif operation == "max":
+            results[operation] = _native(valid.max(), kind)
+        else:
+            if total is None:
+                total = valid.sum().item()
+            mean = total / count
+            if operation == "mean":
+                results[operation] = mean
+                continue
+            if variance is None:
+                variance = float(np.square(valid.astype(np.float64) - mean).sum()) / (count - 1) if count > 1 else math.nan
+            results[operation] = variance if operation == "var" else math.sqrt(variance)
+
+    if quantiles and count > 0:
+        points = np.quantile(valid, list(quantiles.values()))
+        for operation, value in zip(quantiles, points):
+            results[operation] = float(value)
+    return results
+
+
+def _aggregate_series(values: np.ndarray, operations: Sequence[str]) -> Dict[str, Any]:
+    """
+    Aggregations of a text column by pandas. Missing values are None, or empty strings in
+    the copies built before text was stored as bytes.
+    """
+    series = pd.Series(values, dtype=object).replace("", np.nan)
+    results = {}
+    for operation in operations:
+        q = quantile_of(operation)
+        if q is not None:
+            results[operation] = series.quantile(q)
+        elif operation == "count":
+            results[operation] = int(series.count())
+        else:
+            results[operation] = getattr(series, operation)()
+    return results
@@ -0,0 +1,288 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from config.logging_config import get_logger
+from .paths import resolve_data_path
+
+logger = get_logger(__name__)
+
+_MANIFEST = "manifest.json"
+
+
+class ColumnCache:
+    """
+    Keeps a columnar copy of the CSV files in the data directory. Each CSV is parsed once,
+    in chunks, into one .npy file per column, which later reads memory-map instead of
+    parsing the CSV. Text columns are stored as the UTF-8 bytes of all values, with the
+    offsets of every value and a mask of the missing ones, so a long value costs its own
+    length only. A copy is rebuilt whenever the size or modification time of its CSV changes.
+    """
+
+    def __init__(self, data_path: str, cache_path: str = None, chunk_rows: int = 100000):
+        """
+        Initialize the cache.
+
+        Args:
+            data_path: Directory holding the CSV files
+            cache_path: Directory holding the columnar copies (default: <data_path>/.columns)
+            chunk_rows: Number of rows parsed at a time while building a copy
+        """
+        self.data_path = Path(data_path)
+        self.cache_path = Path(cache_path) if cache_path else self.data_path / ".columns"
+        self.chunk_rows = chunk_rows
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def get_columns(self, file_name: str) -> List[str]:
+        """Names of the columns of a CSV file, in file order."""
+        return list(self._manifest(file_name)["columns"])
+
+    def get_column(self, file_name: str, column: str) -> np.ndarray:
+        """
+        Read-only, memory-mapped values of one column. The values of a text column are
+        decoded into an object array, with None for the missing values.
+
+        Raises:
+            KeyError: If the column does not exist
+        """
+        manifest = self._manifest(file_name)
+        entry = manifest["columns"][column]
+        entry_dir = self._entry_dir(file_name)
+        values = np.load(entry_dir / entry["file"], mmap_mode="r", allow_pickle=False)
+        if "offsets" not in entry:
+            return values
+        offsets = np.load(entry_dir / entry["offsets"], mmap_mode="r", allow_pickle=False)
+        nulls = np.load(entry_dir / entry["nulls"], mmap_mode="r", allow_pickle=False)
+        return _decode_text(values, offsets, nulls)
+
+    def invalidate(self, file_name: str):
+        """Drop the columnar copy of a file."""
+        with self._lock_for(file_name):
+            shutil.rmtree(self._entry_dir(file_name), ignore_errors=True)
+
+    def _manifest(self, file_name: str) -> Dict:
+        source = resolve_data_path(self.data_path, file_name)
+        if source is None:
+            raise FileNotFoundError(f"No dataset {file_name} in {self.data_path}")
+        source = Path(source)
+        stat = source.stat()
+        manifest = self._read_manifest(file_name)
+        if self._is_fresh(manifest, stat):
+            return manifest
+
+        with self._lock_for(file_name):
+            # another thread may have rebuilt it while this one waited
+            manifest = self._read_manifest(file_name)
+            if self._is_fresh(manifest, stat):
+                return manifest
+            return self._build(file_name, source, stat)
+
+    def _build(self, file_name: str, source: Path, stat: os.stat_result) -> Dict:
+        logger.info(f"Building columnar cache for {file_name}")
+        entry_dir = self._entry_dir(file_name)
+        work_path = entry_dir.with_name(f"{entry_dir.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            writer = ColumnWriter(work_path)
+            try:
+                for chunk in pd.read_csv(source, chunksize=self.chunk_rows):
+                    writer.append(chunk)
+            except pd.errors.EmptyDataError:
+                pass
+            columns_dir, manifest = writer.finish(stat)
+            return self._install(file_name, columns_dir, manifest)
+        finally:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    def install(self, file_name: str, columns_dir: Path, manifest: Dict) -> Dict:
+        """
+        Install a columnar copy built elsewhere, e.g. by a ColumnWriter while the CSV was
+        being written. The manifest must carry the size and mtime of the finished CSV.
+        """
+        with self._lock_for(file_name):
+            return self._install(file_name, columns_dir, manifest)
+
+    def _install(self, file_name: str, tmp_dir: Path, manifest: Dict) -> Dict:
+        with open(tmp_dir / _MANIFEST, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        # swap the whole directory so readers never see a half-written copy
+        entry_dir = self._entry_dir(file_name)
+        entry_dir.parent.mkdir(parents=True, exist_ok=True)
+        old_dir = entry_dir.with_name(f"{entry_dir.name}.{uuid.uuid4().hex}.old")
+        if entry_dir.exists():
+            entry_dir.rename(old_dir)
+        tmp_dir.rename(entry_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return manifest
+
+    def _read_manifest(self, file_name: str):
+        try:
+            with open(self._entry_dir(file_name) / _MANIFEST, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_fresh(manifest, stat: os.stat_result) -> bool:
+        return (
+            manifest is not None
+            and manifest["size"] == stat.st_size
+            and manifest["mtime_ns"] == stat.st_mtime_ns
+        )
+
+    def _entry_dir(self, file_name: str) -> Path:
+        return self.cache_path / file_name
+
+    def _lock_for(self, file_name: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(file_name, threading.Lock())
+
+
+class ColumnWriter:
+    """
+    Builds the columnar copy of a CSV from chunks parsed elsewhere. Each chunk is saved
+    as one part per column; finish() joins the parts into the final column files through
+    memory-mapped output, so the whole file is never held in memory.
+    """
+
+    def __init__(self, work_path: str):
+        self.work_path = Path(work_path)
+        self.work_path.mkdir(parents=True, exist_ok=True)
+        self.columns = []
+        self.parts = []
+        self.rows = 0
+
+    def append(self, chunk: pd.DataFrame):
+        if not self.columns:
+            self.columns = [str(column) for column in chunk.columns]
+        index = len(self.parts)
+        part = []
+        for position, column in enumerate(chunk.columns):
+            values = chunk[column]
+            path = self.work_path / f"p{index}_{position}.npy"
+            if _is_text(values):
+                data, lengths, nulls = _encode_text(values)
+                np.save(path, data, allow_pickle=False)
+                np.save(path.with_suffix(".lengths.npy"), lengths, allow_pickle=False)
+                np.save(path.with_suffix(".nulls.npy"), nulls, allow_pickle=False)
+                part.append((path, _TEXT))
+            else:
+                values = values.to_numpy()
+                np.save(path, values, allow_pickle=False)
+                part.append((path, values.dtype))
+        self.parts.append((len(chunk), part))
+        self.rows += len(chunk)
+
+    def finish(self, source_stat: os.stat_result) -> Tuple[Path, Dict]:
+        """
+        Join the parts into one .npy file per column, three for a text column.
+
+        Returns:
+            tuple: The directory of the columns, to pass to ColumnCache.install, and its manifest
+        """
+        columns_dir = self.work_path / "columns"
+        columns_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {"size": source_stat.st_size, "mtime_ns": source_stat.st_mtime_ns, "rows": self.rows, "columns": {}}
+        for position, column in enumerate(self.columns):
+            parts = [(rows, part[position]) for rows, part in self.parts]
+            # a column with text in any chunk is text, as if pandas had parsed the file at once
+            if any(dtype is _TEXT for _, (_, dtype) in parts):
+                manifest["columns"][column] = self._join_text(columns_dir, position, parts)
+            else:
+                manifest["columns"][column] = self._join_values(columns_dir, position, parts)
+        for _, part in self.parts:
+            for path, dtype in part:
+                path.unlink(missing_ok=True)
+                if dtype is _TEXT:
+                    path.with_suffix(".lengths.npy").unlink()
+                    path.with_suffix(".nulls.npy").unlink()
+        return columns_dir, manifest
+
+    def _join_values(self, columns_dir: Path, position: int, parts) -> Dict:
+        dtypes = [dtype for _, (_, dtype) in parts]
+        dtype = np.result_type(*dtypes) if dtypes else np.dtype("float64")
+        if len(parts) == 1 and dtypes[0] == dtype:
+            # read in one chunk, the part already is the column
+            os.replace(parts[0][1][0], columns_dir / f"c{position}.npy")
+            return {"file": f"c{position}.npy", "dtype": str(dtype)}
+        output = np.lib.format.open_memmap(columns_dir / f"c{position}.npy", mode="w+", dtype=dtype, shape=(self.rows,))
+        offset = 0
+        for rows, (path, _) in parts:
+            output[offset:offset + rows] = np.load(path, allow_pickle=False)
+            offset += rows
+        output.flush()
+        del output
+        return {"file": f"c{position}.npy", "dtype": str(dtype)}
+
+    def _join_text(self, columns_dir: Path, position: int, parts) -> Dict:
+        # the parts parsed as numbers are encoded first, their sizes are needed up front
+        encoded = []
+        for rows, (path, dtype) in parts:
+            if dtype is _TEXT:
+                encoded.append((path, path.with_suffix(".lengths.npy"), path.with_suffix(".nulls.npy")))
+            else:
+                data, lengths, nulls = _encode_text(pd.Series(np.load(path, allow_pickle=False)))
+                paths = (path.with_suffix(".text.npy"), path.with_suffix(".text_lengths.npy"), path.with_suffix(".text_nulls.npy"))
+                for file_path, array in zip(paths, (data, lengths, nulls)):
+                    np.save(file_path, array, allow_pickle=False)
+                encoded.append(paths)
+        size = sum(np.load(data_path, mmap_mode="r").size for data_path, _, _ in encoded)
+
+        entry = {"file": f"c{position}.npy", "offsets": f"c{position}.offsets.npy", "nulls": f"c{position}.nulls.npy", "dtype": "text"}
+        data = np.lib.format.open_memmap(columns_dir / entry["file"], mode="w+", dtype=np.uint8, shape=(size,))
+        offsets = np.lib.format.open_memmap(columns_dir / entry["offsets"], mode="w+", dtype=np.int64, shape=(self.rows + 1,))
+        nulls = np.lib.format.open_memmap(columns_dir / entry["nulls"], mode="w+", dtype=np.bool_, shape=(self.rows,))
+        offsets[0] = 0
+        row = byte = 0
+        for data_path, lengths_path, nulls_path in encoded:
+            part_data = np.load(data_path, allow_pickle=False)
+            lengths = np.load(lengths_path, allow_pickle=False)
+            data[byte:byte + part_data.size] = part_data
+            offsets[row + 1:row + 1 + lengths.size] = byte + np.cumsum(lengths)
+            nulls[row:row + lengths.size] = np.load(nulls_path, allow_pickle=False)
+            row += lengths.size
+            byte += part_data.size
+        for array in (data, offsets, nulls):
+            array.flush()
+        del data, offsets, nulls
+        for rows, (path, dtype) in parts:
+            if dtype is not _TEXT:
+                for file_path in (path.with_suffix(".text.npy"), path.with_suffix(".text_lengths.npy"), path.with_suffix(".text_nulls.npy")):
+                    file_path.unlink()
+        return entry
+
+
+# dtype of the parts holding text
+_TEXT = "text"
+
+
+def _is_text(values: pd.Series) -> bool:
+    return values.dtype == object or str(values.dtype).startswith(("string", "category"))
+
+
+def _encode_text(values: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    UTF-8 bytes of all values of a column, the length of every value and the mask of the
+    missing values, whose length is 0.
+    """
+    nulls = values.isna().to_numpy(dtype=np.bool_)
+    encoded = [b"" if null else str(value).encode("utf-8") for value, null in zip(values.tolist(), nulls.tolist())]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), lengths, nulls
+
+
+def _decode_text(data: np.ndarray, offsets: np.ndarray, nulls: np.ndarray) -> np.ndarray:
+    buffer = data.tobytes()
+    bounds = offsets.tolist()
+    values = np.empty(len(nulls), dtype=object)
+    values[:] = [
+        None if null else buffer[start:end].decode("utf-8")
+        for start, end, null in zip(bounds, bounds[1:], nulls.tolist())
+    ]
+    return values
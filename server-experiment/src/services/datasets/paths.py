@@ -0,0 +1,17 @@
+import os
+from typing import Optional
+
+
+def resolve_data_path(data_path, file_name: str) -> Optional[str]:
+    """
+    Absolute path of a file name inside the data directory, or None if it leads outside of
+    it (through '..', an absolute name or a symlink) or into one of its hidden directories,
+    which hold the caches. The file does not have to exist.
+    """
+    root = os.path.realpath(data_path)
+    path = os.path.realpath(os.path.join(root, file_name))
+    if path == root or os.path.commonpath([root, path]) != root:
+        return None
+    if any(part.startswith(".") for part in os.path.relpath(path, root).split(os.sep)):
+        return None
+    return path
@@ -0,0 +1,101 @@
+import csv
+import io
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+# files up to this size are sampled exactly by reading every line once
+EXACT_SAMPLE_LIMIT_BYTES = 8 * 1024 * 1024
+
+
+def preview_csv(file_path: str, head_rows: int = 20, sample_rows: int = 20, seed: Optional[int] = None,
+                exact_limit_bytes: int = EXACT_SAMPLE_LIMIT_BYTES) -> Dict[str, Any]:
+    """
+    Header, first rows and a uniform random sample of the rows of a CSV, reading only a
+    small part of large files.
+
+    Files up to exact_limit_bytes are sampled with a reservoir over all their lines. Larger
+    files are sampled by seeking to random byte offsets and taking the line after each, so
+    the cost depends on the number of sampled rows, not on the size of the file. Rows are
+    then picked with a probability proportional to the length of the line before them,
+    which is close to uniform for the fairly regular lines of data files. Quoted values
+    spanning several lines are not supported by the seeking sampler.
+
+    Args:
+        file_path: Path of the CSV file
+        head_rows: Number of rows to return from the start of the file
+        sample_rows: Number of rows to sample
+        seed: Seed of the sampling, for repeatable previews
+
+    Returns:
+        dict: The columns, the first rows, the sampled rows and the sampling method
+    """
+    rng = random.Random(seed)
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        head = []
+        while len(head) < head_rows:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                head.append(line)
+        head_end = f.tell()
+
+        if size <= exact_limit_bytes:
+            method = "reservoir"
+            f.seek(data_start)
+            sample = _reservoir(f, sample_rows, rng)
+        else:
+            method = "offsets"
+            sample = _sample_offsets(f, data_start, size, sample_rows, rng)
+
+    return {
+        "columns": _parse([header])[0] if header.strip() else [],
+        "head": _parse(head),
+        "sample": _parse(sample),
+        "method": method,
+        "size": size,
+        "complete": size == head_end,
+    }
+
+
+def _reservoir(f, count: int, rng: random.Random) -> List[bytes]:
+    """Algorithm R over the remaining lines of a file, kept in file order."""
+    reservoir = []
+    for index, line in enumerate(line for line in f if line.strip()):
+        if index < count:
+            reservoir.append((index, line))
+        else:
+            position = rng.randint(0, index)
+            if position < count:
+                reservoir[position] = (index, line)
+    return [line for _, line in sorted(reservoir)]
+
+
+def _sample_offsets(f, data_start: int, size: int, count: int, rng: random.Random) -> List[bytes]:
+    """Lines following random byte offsets, each line at most once, kept in file order."""
+    lines = {}
+    attempts = 0
+    while len(lines) < count and attempts < count * 4:
+        attempts += 1
+        f.seek(rng.randrange(data_start - 1, size))
+        # the partial line at the offset belongs to the previous row
+        f.readline()
+        line_start = f.tell()
+        line = f.readline()
+        if not line:
+            # past the last line, wrap around to the first data row
+            f.seek(data_start)
+            line_start = data_start
+            line = f.readline()
+        if line.strip():
+            lines[line_start] = line
+    return [lines[offset] for offset in sorted(lines)]
+
+
+def _parse(lines: List[bytes]) -> List[List[str]]:
+    text = b"".join(line if line.endswith(b"\n") else line + b"\n" for line in lines)
+    return list(csv.reader(io.StringIO(text.decode("utf-8", errors="replace"))))
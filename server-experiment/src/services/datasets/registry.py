@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from config.logging_config import get_logger
+from .aggregation import RunningStats
+from .paths import resolve_data_path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = get_logger(__name__)
+
+DATASET_EXTENSIONS = (".csv",)
+
+
+class HashingReader:
+    """File object wrapper hashing every byte read through it, so a file can be parsed and checksummed in one pass."""
+
+    def __init__(self, raw, digest=None):
+        self.raw = raw
+        self.digest = digest or hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.digest.update(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self.raw.readline(size)
+        self.digest.update(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def finish(self) -> str:
+        """Hash whatever the parser did not read, and return the checksum."""
+        for block in iter(lambda: self.raw.read(1024 * 1024), b""):
+            self.digest.update(block)
+        return self.digest.hexdigest()
+
+
+class SchemaBuilder:
+    """
+    Folds chunks of a CSV into its schema: column names, dtypes, row count and per-column
+    statistics. Numeric columns get running count, min, max, mean and std, other columns
+    the number of missing values and the longest value.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def update(self, chunk: pd.DataFrame):
+        self.rows += len(chunk)
+        for name in chunk.columns:
+            values = chunk[name]
+            column = self.columns.setdefault(str(name), {"kind": None, "nulls": 0, "stats": RunningStats(), "max_length": 0})
+            column["nulls"] += int(values.isna().sum())
+            kind = "numeric" if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype) else str(values.dtype)
+            # a column is numeric only if every chunk parsed as numbers
+            if column["kind"] is None or column["kind"] == kind:
+                column["kind"] = kind
+            elif "numeric" in (column["kind"], kind):
+                column["kind"] = "object"
+            if kind == "numeric":
+                column["stats"].update(values.to_numpy(dtype=np.float64, na_value=np.nan))
+                column["dtype"] = self._wider(column.get("dtype"), str(values.dtype))
+            else:
+                lengths = values.dropna().astype(str).str.len()
+                if len(lengths):
+                    column["max_length"] = max(column["max_length"], int(lengths.max()))
+                column["dtype"] = str(values.dtype)
+
+    def schema(self) -> Dict[str, Any]:
+        columns = []
+        for name, column in self.columns.items():
+            entry = {"name": name, "dtype": column["dtype"] if column["kind"] == "numeric" else "object", "nulls": column["nulls"]}
+            if column["kind"] == "numeric":
+                stats = column["stats"]
+                bound = int if column["dtype"].startswith(("int", "uint")) else float
+                entry.update({
+                    "min": self._number(stats.result("min"), bound),
+                    "max": self._number(stats.result("max"), bound),
+                    "mean": self._number(stats.result("mean")),
+                    "std": self._number(stats.result("std")),
+                })
+            else:
+                entry["max_length"] = column["max_length"]
+            columns.append(entry)
+        return {"rows": self.rows, "columns": columns}
+
+    @staticmethod
+    def _wider(current: Optional[str], dtype: str) -> str:
+        if current is None or current == dtype:
+            return dtype
+        return "float64"
+
+    @staticmethod
+    def _number(value, cast=float):
+        return None if value is None or np.isnan(value) else cast(value)
+
+
+def index_csv(file_obj, chunk_rows: int = 100000, on_chunk=None) -> Dict[str, Any]:
+    """
+    Build the schema, statistics and SHA-256 checksum of a CSV in one streaming pass.
+
+    Args:
+        file_obj: Binary file object positioned at the start of the CSV
+        chunk_rows: Number of rows parsed at a time
+        on_chunk: Optional callable receiving every parsed chunk, to do more work in the same pass
+
+    Returns:
+        dict: The checksum, row count and columns of the CSV
+    """
+    reader = HashingReader(file_obj)
+    builder = SchemaBuilder()
+    try:
+        for chunk in pd.read_csv(reader, chunksize=chunk_rows):
+            builder.update(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+    except pd.errors.EmptyDataError:
+        pass
+    return {"checksum": reader.finish(), **builder.schema()}
+
+
+class DatasetRegistry:
+    """
+    Index of the datasets in the data directory: per file its size, checksum, row count,
+    columns with dtypes and cheap statistics. A file is indexed once and again only after
+    its size or modification time changes, so lookups cost a stat call. The index is kept
+    in <data_path>/.registry.json across restarts.
+
+    Several processes may share the index file (the execution service and the workers of
+    the experiment runner): every save merges the entries on disk with its own, under a
+    lock on <index file>.lock where the platform has fcntl.
+    """
+
+    def __init__(self, data_path: str, index_path: str = None, chunk_rows: int = 100000):
+        """
+        Initialize the registry.
+
+        Args:
+            data_path: Directory holding the datasets
+            index_path: File holding the index (default: <data_path>/.registry.json)
+            chunk_rows: Number of rows parsed at a time while indexing
+        """
+        self.data_path = Path(data_path)
+        self.index_path = Path(index_path) if index_path else self.data_path / ".registry.json"
+        self.chunk_rows = chunk_rows
+        self._entries = self._load()
+        # names removed since the last save, not taken back from the file on disk
+        self._removed = set()
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """
+        Bring the index up to date with the data directory, indexing only new and changed files.
+
+        Returns:
+            dict: The names of the added, updated and removed datasets
+        """
+        changes = {"added": [], "updated": [], "removed": []}
+        present = set()
+        try:
+            with os.scandir(self.data_path) as entries:
+                files = [
+                    entry for entry in entries
+                    if entry.is_file() and not entry.name.startswith(".") and entry.name.lower().endswith(DATASET_EXTENSIONS)
+                ]
+        except FileNotFoundError:
+            files = []
+
+        for entry in files:
+            present.add(entry.name)
+            known = self._entries.get(entry.name)
+            if self._is_fresh(known, entry.stat()):
+                continue
+            if self._index(entry.name) is not None:
+                changes["updated" if known else "added"].append(entry.name)
+
+        with self._lock:
+            for name in [name for name in self._entries if name not in present]:
+                del self._entries[name]
+                self._removed.add(name)
+                changes["removed"].append(name)
+            if changes["removed"]:
+                self._save()
+        if any(changes.values()):
+            logger.info(f"Dataset registry refreshed: {changes}")
+        return changes
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of all datasets, without the column statistics."""
+        self.refresh()
+        with self._lock:
+            return [
+                {
+                    "name": entry["name"],
+                    "size": entry["size"],
+                    "rows": entry["rows"],
+                    "columns": [column["name"] for column in entry["columns"]],
+                    "checksum": entry["checksum"],
+                    "indexed_at": entry["indexed_at"],
+                }
+                for entry in sorted(self._entries.values(), key=lambda entry: entry["name"])
+            ]
+
+    def get(self, file_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Index entry of a dataset, re-indexed first if it changed, or None if it does not exist
+        or its name leads outside the data directory.
+        """
+        path = resolve_data_path(self.data_path, file_name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            self.forget(file_name)
+            return None
+        with self._lock:
+            entry = self._entries.get(file_name)
+        if self._is_fresh(entry, stat):
+            return entry
+        return self._index(file_name)
+
+    def get_columns(self, file_name: str) -> Optional[List[str]]:
+        entry = self.get(file_name)
+        return [column["name"] for column in entry["columns"]] if entry else None
+
+    def register(self, file_name: str, index: Dict[str, Any]):
+        """Store an index built elsewhere, e.g. while the file was being written."""
+        stat = (self.data_path / file_name).stat()
+        entry = {"name": file_name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "indexed_at": time.time(), **index}
+        with self._lock:
+            self._entries[file_name] = entry
+            self._removed.discard(file_name)
+            self._save()
+        return entry
+
+    def forget(self, file_name: str):
+        with self._lock:
+            if self._entries.pop(file_name, None) is not None:
+                self._removed.add(file_name)
+                self._save()
+
+    def _index(self, file_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            file_lock = self._locks.setdefault(file_name, threading.Lock())
+        with file_lock:
+            path = self.data_path / file_name
+            try:
+                stat = path.stat()
+                with self._lock:
+                    entry = self._entries.get(file_name)
+                # another thread may have indexed it while this one waited
+                if self._is_fresh(entry, stat):
+                    return entry
+                started = time.perf_counter()
+                with open(path, "rb") as f:
+                    index = index_csv(f, self.chunk_rows)
+            except (OSError, ValueError, pd.errors.ParserError) as e:
+                logger.error(f"Could not index dataset {file_name}: {str(e)}")
+                return None
+            logger.info(f"Indexed dataset {file_name} ({index['rows']} rows) in {time.perf_counter() - started:.3f}s")
+            entry = {"name": file_name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "indexed_at": time.time(), **index}
+            with self._lock:
+                self._entries[file_name] = entry
+                self._removed.discard(file_name)
+                self._save()
+            return entry
+
+    @staticmethod
+    def _is_fresh(entry, stat: os.stat_result) -> bool:
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return {entry["name"]: entry for entry in json.load(f)}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        """
+        Merge the index with the file on disk and write it through a temporary file of its
+        own, called with the lock held. The index stays in memory if the file cannot be written.
+        """
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path.with_name(self.index_path.name + ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._merge(self._load())
+                fd, tmp_path = tempfile.mkstemp(prefix=self.index_path.name, suffix=".tmp", dir=self.index_path.parent)
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(list(self._entries.values()), f)
+                    os.replace(tmp_path, self.index_path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            self._removed.clear()
+        except OSError as e:
+            logger.warning(f"Could not save the dataset registry {self.index_path}: {str(e)}")
+
+    def _merge(self, saved: Dict[str, Dict[str, Any]]):
+        """Take the entries another process saved, unless removed here or older than the own ones."""
+        for name, entry in saved.items():
+            if name in self._removed:
+                continue
+            known = self._entries.get(name)
+            if known is None or entry.get("indexed_at", 0) > known.get("indexed_at", 0):
+                self._entries[name] = entry
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class ResultStore:
+    """
+    Memoizes execution results on disk. A result is keyed by the content of its input
+    file, the input column, the operations and the engine version, so an unchanged run
+    is answered without touching the data again.
+
+    Entries are small JSON files. When their total size exceeds max_bytes the least
+    recently used ones are evicted; the order survives restarts through the file mtimes.
+    """
+
+    def __init__(self, store_path: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the store.
+
+        Args:
+            store_path: Directory holding the entries
+            max_bytes: Maximum total size of the entries
+        """
+        self.store_path = Path(store_path)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "saved_seconds": 0.0}
+        self._load()
+
+    def key(self, fingerprint: str, column: str, operations: Sequence[str], engine_version: str) -> str:
+        """Key of a result, from the content fingerprint (checksum) of the input file."""
+        payload = [fingerprint, column, list(operations), engine_version]
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored entry of a key, or None. Counts a hit or a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats["misses"] += 1
+                self._forget(key)
+            return None
+
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["saved_seconds"] += entry.get("compute_seconds", 0.0)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Store an entry and evict the least recently used ones beyond max_bytes."""
+        data = json.dumps(entry, default=str).encode("utf-8")
+        if len(data) > self.max_bytes:
+            logger.info(f"Result {key} is larger than the store, not stored")
+            return
+
+        self.store_path.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self._stats["evictions"] += 1
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _load(self):
+        """Index the entries left by a previous process, least recently used first."""
+        if not self.store_path.is_dir():
+            return
+        entries = []
+        for path in self.store_path.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._bytes += size
+        logger.info(f"ResultStore loaded {len(self._entries)} entries ({self._bytes} bytes) from {self.store_path}")
+
+    def _path(self, key: str) -> Path:
+        return self.store_path / f"{key}.json"
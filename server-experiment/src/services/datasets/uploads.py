@@ -0,0 +1,300 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+import pandas as pd
+from config.logging_config import get_logger
+from .column_cache import ColumnCache, ColumnWriter
+from .registry import DATASET_EXTENSIONS, DatasetRegistry, SchemaBuilder
+
+logger = get_logger(__name__)
+
+UPLOAD_PENDING = "pending"
+
+
+class UploadError(ValueError):
+    """Raised when an upload request is invalid."""
+
+
+class UploadConflict(UploadError):
+    """Raised when a chunk does not continue the upload, or the dataset already exists."""
+
+
+class UploadSession:
+    """
+    In-memory state of an upload that lets the data be indexed while it arrives: the
+    running checksum of the whole file, the schema and the columnar parts built so far,
+    and the incomplete last line of the previous chunk. A session that cannot parse a
+    chunk stops indexing and leaves it to the registry once the upload completes.
+    """
+
+    def __init__(self, work_path: Path, indexing: bool = True):
+        self.lock = threading.Lock()
+        self.indexing = indexing
+        self.digest = hashlib.sha256() if indexing else None
+        self.schema = SchemaBuilder()
+        self.columns = ColumnWriter(work_path / "parts")
+        self.names = None
+        self.tail = b""
+
+    def feed(self, data: bytes):
+        """Parse the complete lines of a chunk, keeping the last incomplete line for the next one."""
+        # the checksum covers every chunk, also after indexing stopped
+        if self.digest is not None:
+            self.digest.update(data)
+        if not self.indexing:
+            return
+        data = self.tail + data
+        end = data.rfind(b"\n") + 1
+        self.tail = data[end:]
+        self._try_parse(data[:end])
+
+    def close(self):
+        if self.indexing:
+            self._try_parse(self.tail)
+            self.tail = b""
+
+    def _try_parse(self, lines: bytes):
+        try:
+            self._parse(lines)
+        except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+            logger.warning(f"Could not parse uploaded chunk, indexing on completion instead: {str(e)}")
+            self.indexing = False
+
+    def _parse(self, lines: bytes):
+        if not lines.strip():
+            return
+        if self.names is None:
+            header_end = lines.find(b"\n") + 1 or len(lines)
+            self.names = pd.read_csv(io.BytesIO(lines[:header_end]), nrows=0).columns.tolist()
+            lines = lines[header_end:]
+            if not lines.strip():
+                return
+        chunk = pd.read_csv(io.BytesIO(lines), header=None, names=self.names)
+        self.schema.update(chunk)
+        self.columns.append(chunk)
+
+
+class UploadManager:
+    """
+    Resumable chunked uploads of datasets into the data directory. Chunks are streamed to a
+    partial file and verified against their SHA-256 before they count; a client resumes by
+    asking for the received offset and sending the chunks after it.
+
+    While the chunks arrive they are parsed, so when the upload completes the schema is
+    registered and the columnar copy installed without reading the file again. Uploads
+    resumed after a restart of the service are indexed on completion instead.
+    """
+
+    def __init__(self, data_path: str, registry: DatasetRegistry, column_cache: ColumnCache,
+                 max_chunk_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize the upload manager.
+
+        Args:
+            data_path: Directory the datasets are uploaded into
+            registry: Registry the uploaded datasets are added to
+            column_cache: Cache the columnar copies are installed into
+            max_chunk_bytes: Maximum size of one chunk
+        """
+        self.data_path = Path(data_path)
+        self.uploads_path = self.data_path / ".uploads"
+        self.registry = registry
+        self.column_cache = column_cache
+        self.max_chunk_bytes = max_chunk_bytes
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, name: str, size: int, checksum: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Start an upload.
+
+        Args:
+            name: File name of the dataset
+            size: Total size of the file in bytes
+            checksum: Optional SHA-256 of the whole file, verified on completion
+
+        Raises:
+            UploadError: If the name or size is invalid
+            UploadConflict: If a dataset with the name exists already
+        """
+        if not name or os.path.basename(name) != name or name.startswith(".") or not name.lower().endswith(DATASET_EXTENSIONS):
+            raise UploadError(f"Invalid dataset name: {name}")
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("Invalid size")
+        if (self.data_path / name).exists():
+            raise UploadConflict(f"Dataset {name} already exists")
+
+        upload = {
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "size": size,
+            "checksum": checksum.lower() if checksum else None,
+            "received": 0,
+            "chunks": 0,
+            "status": UPLOAD_PENDING,
+            "created_at": time.time(),
+        }
+        work_path = self.uploads_path / upload["id"]
+        work_path.mkdir(parents=True)
+        (work_path / "data.part").touch()
+        self._save(upload)
+        with self._lock:
+            self._sessions[upload["id"]] = UploadSession(work_path)
+        logger.info(f"Upload {upload['id']} of {name} ({size} bytes) started")
+        return upload
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._work_path(upload_id) / "upload.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def write_chunk(self, upload_id: str, offset: int, stream, length: int, sha256: str) -> Dict[str, Any]:
+        """
+        Append a chunk, streaming it from the request to the partial file.
+
+        Args:
+            upload_id: Id of the upload
+            offset: Position of the chunk in the file, must equal the received size
+            stream: Readable stream with the bytes of the chunk
+            length: Size of the chunk
+            sha256: Expected SHA-256 of the chunk
+
+        Raises:
+            KeyError: If the upload does not exist
+            UploadError: If the chunk is too large or its checksum does not match
+            UploadConflict: If the offset is not the received size
+        """
+        session = self._session(upload_id)
+        with session.lock:
+            upload = self.get(upload_id)
+            if upload is None or upload["status"] != UPLOAD_PENDING:
+                raise KeyError(upload_id)
+            if offset != upload["received"]:
+                raise UploadConflict(f"Expected offset {upload['received']}, got {offset}")
+            if length > self.max_chunk_bytes or offset + length > upload["size"]:
+                raise UploadError("Chunk is too large")
+
+            digest = hashlib.sha256()
+            data = bytearray()
+            part_path = self._work_path(upload_id) / "data.part"
+            with open(part_path, "r+b") as f:
+                f.seek(offset)
+                while len(data) < length:
+                    block = stream.read(min(1024 * 1024, length - len(data)))
+                    if not block:
+                        break
+                    f.write(block)
+                    digest.update(block)
+                    data += block
+                if len(data) != length or digest.hexdigest() != (sha256 or "").lower():
+                    # drop the chunk, the client sends it again
+                    f.truncate(offset)
+                    raise UploadError("Chunk is incomplete or its checksum does not match")
+
+            session.feed(bytes(data))
+            upload["received"] += length
+            upload["chunks"] += 1
+            self._save(upload)
+            return upload
+
+    def complete(self, upload_id: str) -> Dict[str, Any]:
+        """
+        Move a fully received upload into the data directory and register it.
+
+        Returns:
+            dict: The registry entry of the dataset
+
+        Raises:
+            KeyError: If the upload does not exist
+            UploadError: If bytes are missing or the checksum of the file does not match
+            UploadConflict: If a dataset with the name exists already
+        """
+        session = self._session(upload_id)
+        with session.lock:
+            upload = self.get(upload_id)
+            if upload is None or upload["status"] != UPLOAD_PENDING:
+                raise KeyError(upload_id)
+            if upload["received"] != upload["size"]:
+                raise UploadError(f"Received {upload['received']} of {upload['size']} bytes")
+
+            work_path = self._work_path(upload_id)
+            part_path = work_path / "data.part"
+            session.close()
+            indexed = session.indexing
+            checksum = session.digest.hexdigest() if session.digest is not None else self._checksum(part_path)
+            if upload["checksum"] and upload["checksum"] != checksum:
+                raise UploadError("Checksum of the file does not match")
+
+            target = self.data_path / upload["name"]
+            if target.exists():
+                raise UploadConflict(f"Dataset {upload['name']} already exists")
+            os.replace(part_path, target)
+
+            if indexed:
+                stat = target.stat()
+                columns_dir, manifest = session.columns.finish(stat)
+                self.column_cache.install(upload["name"], columns_dir, manifest)
+                entry = self.registry.register(upload["name"], {"checksum": checksum, **session.schema.schema()})
+            else:
+                entry = self.registry.get(upload["name"])
+
+            with self._lock:
+                self._sessions.pop(upload_id, None)
+            shutil.rmtree(work_path, ignore_errors=True)
+            logger.info(f"Upload {upload_id} completed as dataset {upload['name']}")
+            return entry
+
+    def abort(self, upload_id: str) -> bool:
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        try:
+            work_path = self._work_path(upload_id)
+        except KeyError:
+            return False
+        if not work_path.is_dir():
+            return False
+        shutil.rmtree(work_path, ignore_errors=True)
+        return True
+
+    def _session(self, upload_id: str) -> UploadSession:
+        work_path = self._work_path(upload_id)
+        if not work_path.is_dir():
+            raise KeyError(upload_id)
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is None:
+                # resumed after a restart: the parsing state is gone, index on completion
+                session = UploadSession(work_path, indexing=False)
+                self._sessions[upload_id] = session
+            return session
+
+    def _work_path(self, upload_id: str) -> Path:
+        # ids are uuids, anything else could point outside the uploads directory
+        try:
+            return self.uploads_path / str(uuid.UUID(upload_id))
+        except ValueError:
+            raise KeyError(upload_id)
+
+    def _save(self, upload: dict):
+        path = self._work_path(upload["id"]) / "upload.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(upload, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _checksum(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
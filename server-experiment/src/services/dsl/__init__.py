@@ -0,0 +1,11 @@
+from .syntax import DslSyntaxError
+from .workflow_codec import workflow2dsl, dsl2workflow
+from .experiment_codec import experiment2dsl, dsl2experiment
+
+__all__ = [
+    'DslSyntaxError',
+    'workflow2dsl',
+    'dsl2workflow',
+    'experiment2dsl',
+    'dsl2experiment',
+]
@@ -0,0 +1,67 @@
+"""
+Editor metadata is the part of a JSON document the DSL cannot express: ids, layout,
+styling and UI flags. It is stored as a patch against the document the parser would
+build from the DSL alone, so anything the user edits in the DSL itself still wins.
+"""
+
+import copy
+
+_MISSING = object()
+_UNCHANGED = object()
+
+
+def diff(full, built):
+    """Patch turning ``built`` into ``full``, or None when they are already equal."""
+    patch = _diff(full, built)
+    return None if patch is _UNCHANGED else patch
+
+
+def _diff(full, built):
+    if full == built and type(full) is type(built):
+        return _UNCHANGED
+    if isinstance(full, dict) and isinstance(built, dict):
+        patch = {}
+        for key, value in full.items():
+            change = _diff(value, built.get(key, _MISSING))
+            if change is not _UNCHANGED:
+                patch[key] = change
+        unset = [key for key in built if key not in full]
+        if unset:
+            patch["$unset"] = unset
+        return patch or _UNCHANGED
+    if (
+        isinstance(full, list)
+        and isinstance(built, list)
+        and len(full) == len(built)
+        and all(isinstance(item, dict) for item in full + built)
+    ):
+        return {"$items": [diff(a, b) or {} for a, b in zip(full, built)]}
+    if full is None or isinstance(full, (dict, list)):
+        return {"$value": full}
+    return full
+
+
+def merge(built, patch):
+    """Apply a patch produced by diff() to a freshly built document."""
+    if patch is None:
+        return built
+    if not isinstance(patch, dict):
+        return patch
+    if "$value" in patch:
+        return copy.deepcopy(patch["$value"])
+    if "$items" in patch:
+        items = patch["$items"]
+        # the DSL added or removed entries since the metadata was written, trust the DSL
+        if not isinstance(built, list) or len(built) != len(items):
+            return built
+        return [merge(item, item_patch) for item, item_patch in zip(built, items)]
+    if not isinstance(built, dict):
+        return built
+    result = dict(built)
+    for key, value in patch.items():
+        if key == "$unset":
+            for unset_key in value:
+                result.pop(unset_key, None)
+        else:
+            result[key] = merge(result.get(key), value)
+    return result
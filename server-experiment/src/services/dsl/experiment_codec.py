@@ -0,0 +1,282 @@
+"""
+Conversion between experiment steps and the experiment part of the .xxp DSL.
+
+    experiment Experiment1 {
+        control {
+            START -> Prepare -> Train -> END;
+        }
+        step Train {
+            space "New Space" of "<workflow id>" {
+                strategy grid;
+                configure task TrainModel {
+                    variant TrainModelNN {
+                        selected;
+                        implementation "tasks.TrainModelNN";
+                        param epochs : integer = enum(100, 200);
+                        param rate : range = range(0.1, 0.5);
+                    }
+                }
+            }
+        }
+    }
+
+The control chain gives the execution order of the steps.
+"""
+
+from typing import List
+from .editor_metadata import diff, merge
+from .syntax import (
+    DslSyntaxError,
+    Statement,
+    UniqueNames,
+    Writer,
+    format_name,
+    format_value,
+    parse_call,
+    parse_statements,
+    parse_value,
+)
+
+
+def experiment2dsl(experiment_name: str, steps: list) -> str:
+    """Write the steps of an experiment as a .xxp experiment document."""
+    steps = steps or []
+    # the first pass writes the document without metadata, parsing it back tells
+    # which parts of the steps the DSL could not carry
+    plain = _write_experiment(experiment_name, steps, None)
+    built = _build_steps(_experiment_statement(parse_statements(plain)))
+    return _write_experiment(experiment_name, steps, built)
+
+
+def dsl2experiment(experiment_name: str, dsl_content: str) -> list:
+    """Read the steps of the experiment in a .xxp document."""
+    statement = _experiment_statement(parse_statements(dsl_content))
+    if statement is None:
+        return []
+    return _apply_meta(_build_steps(statement))
+
+
+def _experiment_statement(statements: List[Statement]):
+    for statement in statements:
+        if statement.keyword() == "experiment" and statement.body is not None:
+            return statement
+        if statement.keyword() != "workflow":
+            raise statement.error("expected 'experiment <name> { ... }'")
+    return None
+
+
+def _write_experiment(experiment_name: str, steps: list, built) -> str:
+    step_names = UniqueNames(("START", "END"))
+    names = [step_names.take(step.get("name")) for step in steps]
+    ordered = sorted(range(len(steps)), key=lambda i: steps[i].get("executionOrder") or 0)
+
+    writer = Writer()
+    writer.open(f"experiment {format_name(experiment_name)}")
+    writer.open("control")
+    writer.line(" -> ".join(["START"] + [format_name(names[i]) for i in ordered] + ["END"]) + ";")
+    writer.close()
+
+    for index, step in enumerate(steps):
+        built_step = built[index] if built is not None else None
+        meta = None
+        if built_step is not None:
+            meta = diff(_without_spaces(step), _without_spaces(built_step[0]))
+        writer.open(f"step {format_name(names[index])}", meta)
+        space_names = UniqueNames()
+        for space_index, space in enumerate(step.get("spaces", []) or []):
+            built_space = built_step[1][space_index] if built_step is not None else None
+            _write_space(writer, space, space_names.take(space.get("name")), built_space)
+        writer.close()
+
+    writer.close()
+    return writer.text()
+
+
+def _write_space(writer: Writer, space: dict, name: str, built_space):
+    header = f"space {format_name(name)}"
+    if space.get("workflow_id"):
+        header += f" of {format_name(space['workflow_id'])}"
+    meta = None
+    if built_space is not None:
+        meta = diff(_without_steps(space), _without_steps(built_space[0]))
+    writer.open(header, meta)
+    if space.get("searchMethod"):
+        writer.line(f"strategy {format_name(space['searchMethod'])};")
+
+    task_names = UniqueNames()
+    for step_index, step in enumerate(space.get("steps", []) or []):
+        step_meta = None
+        if built_space is not None:
+            step_meta = diff(step, built_space[1][step_index][0])
+        writer.open(f"configure task {format_name(task_names.take(step.get('name')))}", step_meta)
+        variant_names = UniqueNames()
+        for task in step.get("tasks", []) or []:
+            writer.open(f"variant {format_name(variant_names.take(task.get('name')))}")
+            if task.get("selected"):
+                writer.line("selected;")
+            if task.get("implementationRef"):
+                writer.line(f"implementation {format_value(task['implementationRef'])};")
+            if task.get("description"):
+                writer.line(f"description {format_value(task['description'])};")
+            for parameter in task.get("hyperParameters", []) or []:
+                writer.line(_format_parameter(parameter))
+            writer.close()
+        writer.close()
+    writer.close()
+
+
+def _format_parameter(parameter: dict) -> str:
+    line = f"param {format_name(parameter.get('name') or '')}"
+    if parameter.get("type"):
+        line += f" : {format_name(parameter['type'])}"
+    if parameter.get("values"):
+        line += f" = enum({', '.join(format_value(v) for v in parameter['values'])})"
+    elif parameter.get("range"):
+        line += f" = range({', '.join(format_value(v) for v in parameter['range'])})"
+    return line + ";"
+
+
+def _without_spaces(step):
+    return {k: v for k, v in step.items() if k != "spaces"}
+
+
+def _without_steps(space):
+    return {k: v for k, v in space.items() if k != "steps"}
+
+
+def _build_steps(statement: Statement) -> dict:
+    """Build the steps of an experiment statement, keeping the metadata of each level apart."""
+    order = []
+    steps = []
+    for child in statement.body:
+        keyword = child.keyword()
+        if keyword == "control":
+            for link in child.body or []:
+                order = [link.name(pos) for pos in range(0, len(link.words), 2)]
+                if any(link.words[pos].kind != "arrow" for pos in range(1, len(link.words), 2)):
+                    raise link.error("expected a chain of steps")
+        elif keyword == "step":
+            if child.body is None:
+                raise child.error("step needs a block")
+            steps.append(_build_step(child))
+        else:
+            raise child.error(f"unexpected {keyword} in experiment")
+
+    chain = [name for name in order if name not in ("START", "END")]
+    for number, (step, _, _) in enumerate(steps, start=1):
+        if step["name"] in chain:
+            step["executionOrder"] = chain.index(step["name"]) + 1
+        else:
+            step["executionOrder"] = len(chain) + number
+    return steps
+
+
+def _build_step(statement: Statement):
+    name = statement.name(1)
+    step = {
+        "id": f"step-{name}",
+        "name": name,
+        "type": "container",
+        "spaces": [],
+        "status": "idle",
+    }
+    spaces = []
+    for child in statement.body:
+        if child.keyword() != "space" or child.body is None:
+            raise child.error("expected 'space <name> { ... }'")
+        spaces.append(_build_space(child))
+    return step, spaces, statement.meta
+
+
+def _build_space(statement: Statement):
+    name = statement.name(1)
+    space = {
+        "id": f"space-{name}",
+        "name": name,
+        "status": "idle",
+        "searchMethod": "grid",
+        "steps": [],
+    }
+    if statement.keyword(2) == "of":
+        space["workflow_id"] = statement.name(3)
+    steps = []
+    for child in statement.body:
+        keyword = child.keyword()
+        if keyword == "strategy":
+            space["searchMethod"] = child.name(1)
+        elif keyword == "configure" and child.keyword(1) == "task" and child.body is not None:
+            steps.append(_build_workflow_step(child))
+        else:
+            raise child.error(f"unexpected {keyword} in space")
+    return space, steps, statement.meta
+
+
+def _build_workflow_step(statement: Statement) -> dict:
+    name = statement.name(2)
+    tasks = []
+    for child in statement.body:
+        if child.keyword() != "variant" or child.body is None:
+            raise child.error("expected 'variant <name> { ... }'")
+        tasks.append(_build_task(child))
+    return {"id": f"task-{name}", "name": name, "type": "task", "tasks": tasks}, statement.meta
+
+
+def _build_task(statement: Statement) -> dict:
+    name = statement.name(1)
+    task = {
+        "id": f"variant-{name}",
+        "name": name,
+        "type": "algorithm",
+        "selected": False,
+        "hyperParameters": [],
+        "implementationRef": "",
+        "description": "",
+    }
+    for setting in statement.body:
+        keyword = setting.keyword()
+        if keyword == "selected":
+            task["selected"] = True
+        elif keyword == "implementation":
+            task["implementationRef"] = parse_value(setting.words[1], setting.line)
+        elif keyword == "description":
+            task["description"] = parse_value(setting.words[1], setting.line)
+        elif keyword == "param":
+            task["hyperParameters"].append(_build_parameter(setting))
+        else:
+            raise setting.error(f"unknown task setting {keyword}")
+    return task
+
+
+def _build_parameter(statement: Statement) -> dict:
+    name = statement.name(1)
+    parameter = {"name": name, "type": "string"}
+    pos = 2
+    words = statement.words
+    if pos < len(words) and words[pos].value == ":":
+        parameter["type"] = statement.name(pos + 1)
+        pos += 2
+    if pos < len(words):
+        if words[pos].value != "=":
+            raise statement.error("expected '='")
+        func, values = parse_call(statement, pos + 1)
+        if func == "enum":
+            parameter["values"] = values
+        elif func == "range":
+            parameter["range"] = values
+        else:
+            raise statement.error(f"unknown value list {func}")
+    return parameter
+
+
+def _apply_meta(built: dict) -> list:
+    """Merge the editor metadata into the built steps."""
+    steps = []
+    for step, spaces, step_meta in built:
+        step = merge(step, step_meta)
+        step["spaces"] = []
+        for space, workflow_steps, space_meta in spaces:
+            space = merge(space, space_meta)
+            space["steps"] = [merge(workflow_step, step_meta) for workflow_step, step_meta in workflow_steps]
+            step["spaces"].append(space)
+        steps.append(step)
+    return steps
@@ -0,0 +1,243 @@
+"""
+Lexer, statement parser and formatting helpers shared by the workflow and experiment codecs.
+
+A .xxp document is a tree of statements. A statement is a list of words closed either by
+``;`` or by a ``{ ... }`` block of nested statements. ``// @editor {json}`` comments carry
+editor state the DSL has no syntax for and attach to the statement they follow, or to the
+enclosing block when they come first inside it.
+"""
+
+import json
+import re
+from typing import List, Optional
+
+EDITOR_COMMENT = "// @editor "
+
+ARROWS = {
+    "->": "regular",
+    "-->": "dataflow",
+    "-?>": "conditional",
+    "-!>": "exceptional",
+}
+LINK_ARROWS = {link_type: arrow for arrow, link_type in ARROWS.items()}
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<meta>//\ @editor\ [^\n]*)
+    |(?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<space>\s+)
+    |(?P<string>"(?:[^"\\\n]|\\.)*")
+    |(?P<arrow>-->|-\?>|-!>|->)
+    |(?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<ident>[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)
+    |(?P<punct>[;{}(),:=])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_IDENT_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class DslSyntaxError(ValueError):
+    """Raised when a .xxp document cannot be parsed."""
+
+    def __init__(self, message: str, line: int):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+class Token:
+    __slots__ = ("kind", "value", "line")
+
+    def __init__(self, kind: str, value, line: int):
+        self.kind = kind
+        self.value = value
+        self.line = line
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r})"
+
+
+class Statement:
+    """One statement of a .xxp document, with its nested block if it has one."""
+
+    __slots__ = ("words", "body", "meta", "line")
+
+    def __init__(self, words: List[Token], line: int):
+        self.words = words
+        self.body: Optional[List["Statement"]] = None
+        self.meta: Optional[dict] = None
+        self.line = line
+
+    def keyword(self, index: int = 0) -> Optional[str]:
+        """The identifier at the given position, or None if there is none."""
+        if index < len(self.words) and self.words[index].kind == "ident":
+            return self.words[index].value
+        return None
+
+    def name(self, index: int) -> str:
+        """The name (identifier or string) at the given position."""
+        if index >= len(self.words) or self.words[index].kind not in ("ident", "string"):
+            raise DslSyntaxError("expected a name", self.line)
+        return self.words[index].value
+
+    def error(self, message: str) -> DslSyntaxError:
+        return DslSyntaxError(message, self.line)
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens = []
+    line = 1
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN_PATTERN.match(text, pos)
+        if not match:
+            raise DslSyntaxError(f"unexpected character {text[pos]!r}", line)
+        kind = match.lastgroup
+        raw = match.group()
+        if kind == "meta":
+            try:
+                tokens.append(Token("meta", json.loads(raw[len(EDITOR_COMMENT):]), line))
+            except ValueError:
+                raise DslSyntaxError("invalid editor metadata", line)
+        elif kind == "string":
+            tokens.append(Token("string", json.loads(raw), line))
+        elif kind == "number":
+            tokens.append(Token("number", json.loads(raw), line))
+        elif kind not in ("comment", "space"):
+            tokens.append(Token(kind, raw, line))
+        line += raw.count("\n")
+        pos = match.end()
+    return tokens
+
+
+def parse_statements(text: str) -> List[Statement]:
+    """Parse a document into its top-level statements."""
+    tokens = tokenize(text)
+    statements, pos = _parse_block(tokens, 0, None)
+    if pos != len(tokens):
+        raise DslSyntaxError("unexpected '}'", tokens[pos].line)
+    return statements
+
+
+def _parse_block(tokens: List[Token], pos: int, parent: Optional[Statement]):
+    statements = []
+    words = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        pos += 1
+        if token.kind == "meta":
+            if words:
+                raise DslSyntaxError("editor metadata inside a statement", token.line)
+            owner = statements[-1] if statements else parent
+            if owner is not None:
+                owner.meta = token.value
+        elif token.value == ";" and token.kind == "punct":
+            if words:
+                statements.append(Statement(words, words[0].line))
+            words = []
+        elif token.value == "{" and token.kind == "punct":
+            statement = Statement(words, words[0].line if words else token.line)
+            statement.body, pos = _parse_block(tokens, pos, statement)
+            if pos > len(tokens) or tokens[pos - 1].value != "}":
+                raise DslSyntaxError("missing '}'", statement.line)
+            statements.append(statement)
+            words = []
+        elif token.value == "}" and token.kind == "punct":
+            if words:
+                raise DslSyntaxError("missing ';'", words[-1].line)
+            if parent is None:
+                return statements, pos - 1
+            return statements, pos
+        else:
+            words.append(token)
+    if words:
+        raise DslSyntaxError("missing ';'", words[-1].line)
+    if parent is not None:
+        raise DslSyntaxError("missing '}'", parent.line)
+    return statements, pos
+
+
+def parse_value(token: Token, line: int):
+    """Convert a literal token into a JSON value."""
+    if token.kind in ("string", "number"):
+        return token.value
+    if token.kind == "ident":
+        return {"true": True, "false": False, "null": None}.get(token.value, token.value)
+    raise DslSyntaxError(f"expected a value, got {token.value!r}", line)
+
+
+def parse_call(statement: Statement, start: int):
+    """Parse ``func(v1, v2, ...)`` starting at the given word, returning (func, [values])."""
+    words = statement.words
+    if start + 2 >= len(words) or words[start].kind != "ident" or words[start + 1].value != "(":
+        raise statement.error("expected a value list such as enum(...)")
+    values = []
+    pos = start + 2
+    while words[pos].value != ")":
+        values.append(parse_value(words[pos], statement.line))
+        pos += 1
+        if pos >= len(words):
+            raise statement.error("missing ')'")
+        if words[pos].value == ",":
+            pos += 1
+    if pos != len(words) - 1:
+        raise statement.error("unexpected words after ')'")
+    return words[start].value, values
+
+
+def format_name(name: str) -> str:
+    """Write a name as an identifier when possible, as a string otherwise."""
+    if _IDENT_PATTERN.fullmatch(name):
+        return name
+    return json.dumps(name)
+
+
+def format_value(value) -> str:
+    return json.dumps(value)
+
+
+def format_meta(meta: dict) -> str:
+    return EDITOR_COMMENT + json.dumps(meta, separators=(",", ":"))
+
+
+class UniqueNames:
+    """Hands out names that are unique within one document scope."""
+
+    def __init__(self, reserved=()):
+        self._used = set(reserved)
+
+    def take(self, name: str) -> str:
+        name = name or "unnamed"
+        candidate = name
+        suffix = 2
+        while candidate in self._used:
+            candidate = f"{name}_{suffix}"
+            suffix += 1
+        self._used.add(candidate)
+        return candidate
+
+
+class Writer:
+    """Accumulates indented lines of a document."""
+
+    def __init__(self):
+        self.lines = []
+        self.depth = 0
+
+    def line(self, text: str, meta: Optional[dict] = None):
+        self.lines.append("    " * self.depth + text)
+        if meta:
+            self.lines.append("    " * self.depth + format_meta(meta))
+
+    def open(self, header: str, meta: Optional[dict] = None):
+        self.lines.append("    " * self.depth + header + " {")
+        self.depth += 1
+        if meta:
+            self.line(format_meta(meta))
+
+    def close(self):
+        self.depth -= 1
+        self.lines.append("    " * self.depth + "}")
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
@@ -0,0 +1,425 @@
+"""
+Conversion between workflow graphical models and the workflow part of the .xxp DSL.
+
+    workflow Main {
+        define task ReadData;
+        define data "volume.csv";
+        START -> ReadData -> END;
+        "volume.csv" --> ReadData;
+        configure task ReadData {
+            implementation "tasks.ReadData";
+            param window : integer = enum(10, 20);
+        }
+        configure data "volume.csv" {
+            field "AA";
+        }
+    }
+
+Composite task variants reference their graph with ``subworkflow <Name>;`` and the
+subworkflow follows the main workflow in the same document.
+"""
+
+from typing import Dict, List
+from .editor_metadata import diff, merge
+from .syntax import (
+    ARROWS,
+    LINK_ARROWS,
+    DslSyntaxError,
+    Statement,
+    UniqueNames,
+    Writer,
+    format_name,
+    format_value,
+    parse_call,
+    parse_statements,
+    parse_value,
+)
+
+_OPERATORS = {
+    "opParallel": "parallel",
+    "opExclusive": "exclusive",
+    "opInclusive": "inclusive",
+    "opComplex": "complex",
+}
+_OPERATOR_TYPES = {keyword: node_type for node_type, keyword in _OPERATORS.items()}
+_EVENTS = {"start": "START", "end": "END"}
+
+
+def workflow2dsl(workflow_name: str, graphical_model: dict) -> str:
+    """Write a graphical model as a .xxp workflow document."""
+    documents = []
+    _collect_workflows(workflow_name, graphical_model or {}, documents, UniqueNames())
+
+    # the first pass writes the document without metadata, parsing it back tells
+    # which parts of the model the DSL could not carry
+    plain = "".join(_write_workflow(doc, None) for doc in documents)
+    built = _build_documents(parse_statements(plain))
+    return "".join(
+        _write_workflow(doc, built[doc["name"]]) for doc in documents
+    )
+
+
+def dsl2workflow(workflow_name: str, dsl_content: str) -> dict:
+    """Read the graphical model of the first workflow of a .xxp document."""
+    workflows = _build_documents(parse_statements(dsl_content))
+    if not workflows:
+        return {"nodes": [], "edges": []}
+    return next(iter(workflows.values()))["model"]
+
+
+def _collect_workflows(name: str, graphical_model: dict, documents: List[dict], workflow_names: UniqueNames):
+    """Flatten the main workflow and its composite subworkflows into document order."""
+    doc = {
+        "name": workflow_names.take(name),
+        "model": graphical_model,
+        "node_names": {},
+        "subworkflows": {},
+    }
+    documents.append(doc)
+
+    node_names = UniqueNames(_EVENTS.values())
+    operator_counts = {}
+    for node in graphical_model.get("nodes", []):
+        node_type = node.get("type")
+        if node_type in _EVENTS:
+            label = _EVENTS[node_type]
+            doc["node_names"][node["id"]] = label if label not in doc["node_names"].values() else node_names.take(label)
+        elif node_type == "task":
+            doc["node_names"][node["id"]] = node_names.take(_current_variant(node).get("name"))
+        elif node_type == "data":
+            doc["node_names"][node["id"]] = node_names.take(node.get("data", {}).get("name"))
+        elif node_type in _OPERATORS:
+            operator_counts[node_type] = operator_counts.get(node_type, 0) + 1
+            label = f"{_OPERATORS[node_type].capitalize()}{operator_counts[node_type]}"
+            doc["node_names"][node["id"]] = node_names.take(label)
+
+    for node in graphical_model.get("nodes", []):
+        if node.get("type") != "task":
+            continue
+        for variant in node.get("data", {}).get("variants", []):
+            if variant.get("is_composite"):
+                subworkflow = _collect_workflows(
+                    variant.get("name"), variant.get("graphical_model") or {}, documents, workflow_names
+                )
+                doc["subworkflows"][id(variant)] = subworkflow["name"]
+    return doc
+
+
+def _current_variant(node: dict) -> dict:
+    variants = node.get("data", {}).get("variants", [])
+    current = node.get("data", {}).get("currentVariant")
+    return next((v for v in variants if v.get("id_task") == current), variants[0] if variants else {})
+
+
+def _write_workflow(doc: dict, built) -> str:
+    model = doc["model"]
+    names = doc["node_names"]
+    nodes = [node for node in model.get("nodes", []) if node.get("id") in names]
+    node_meta = None
+    if built is not None:
+        built_nodes = {node["id"]: node for node in built["model"]["nodes"]}
+        node_meta = {}
+        for node in nodes:
+            built_node = built_nodes.get(built["ids"].get(names[node["id"]]))
+            change = diff(_without_subworkflows(node), _without_subworkflows(built_node))
+            if change is not None:
+                node_meta[names[node["id"]]] = change
+        order = [names[node["id"]] for node in model.get("nodes", []) if node.get("id") in names]
+        if order != [built["names"][node["id"]] for node in built["model"]["nodes"]]:
+            node_meta["$order"] = order
+        extra = diff({k: v for k, v in model.items() if k not in ("nodes", "edges")},
+                     {k: v for k, v in built["model"].items() if k not in ("nodes", "edges")})
+        if extra is not None:
+            node_meta["$model"] = extra
+
+    writer = Writer()
+    writer.open(f"workflow {format_name(doc['name'])}", node_meta or None)
+
+    for node in nodes:
+        node_type = node.get("type")
+        name = format_name(names[node["id"]])
+        if node_type in _EVENTS and names[node["id"]] != _EVENTS[node_type]:
+            writer.line(f"define {node_type} {name};")
+        elif node_type == "task":
+            writer.line(f"define task {name};")
+        elif node_type == "data":
+            writer.line(f"define data {name};")
+        elif node_type in _OPERATORS:
+            writer.line(f"define {_OPERATORS[node_type]} {name};")
+
+    edge_statements = 0
+    for edge in model.get("edges", []):
+        source = names.get(edge.get("source"))
+        target = names.get(edge.get("target"))
+        if source is None or target is None:
+            continue
+        arrow = LINK_ARROWS.get(edge.get("type"), "->")
+        edge_meta = None
+        if built is not None:
+            # node ids are restored from the node metadata, the edge only keeps its own changes
+            built_edge = built["edge_statements"][edge_statements][0]
+            edge_meta = diff(edge, dict(built_edge, source=edge["source"], target=edge["target"]))
+        edge_statements += 1
+        writer.line(f"{format_name(source)} {arrow} {format_name(target)};", edge_meta)
+
+    for node in nodes:
+        name = format_name(names[node["id"]])
+        if node.get("type") == "task":
+            variants = node.get("data", {}).get("variants", [])
+            for variant in variants:
+                header = f"configure task {name}"
+                if len(variants) > 1:
+                    header += f" variant {format_name(variant.get('name') or '')}"
+                writer.open(header)
+                _write_variant(writer, variant, doc)
+                writer.close()
+        elif node.get("type") == "data" and node.get("data", {}).get("field"):
+            writer.open(f"configure data {name}")
+            writer.line(f"field {format_value(node['data']['field'])};")
+            writer.close()
+
+    writer.close()
+    return writer.text()
+
+
+def _write_variant(writer: Writer, variant: dict, doc: dict):
+    if variant.get("implementationRef"):
+        writer.line(f"implementation {format_value(variant['implementationRef'])};")
+    if variant.get("description"):
+        writer.line(f"description {format_value(variant['description'])};")
+    if id(variant) in doc["subworkflows"]:
+        writer.line(f"subworkflow {format_name(doc['subworkflows'][id(variant)])};")
+    for parameter in variant.get("parameters", []) or []:
+        line = f"param {format_name(parameter.get('name') or '')}"
+        if parameter.get("type"):
+            line += f" : {parameter['type']}"
+        if parameter.get("values"):
+            line += f" = enum({', '.join(format_value(v) for v in parameter['values'])})"
+        writer.line(line + ";")
+
+
+def _without_subworkflows(node):
+    """Copy of a task node without the graphs of composite variants, which have their own metadata."""
+    if not node or node.get("type") != "task":
+        return node
+    variants = [
+        {k: v for k, v in variant.items() if k != "graphical_model"} if variant.get("is_composite") else variant
+        for variant in node.get("data", {}).get("variants", [])
+    ]
+    return dict(node, data=dict(node["data"], variants=variants))
+
+
+def _build_documents(statements: List[Statement]) -> Dict[str, dict]:
+    """Build every workflow of a document, resolving subworkflow references."""
+    workflows = {}
+    for statement in statements:
+        if statement.keyword() != "workflow" or statement.body is None:
+            raise statement.error("expected 'workflow <name> { ... }'")
+        name = statement.name(1)
+        workflows[name] = _build_workflow(statement)
+
+    # subworkflows are resolved innermost first, a workflow cannot contain itself
+    resolved = set()
+
+    def resolve(name, stack):
+        if name in resolved:
+            return workflows[name]["model"]
+        if name in stack:
+            raise DslSyntaxError(f"workflow {name} contains itself", workflows[name]["line"])
+        for variant, subworkflow, line in workflows[name]["subworkflow_refs"]:
+            if subworkflow not in workflows:
+                raise DslSyntaxError(f"unknown subworkflow {subworkflow}", line)
+            variant["graphical_model"] = resolve(subworkflow, stack + [name])
+        workflows[name]["model"] = _apply_meta(workflows[name])
+        resolved.add(name)
+        return workflows[name]["model"]
+
+    for name in workflows:
+        resolve(name, [])
+    return workflows
+
+
+def _build_workflow(statement: Statement) -> dict:
+    nodes = {}
+    names = {}
+    edges = []
+    edge_statements = {}
+    subworkflow_refs = []
+
+    def node_for(name, line):
+        if name not in nodes and name in _EVENTS.values():
+            node_type = "start" if name == "START" else "end"
+            nodes[name] = {"id": f"{node_type}-{name}", "type": node_type, "data": {}}
+        if name not in nodes:
+            raise DslSyntaxError(f"unknown node {name}", line)
+        return nodes[name]
+
+    configured = {}
+    for child in statement.body:
+        keyword = child.keyword()
+        if keyword == "define":
+            kind = child.keyword(1)
+            name = child.name(2)
+            if name in nodes:
+                raise child.error(f"node {name} is defined twice")
+            if kind in _EVENTS:
+                nodes[name] = {"id": f"{kind}-{name}", "type": kind, "data": {}}
+            elif kind == "task":
+                nodes[name] = {"id": f"task-{name}", "type": "task", "data": {"variants": []}}
+            elif kind == "data":
+                nodes[name] = {"id": f"data-{name}", "type": "data", "data": {"name": name, "field": ""}}
+            elif kind in _OPERATOR_TYPES:
+                nodes[name] = {"id": f"{_OPERATOR_TYPES[kind]}-{name}", "type": _OPERATOR_TYPES[kind], "data": {}}
+            else:
+                raise child.error(f"unknown node kind {kind}")
+        elif keyword == "configure":
+            configured.setdefault(child.name(2), []).append(child)
+        elif len(child.words) >= 3 and child.words[1].kind == "arrow":
+            if child.body is not None:
+                raise child.error("links do not take a block")
+            hops = _parse_chain(child)
+            for source, arrow, target in hops:
+                source_id = node_for(source, child.line)["id"]
+                target_id = node_for(target, child.line)["id"]
+                edge = {
+                    "id": f"edge-{source_id}-{target_id}",
+                    "source": source_id,
+                    "target": target_id,
+                    "type": ARROWS[arrow],
+                }
+                if len(hops) == 1:
+                    edge_statements[len(edge_statements)] = (edge, child.meta)
+                edges.append(edge)
+        else:
+            raise child.error("expected define, configure or a link")
+
+    for name, statements in configured.items():
+        node = nodes.get(name)
+        if node is None:
+            raise statements[0].error(f"unknown node {name}")
+        for child in statements:
+            if child.body is None:
+                raise child.error("configure needs a block")
+            if node["type"] == "task" and child.keyword(1) == "task":
+                node["data"]["variants"].append(
+                    _build_variant(name, child, len(node["data"]["variants"]) + 1, subworkflow_refs)
+                )
+            elif node["type"] == "data" and child.keyword(1) == "data":
+                for setting in child.body:
+                    if setting.keyword() == "field":
+                        node["data"]["field"] = parse_value(setting.words[1], setting.line)
+            else:
+                raise child.error(f"cannot configure {name} as {child.keyword(1)}")
+
+    for name, node in nodes.items():
+        if node["type"] == "task":
+            if not node["data"]["variants"]:
+                node["data"]["variants"].append(_default_variant(name, 1))
+            node["data"]["currentVariant"] = node["data"]["variants"][0]["id_task"]
+
+    ordered = list(nodes.values())
+    for index, node in enumerate(ordered):
+        node["position"] = {"x": 0, "y": index * 100}
+
+    return {
+        "line": statement.line,
+        "nodes": nodes,
+        "names": {node["id"]: name for name, node in nodes.items()},
+        "ids": {name: node["id"] for name, node in nodes.items()},
+        "edges": edges,
+        "edge_statements": edge_statements,
+        "subworkflow_refs": subworkflow_refs,
+        "meta": statement.meta or {},
+        "model": None,
+    }
+
+
+def _parse_chain(statement: Statement):
+    words = statement.words
+    if len(words) % 2 == 0:
+        raise statement.error("incomplete link")
+    hops = []
+    for pos in range(0, len(words) - 2, 2):
+        if words[pos + 1].kind != "arrow":
+            raise statement.error("expected an arrow")
+        hops.append((statement.name(pos), words[pos + 1].value, statement.name(pos + 2)))
+    return hops
+
+
+def _default_variant(name: str, number: int) -> dict:
+    return {
+        "name": name,
+        "id_task": f"variant-{number}-{name}",
+        "variant": number,
+        "isAbstract": True,
+        "parameters": [],
+        "description": "",
+        "is_composite": False,
+        "graphical_model": {"nodes": [], "edges": []},
+        "implementationRef": "",
+    }
+
+
+def _build_variant(task_name: str, statement: Statement, number: int, subworkflow_refs: list) -> dict:
+    name = statement.name(4) if statement.keyword(3) == "variant" else task_name
+    variant = _default_variant(name, number)
+    for setting in statement.body:
+        keyword = setting.keyword()
+        if keyword == "implementation":
+            variant["implementationRef"] = parse_value(setting.words[1], setting.line)
+            variant["isAbstract"] = not variant["implementationRef"]
+        elif keyword == "description":
+            variant["description"] = parse_value(setting.words[1], setting.line)
+        elif keyword == "subworkflow":
+            variant["is_composite"] = True
+            subworkflow_refs.append((variant, setting.name(1), setting.line))
+        elif keyword == "param":
+            variant["parameters"].append(_build_parameter(setting))
+        else:
+            raise setting.error(f"unknown task setting {keyword}")
+    return variant
+
+
+def _build_parameter(statement: Statement) -> dict:
+    name = statement.name(1)
+    parameter = {"id": f"param-{name}", "name": name, "type": "string", "values": []}
+    pos = 2
+    words = statement.words
+    if pos < len(words) and words[pos].value == ":":
+        parameter["type"] = statement.name(pos + 1)
+        pos += 2
+    if pos < len(words):
+        if words[pos].value != "=":
+            raise statement.error("expected '='")
+        func, values = parse_call(statement, pos + 1)
+        if func != "enum":
+            raise statement.error(f"unknown value list {func}")
+        parameter["values"] = values
+    return parameter
+
+
+def _apply_meta(workflow: dict) -> dict:
+    """Merge the editor metadata into the built model."""
+    meta = workflow["meta"]
+    nodes = workflow["nodes"]
+    order = meta.get("$order")
+    names = [name for name in order if name in nodes] if order else []
+    names += [name for name in nodes if name not in names]
+
+    ids = {}
+    model_nodes = []
+    for name in names:
+        node = merge(nodes[name], meta.get(name))
+        ids[nodes[name]["id"]] = node.get("id")
+        model_nodes.append(node)
+
+    edge_patches = {id(edge): patch for edge, patch in workflow["edge_statements"].values()}
+    model_edges = []
+    for edge in workflow["edges"]:
+        remapped = dict(edge, source=ids.get(edge["source"], edge["source"]),
+                        target=ids.get(edge["target"], edge["target"]))
+        model_edges.append(merge(remapped, edge_patches.get(id(edge))))
+
+    model = merge({"nodes": model_nodes, "edges": model_edges}, meta.get("$model"))
+    workflow["model"] = model
+    return model
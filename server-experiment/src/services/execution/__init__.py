@@ -0,0 +1,10 @@
+from .conditions import ConditionError, evaluate_condition
+from .dag_executor import DagExecutor, ExecutionError, current_variant
+
+__all__ = [
+    'DagExecutor',
+    'ExecutionError',
+    'current_variant',
+    'ConditionError',
+    'evaluate_condition',
+]
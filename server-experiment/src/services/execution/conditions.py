@@ -0,0 +1,107 @@
+import ast
+import operator
+from typing import Any, Dict
+
+# no power and no operands other than numbers, so a condition cannot build huge values
+# such as 9**9**9 or 'a'*10**10; strings can only be concatenated
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY_OPERATORS = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda left, right: left in right,
+    ast.NotIn: lambda left, right: left not in right,
+}
+# spellings used in conditions written in the editor
+_CONSTANTS = {"true": True, "false": False, "null": None, "none": None}
+
+
+class ConditionError(ValueError):
+    """Raised when a gateway condition cannot be parsed or evaluated."""
+
+
+def evaluate_condition(expression: str, variables: Dict[str, Any]) -> bool:
+    """
+    Evaluate the condition of a gateway case or a conditional link.
+
+    Only literals, variable names, arithmetic on numbers, string concatenation,
+    comparisons and and/or/not are allowed, so conditions coming from the editor can never
+    run arbitrary code or build values larger than their operands. An empty condition,
+    "else" or "default" always holds.
+
+    Args:
+        expression: Condition such as "accuracy > 0.9 and model == 'svm'"
+        variables: Values the names in the condition refer to
+
+    Raises:
+        ConditionError: If the condition is invalid or refers to an unknown name
+    """
+    expression = (expression or "").strip()
+    if expression.lower() in ("", "else", "default"):
+        return True
+    # the editor uses && and || as well
+    expression = expression.replace("&&", " and ").replace("||", " or ")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"Invalid condition '{expression}': {e.msg}") from None
+    try:
+        return bool(_evaluate(tree.body, variables, expression))
+    except (TypeError, ArithmeticError) as e:
+        raise ConditionError(f"Cannot evaluate condition '{expression}': {str(e)}") from None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _evaluate(node, variables, expression):
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in variables:
+            return variables[node.id]
+        if node.id.lower() in _CONSTANTS:
+            return _CONSTANTS[node.id.lower()]
+        raise ConditionError(f"Unknown name '{node.id}' in condition '{expression}'")
+    if isinstance(node, ast.BoolOp):
+        if isinstance(node.op, ast.And):
+            return all(_evaluate(value, variables, expression) for value in node.values)
+        return any(_evaluate(value, variables, expression) for value in node.values)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand, variables, expression))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _evaluate(node.left, variables, expression)
+        right = _evaluate(node.right, variables, expression)
+        concatenation = isinstance(node.op, ast.Add) and isinstance(left, str) and isinstance(right, str)
+        if not concatenation and not (_is_number(left) and _is_number(right)):
+            raise ConditionError(f"Unsupported operands in condition '{expression}'")
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.Compare):
+        left = _evaluate(node.left, variables, expression)
+        for op, comparator in zip(node.ops, node.comparators):
+            if type(op) not in _COMPARISONS:
+                raise ConditionError(f"Unsupported comparison in condition '{expression}'")
+            right = _evaluate(comparator, variables, expression)
+            if not _COMPARISONS[type(op)](left, right):
+                return False
+            left = right
+        return True
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate(element, variables, expression) for element in node.elts]
+    raise ConditionError(f"Unsupported expression in condition '{expression}'")
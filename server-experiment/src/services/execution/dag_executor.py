@@ -0,0 +1,304 @@
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+from config.logging_config import get_logger
+from .conditions import evaluate_condition
+
+logger = get_logger(__name__)
+
+NODE_DONE = "done"
+NODE_FAILED = "failed"
+NODE_SKIPPED = "skipped"
+NODE_CANCELLED = "cancelled"
+
+
+def current_variant(node) -> Optional[Dict[str, Any]]:
+    """The selected variant of a task node, or None for other nodes."""
+    if node.get("type") != "task":
+        return None
+    data = node.get("data") or {}
+    variants = data.get("variants") or []
+    return next(
+        (variant for variant in variants if variant.get("id_task") == data.get("currentVariant")),
+        variants[0] if variants else None,
+    )
+
+
+class ExecutionError(Exception):
+    """Raised when a workflow graph cannot be executed."""
+
+
+class DagExecutor:
+    """
+    Executes the graphical model of a workflow by scheduling its nodes in dependency
+    order on a pool of worker threads, so independent branches run concurrently.
+
+    A node runs once every incoming link is resolved and at least one of them was taken;
+    a node none of whose incoming links were taken is skipped, and so are the nodes after
+    it. Parallel gateways therefore fork into all of their branches and join by waiting for
+    all of them, while exclusive and inclusive gateways take the branches whose conditions
+    hold and still join correctly. Exceptional links are only taken when their source fails.
+    """
+
+    def __init__(self, task_runner: Optional[Callable] = None, max_workers: int = 4):
+        """
+        Initialize the executor.
+
+        Args:
+            task_runner: Callable(node, graphical_model, variables) running a task node; its
+                return value is the result of the node. Tasks are no-ops without it.
+            max_workers: Number of worker threads running tasks
+        """
+        self.task_runner = task_runner
+        self.max_workers = max(1, max_workers)
+
+    def run(self, graphical_model: Dict[str, Any], variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Execute a graphical model.
+
+        Args:
+            graphical_model: The graphical model with "nodes" and "edges"
+            variables: Initial values the gateway conditions can refer to. Task results
+                that are dicts are added to them as the run goes on.
+
+        Returns:
+            Execution report with the status, result and timing of every node and the
+            critical path of the run
+
+        Raises:
+            ExecutionError: If the graph has a cycle
+        """
+        nodes = {node["id"]: node for node in graphical_model.get("nodes", [])}
+        edges = [
+            edge for edge in graphical_model.get("edges", [])
+            if edge.get("source") in nodes and edge.get("target") in nodes
+        ]
+        incoming = defaultdict(list)
+        outgoing = defaultdict(list)
+        for edge in edges:
+            incoming[edge["target"]].append(edge)
+            outgoing[edge["source"]].append(edge)
+        order = self._topological_order(nodes, incoming, outgoing)
+
+        variables = dict(variables or {})
+        unresolved = {node_id: len(incoming[node_id]) for node_id in nodes}
+        taken = {}
+        status = {}
+        results = {}
+        timings = {}
+        error = None
+        ready = deque(node_id for node_id in order if unresolved[node_id] == 0)
+        running = {}
+        started = time.perf_counter()
+
+        def finish(node_id, node_status):
+            nonlocal error
+            status[node_id] = node_status
+            try:
+                taken_edges = self._take_edges(nodes[node_id], node_status, outgoing[node_id], variables)
+            except (ExecutionError, ValueError) as e:
+                logger.error(f"Cannot continue after node {node_id}: {e}")
+                taken_edges = set()
+                if error is None:
+                    error = str(e)
+            for edge in outgoing[node_id]:
+                taken[edge["id"]] = edge["id"] in taken_edges
+                unresolved[edge["target"]] -= 1
+                if unresolved[edge["target"]] == 0:
+                    ready.append(edge["target"])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dag-worker") as pool:
+            while ready or running:
+                while ready and error is None:
+                    node_id = ready.popleft()
+                    node = nodes[node_id]
+                    if incoming[node_id] and not any(taken[edge["id"]] for edge in incoming[node_id]):
+                        finish(node_id, NODE_SKIPPED)
+                    elif node.get("type") == "task":
+                        future = pool.submit(self._run_task, node, graphical_model, dict(variables), started)
+                        running[future] = node_id
+                    else:
+                        # events, gateways and data nodes only route the flow
+                        now = time.perf_counter() - started
+                        timings[node_id] = (now, now, threading.current_thread().name)
+                        finish(node_id, NODE_DONE)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id = running.pop(future)
+                    result, exception, start, end, worker = future.result()
+                    timings[node_id] = (start, end, worker)
+                    if exception is None:
+                        results[node_id] = result
+                        self._publish_result(nodes[node_id], result, variables)
+                        finish(node_id, NODE_DONE)
+                    elif any(edge.get("type") == "exceptional" for edge in outgoing[node_id]):
+                        logger.info(f"Task {node_id} failed, following its exceptional links: {exception}")
+                        results[node_id] = {"error": str(exception)}
+                        finish(node_id, NODE_FAILED)
+                    else:
+                        logger.error(f"Task {node_id} failed: {exception}")
+                        status[node_id] = NODE_FAILED
+                        results[node_id] = {"error": str(exception)}
+                        if error is None:
+                            error = f"Task {node_id} failed: {exception}"
+
+        wall_time = time.perf_counter() - started
+        for node_id in nodes:
+            status.setdefault(node_id, NODE_CANCELLED)
+        return self._report(nodes, order, incoming, taken, status, results, timings, wall_time, error)
+
+    def _run_task(self, node, graphical_model, variables, started):
+        """Run one task on a worker thread, capturing its result or error and its timing."""
+        start = time.perf_counter() - started
+        result = exception = None
+        try:
+            variant = current_variant(node)
+            if variant and variant.get("is_composite") and variant.get("graphical_model", {}).get("nodes"):
+                report = self.run(variant["graphical_model"], variables)
+                if not report["success"]:
+                    raise ExecutionError(report["error"])
+                result = {"subflow": report}
+            elif self.task_runner:
+                result = self.task_runner(node, graphical_model, variables)
+        except Exception as e:
+            exception = e
+        end = time.perf_counter() - started
+        return result, exception, start, end, threading.current_thread().name
+
+    def _take_edges(self, node, node_status, edges, variables):
+        """Ids of the outgoing links of a finished node that the flow continues along."""
+        if node_status == NODE_SKIPPED:
+            return set()
+        if node_status == NODE_FAILED:
+            return {edge["id"] for edge in edges if edge.get("type") == "exceptional"}
+
+        edges = [edge for edge in edges if edge.get("type") != "exceptional"]
+        taken = {
+            edge["id"] for edge in edges
+            if edge.get("type") != "conditional"
+            or evaluate_condition((edge.get("data") or {}).get("condition", ""), variables)
+        }
+
+        if node.get("type") not in ("opExclusive", "opInclusive") or len(edges) < 2:
+            return taken
+
+        cases = [
+            case
+            for condition in (node.get("data") or {}).get("conditions", [])
+            for case in condition.get("cases", [])
+        ]
+        case_targets = {case.get("targetNodeId") for case in cases}
+        matched = []
+        for case in cases:
+            if case.get("targetNodeId") not in matched and evaluate_condition(case.get("condition", ""), variables):
+                matched.append(case["targetNodeId"])
+                if node["type"] == "opExclusive":
+                    break
+
+        branches = [edge for edge in edges if edge["id"] in taken]
+        if matched:
+            branches = [edge for edge in branches if edge["target"] in matched]
+        else:
+            # branches without a case are the default ones
+            branches = [edge for edge in branches if edge["target"] not in case_targets]
+        if node["type"] == "opExclusive":
+            if not branches:
+                raise ExecutionError(f"No branch of exclusive gateway {node['id']} can be taken")
+            branches = branches[:1]
+        return {edge["id"] for edge in branches}
+
+    def _publish_result(self, node, result, variables):
+        """Make a task result available to the conditions evaluated after it."""
+        variant = current_variant(node)
+        if variant and variant.get("name"):
+            variables[variant["name"]] = result
+        if isinstance(result, dict) and "subflow" not in result:
+            variables.update(result)
+
+    def _report(self, nodes, order, incoming, taken, status, results, timings, wall_time, error):
+        entries = []
+        for node_id in order:
+            node = nodes[node_id]
+            variant = current_variant(node)
+            entry = {
+                "id": node_id,
+                "type": node.get("type"),
+                "name": variant.get("name") if variant else (node.get("data") or {}).get("name"),
+                "status": status[node_id],
+            }
+            if node_id in timings:
+                start, end, worker = timings[node_id]
+                entry.update({
+                    "start": round(start, 6),
+                    "end": round(end, 6),
+                    "duration": round(end - start, 6),
+                    "worker": worker,
+                })
+            if node_id in results:
+                entry["result"] = results[node_id]
+            entries.append(entry)
+        entries.sort(key=lambda entry: entry.get("start", float("inf")))
+
+        busy_time = sum(end - start for start, end, _ in timings.values())
+        return {
+            "success": error is None,
+            "error": error,
+            "wall_time": round(wall_time, 6),
+            "busy_time": round(busy_time, 6),
+            "parallelism": round(busy_time / wall_time, 2) if wall_time > 0 else 0.0,
+            "nodes": entries,
+            "critical_path": self._critical_path(order, incoming, taken, timings),
+        }
+
+    def _critical_path(self, order, incoming, taken, timings) -> Dict[str, Any]:
+        """
+        Longest chain of executed nodes along the links that were taken, weighted by the
+        node durations. Shortening anything off this chain does not make the run faster.
+        """
+        length = {}
+        previous = {}
+        for node_id in order:
+            if node_id not in timings:
+                continue
+            start, end, _ = timings[node_id]
+            best = None
+            for edge in incoming[node_id]:
+                source = edge["source"]
+                if taken.get(edge["id"]) and source in length and (best is None or length[source] > length[best]):
+                    best = source
+            length[node_id] = (end - start) + (length[best] if best else 0.0)
+            previous[node_id] = best
+
+        if not length:
+            return {"nodes": [], "duration": 0.0}
+        # on ties prefer the later node, so the path reaches the end event
+        node_id = max(reversed(list(length)), key=length.get)
+        duration = length[node_id]
+        path = []
+        while node_id:
+            path.append(node_id)
+            node_id = previous[node_id]
+        return {"nodes": path[::-1], "duration": round(duration, 6)}
+
+    @staticmethod
+    def _topological_order(nodes, incoming, outgoing) -> List[str]:
+        """Kahn's algorithm, keeping the order of the model for independent nodes."""
+        in_degree = {node_id: len(incoming[node_id]) for node_id in nodes}
+        queue = deque(node_id for node_id in nodes if in_degree[node_id] == 0)
+        order = []
+        while queue:
+            node_id = queue.popleft()
+            order.append(node_id)
+            for edge in outgoing[node_id]:
+                in_degree[edge["target"]] -= 1
+                if in_degree[edge["target"]] == 0:
+                    queue.append(edge["target"])
+        if len(order) < len(nodes):
+            cyclic = sorted(node_id for node_id in nodes if in_degree[node_id] > 0)
+            raise ExecutionError(f"Workflow graph has a cycle through: {', '.join(cyclic)}")
+        return order
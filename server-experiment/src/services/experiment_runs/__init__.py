@@ -0,0 +1,12 @@
+from .runner import ExperimentRunner, evaluate_point, initialize_experiment_runner, get_experiment_runner
+from .sampling import ParameterDomain, SearchSpace, make_strategy
+
+__all__ = [
+    'ExperimentRunner',
+    'evaluate_point',
+    'initialize_experiment_runner',
+    'get_experiment_runner',
+    'ParameterDomain',
+    'SearchSpace',
+    'make_strategy',
+]
@@ -0,0 +1,315 @@
+import copy
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import groupby
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Optional
+from config.logging_config import get_logger
+from services.execution import current_variant
+from .sampling import make_strategy, parameter_key
+
+logger = get_logger(__name__)
+
+STATUS_IDLE = "idle"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def apply_point(graphical_model: Dict[str, Any], point: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of a workflow graph with the values of a point set on the parameters of the
+    selected task variants, subflows included. A parameter takes the value keyed by
+    parameter_key(<variant name>, <name>), as the search space names parameters that
+    several tasks share, or else the one keyed by its name.
+    """
+    graphical_model = copy.deepcopy(graphical_model)
+    pending = [graphical_model]
+    while pending:
+        model = pending.pop()
+        for node in model.get("nodes", []) or []:
+            variant = current_variant(node)
+            if variant is None:
+                continue
+            for parameter in variant.get("parameters") or []:
+                name = parameter.get("name")
+                for key in (parameter_key(variant.get("name"), name), name):
+                    if key in point:
+                        parameter["value"] = point[key]
+                        break
+            if variant.get("graphical_model"):
+                pending.append(variant["graphical_model"])
+    return graphical_model
+
+
+def _execution_order(step: Dict[str, Any]) -> float:
+    """Sort key of a step, steps without an executionOrder run last."""
+    order = step.get("executionOrder")
+    return float("inf") if order is None else order
+
+
+def evaluate_point(graphical_model: Dict[str, Any], point: Dict[str, Any], budget: Optional[float]) -> Dict[str, Any]:
+    """
+    Run the workflow of a space with the parameter values of one point. Runs in a worker
+    process; the values of the point are set on the task parameters, and the point and
+    the budget are also the variables of the run, for the gateway conditions.
+
+    Returns:
+        dict: Whether the run succeeded, its error, and the numeric task results as metrics
+    """
+    from handlers.executionHandler import executionHandler
+
+    variables = dict(point)
+    if budget is not None:
+        variables["budget"] = budget
+    started = time.perf_counter()
+    execution = executionHandler.execute_workflow(apply_point(graphical_model, point), variables)
+    metrics = {}
+    for node in execution.get("report", {}).get("nodes", []):
+        result = node.get("result")
+        if isinstance(result, dict):
+            metrics.update(
+                (name, value) for name, value in result.items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            )
+    return {
+        "verified": execution["verified"],
+        "error": execution.get("error"),
+        "metrics": metrics,
+        "duration": time.perf_counter() - started,
+    }
+
+
+class ExperimentRunner:
+    """
+    Runs the experiment spaces of experiments. Steps run one after the other in their
+    executionOrder, the spaces of a step run side by side, and the points of every space
+    are evaluated on a shared pool of worker processes. Points are generated lazily and
+    at most max_workers points of a space are in flight at a time.
+
+    Progress is kept on a copy of the experiment steps: every space and step moves from
+    idle to running to done, and each space collects the results of its points.
+    """
+
+    def __init__(self, workflow_loader: Callable, evaluate: Callable = evaluate_point,
+                 max_workers: Optional[int] = None, on_update: Optional[Callable] = None,
+                 update_interval: float = 1.0):
+        """
+        Initialize the runner.
+
+        Args:
+            workflow_loader: Callable returning the graphical model of a workflow id
+            evaluate: Picklable callable(graphical_model, point, budget) evaluating one point
+            max_workers: Number of worker processes, the CPU count by default
+            on_update: Callable(exp_id, steps) storing the progress of a run
+            update_interval: Minimum seconds between two calls of on_update during a run
+        """
+        self.workflow_loader = workflow_loader
+        self.evaluate = evaluate
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self._runs = {}
+        self._condition = threading.Condition()
+        self._pool = None
+        logger.info(f"ExperimentRunner created with {self.max_workers} workers")
+
+    def start(self):
+        with self._condition:
+            if self._pool is None:
+                # spawned, not forked: forking the threads of the watcher, the job queue and
+                # the database clients can deadlock the child on a lock held by one of them
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=get_context("spawn"))
+        logger.info("ExperimentRunner started")
+
+    def stop(self):
+        with self._condition:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("ExperimentRunner stopped")
+
+    def submit(self, exp_id: str, exp: dict) -> Dict:
+        """
+        Start running the spaces of an experiment in the background.
+
+        Args:
+            exp_id: Id of the experiment
+            exp: The experiment, with its steps
+
+        Returns:
+            dict: The run
+        """
+        steps = copy.deepcopy(exp.get("steps") or [])
+        for step in steps:
+            step["status"] = STATUS_IDLE
+            for space in step.get("spaces", []) or []:
+                space.update(status=STATUS_IDLE, results=[], error=None)
+        run = {
+            "id": str(uuid.uuid4()),
+            "exp_id": exp_id,
+            "status": STATUS_RUNNING,
+            "started_at": time.time(),
+            "finished_at": None,
+            "error": None,
+            "version": 0,
+            "steps": steps,
+        }
+        with self._condition:
+            self._runs[run["id"]] = run
+        threading.Thread(target=self._run, args=(run,), name=f"experiment-run-{run['id'][:8]}", daemon=True).start()
+        logger.info(f"Experiment run {run['id']} started for experiment {exp_id}")
+        return self.get_run(run["id"])
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        with self._condition:
+            run = self._runs.get(run_id)
+            return copy.deepcopy(run) if run else None
+
+    def wait_for_update(self, run_id: str, version: int, timeout: float) -> Optional[Dict]:
+        """
+        Block until the run has a version newer than the given one, or until the timeout.
+
+        Returns:
+            dict: The run, or None if it does not exist
+        """
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                run = self._runs.get(run_id)
+                if run is None or run["version"] > version:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return copy.deepcopy(run) if run else None
+
+    def _run(self, run: dict):
+        last_saved = [0.0]
+        try:
+            # steps without an executionOrder run last, in the order of the document
+            ordered = sorted(run["steps"], key=_execution_order)
+            for _, group in groupby(ordered, key=_execution_order):
+                group = list(group)
+                spaces = [space for step in group for space in step.get("spaces", []) or []]
+                self._update(run, last_saved, lambda: [step.update(status=STATUS_RUNNING) for step in group])
+                if spaces:
+                    with ThreadPoolExecutor(max_workers=len(spaces)) as drivers:
+                        list(drivers.map(lambda space: self._run_space(run, last_saved, space), spaces))
+                self._update(run, last_saved, lambda: [step.update(status=STATUS_DONE) for step in group])
+            status, error = STATUS_DONE, None
+        except Exception as e:
+            logger.error(f"Experiment run {run['id']} failed: {str(e)}", exc_info=True)
+            status, error = STATUS_FAILED, str(e)
+        self._update(run, None, lambda: run.update(status=status, error=error, finished_at=time.time()))
+        logger.info(f"Experiment run {run['id']} {status}")
+
+    def _run_space(self, run: dict, last_saved: list, space: dict):
+        self._update(run, last_saved, lambda: space.update(status=STATUS_RUNNING))
+        try:
+            strategy = make_strategy(space)
+            graphical_model = self.workflow_loader(space.get("workflow_id"))
+            previous = None
+            round_number = 0
+            while True:
+                batch = strategy.next_round(previous)
+                if batch is None:
+                    break
+                previous = self._evaluate_batch(run, last_saved, space, graphical_model, batch, round_number)
+                round_number += 1
+        except Exception as e:
+            logger.error(f"Space {space.get('name')} of run {run['id']} failed: {str(e)}")
+            self._update(run, last_saved, lambda: space.update(error=str(e)))
+        self._update(run, None, lambda: space.update(status=STATUS_DONE))
+
+    def _evaluate_batch(self, run, last_saved, space, graphical_model, batch, round_number):
+        """Evaluate the points of one round, keeping at most max_workers of them in flight."""
+        with self._condition:
+            pool = self._pool
+        if pool is None:
+            raise RuntimeError("experiment runner is not running")
+
+        points = iter(batch)
+        in_flight = {}
+        results = []
+        while True:
+            while len(in_flight) < self.max_workers:
+                item = next(points, None)
+                if item is None:
+                    break
+                point, budget = item
+                in_flight[pool.submit(self.evaluate, graphical_model, point, budget)] = (point, budget)
+            if not in_flight:
+                return results
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                point, budget = in_flight.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = {"verified": False, "error": str(e), "metrics": {}, "duration": None}
+                result = {"point": point, "budget": budget, "round": round_number, **outcome}
+                results.append(result)
+                self._update(run, last_saved, lambda: space["results"].append(result))
+
+    def _update(self, run: dict, last_saved: Optional[list], change: Callable):
+        """
+        Apply a change to the run and wake up the subscribers. The progress is stored
+        through on_update at most every update_interval seconds, or always without last_saved.
+        """
+        with self._condition:
+            change()
+            run["version"] += 1
+            self._condition.notify_all()
+            now = time.time()
+            save = last_saved is None or now - last_saved[0] >= self.update_interval
+            if save and last_saved is not None:
+                last_saved[0] = now
+            steps = copy.deepcopy(run["steps"]) if save and self.on_update else None
+        if steps is not None:
+            try:
+                self.on_update(run["exp_id"], steps)
+            except Exception as e:
+                logger.error(f"Error storing progress of experiment {run['exp_id']}: {str(e)}")
+
+
+# Global experiment runner instance
+_runner_instance: "ExperimentRunner | None" = None
+
+
+def initialize_experiment_runner(workflow_loader: Callable, max_workers: Optional[int] = None,
+                                 on_update: Optional[Callable] = None) -> "ExperimentRunner":
+    """
+    Initialize the global experiment runner instance.
+
+    Args:
+        workflow_loader: Callable returning the graphical model of a workflow id
+        max_workers: Number of worker processes, the CPU count by default
+        on_update: Callable(exp_id, steps) storing the progress of a run
+
+    Returns:
+        ExperimentRunner: The initialized experiment runner
+    """
+    global _runner_instance
+
+    if _runner_instance is not None:
+        logger.warning("Experiment runner already initialized, returning existing instance")
+        return _runner_instance
+
+    _runner_instance = ExperimentRunner(workflow_loader, max_workers=max_workers, on_update=on_update)
+    return _runner_instance
+
+
+def get_experiment_runner() -> "ExperimentRunner | None":
+    """
+    Get the global experiment runner instance.
+
+    Returns:
+        ExperimentRunner: The experiment runner instance, or None if not initialized
+    """
+    return _runner_instance
@@ -0,0 +1,226 @@
+import math
+import random
+from typing import Any, Dict, Iterator, List, Optional
+
+# points a range without a step is split into for a grid search
+DEFAULT_GRID_POINTS = 5
+
+
+def parameter_key(task_name: str, parameter_name: str) -> str:
+    """Key of a parameter that several tasks share, in the points of a search space."""
+    return f"{task_name}_{parameter_name}"
+
+
+class ParameterDomain:
+    """
+    Values of one hyperparameter: an explicit list of values, or a range [start, stop]
+    or [start, stop, step] with the stop included. A range of floats without a step is
+    continuous; random search samples it uniformly and grid search splits it evenly.
+    """
+
+    def __init__(self, name: str, parameter: Dict[str, Any]):
+        self.name = name
+        self.values = list(parameter.get("values") or [])
+        self.low = self.high = self.step = None
+        value_range = parameter.get("range") or []
+        if not self.values and value_range:
+            if len(value_range) < 2:
+                raise ValueError(f"Range of parameter {name} needs a start and a stop")
+            self.low, self.high = value_range[0], value_range[1]
+            if len(value_range) > 2:
+                self.step = value_range[2]
+            elif isinstance(self.low, int) and isinstance(self.high, int):
+                self.step = 1
+            if self.step is not None and self.step <= 0:
+                raise ValueError(f"Range of parameter {name} needs a positive step")
+
+    @property
+    def continuous(self) -> bool:
+        return not self.values and self.low is not None and self.step is None
+
+    @property
+    def size(self) -> int:
+        """Number of grid values."""
+        if self.values:
+            return len(self.values)
+        if self.low is None:
+            return 1
+        if self.step is None:
+            return DEFAULT_GRID_POINTS
+        return int(math.floor((self.high - self.low) / self.step + 1e-9)) + 1
+
+    def value_at(self, index: int) -> Any:
+        if self.values:
+            return self.values[index]
+        if self.low is None:
+            return None
+        if self.step is None:
+            return round(self.low + index * (self.high - self.low) / (DEFAULT_GRID_POINTS - 1), 12)
+        value = self.low + index * self.step
+        return value if isinstance(value, int) else round(value, 12)
+
+    def sample(self, rng: random.Random) -> Any:
+        if self.continuous:
+            return rng.uniform(self.low, self.high)
+        return self.value_at(rng.randrange(self.size))
+
+
+class SearchSpace:
+    """
+    Cartesian product of parameter domains. Points are decoded from their index on
+    demand, so neither grid nor random search ever enumerates the whole space.
+    """
+
+    def __init__(self, domains: List[ParameterDomain]):
+        self.domains = domains
+
+    @classmethod
+    def from_space(cls, space: Dict[str, Any]) -> "SearchSpace":
+        """
+        Search space of an experiment space, over the hyperparameters of the selected
+        variant of every task. Parameters are keyed by name, or by parameter_key(<task>, <name>)
+        when several tasks share a name, <task> being the name of the selected variant as
+        apply_point finds it in the workflow.
+        """
+        parameters = []
+        for step in space.get("steps", []) or []:
+            tasks = step.get("tasks", []) or []
+            task = next((task for task in tasks if task.get("selected")), tasks[0] if tasks else None)
+            for parameter in (task or {}).get("hyperParameters", []) or []:
+                parameters.append((task.get("name") or step.get("name"), parameter))
+
+        names = [parameter.get("name") for _, parameter in parameters]
+        return cls([
+            ParameterDomain(
+                parameter.get("name") if names.count(parameter.get("name")) == 1 else parameter_key(task_name, parameter.get("name")),
+                parameter,
+            )
+            for task_name, parameter in parameters
+        ])
+
+    @property
+    def size(self) -> int:
+        return math.prod(domain.size for domain in self.domains)
+
+    def point_at(self, index: int) -> Dict[str, Any]:
+        """Point with the given index in grid order, the last parameter varying fastest."""
+        point = {}
+        for domain in reversed(self.domains):
+            index, position = divmod(index, domain.size)
+            point[domain.name] = domain.value_at(position)
+        return {domain.name: point[domain.name] for domain in self.domains}
+
+    def grid(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self.size):
+            yield self.point_at(index)
+
+    def random(self, count: int, seed: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Random points. Discrete spaces are sampled without replacement; continuous
+        parameters are drawn uniformly for every point.
+        """
+        rng = random.Random(seed)
+        if any(domain.continuous for domain in self.domains):
+            for _ in range(count):
+                yield {domain.name: domain.sample(rng) for domain in self.domains}
+            return
+        # sampling from a range object draws indices without materializing the space
+        for index in rng.sample(range(self.size), min(count, self.size)):
+            yield self.point_at(index)
+
+
+class SearchStrategy:
+    """
+    Proposes rounds of (point, budget) pairs to evaluate; a round may depend on the
+    results of the previous one.
+    """
+
+    def next_round(self, previous: Optional[List[Dict[str, Any]]]):
+        raise NotImplementedError
+
+
+class GridSearch(SearchStrategy):
+    def __init__(self, space: SearchSpace):
+        self.space = space
+
+    def next_round(self, previous):
+        if previous is not None:
+            return None
+        return ((point, None) for point in self.space.grid())
+
+
+class RandomSearch(SearchStrategy):
+    def __init__(self, space: SearchSpace, samples: int, seed: Optional[int] = None):
+        self.space = space
+        self.samples = samples
+        self.seed = seed
+
+    def next_round(self, previous):
+        if previous is not None:
+            return None
+        return ((point, None) for point in self.space.random(self.samples, self.seed))
+
+
+class SuccessiveHalving(SearchStrategy):
+    """
+    Evaluates random points with a small budget, then keeps the best 1/eta of them and
+    evaluates those again with eta times the budget, until one point or the maximum
+    budget is left.
+    """
+
+    def __init__(self, space: SearchSpace, samples: int, objective: str = "score", goal: str = "max",
+                 eta: int = 3, min_budget: float = 1, max_budget: Optional[float] = None, seed: Optional[int] = None):
+        self.space = space
+        self.samples = samples
+        self.objective = objective
+        self.goal = goal
+        self.eta = max(2, eta)
+        self.budget = min_budget
+        self.max_budget = max_budget
+        self.seed = seed
+
+    def next_round(self, previous):
+        if previous is None:
+            return [(point, self.budget) for point in self.space.random(self.samples, self.seed)]
+        if len(previous) <= 1 or (self.max_budget is not None and self.budget * self.eta > self.max_budget):
+            return None
+
+        def rank(result):
+            value = (result.get("metrics") or {}).get(self.objective)
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or math.isnan(value):
+                return math.inf
+            return -value if self.goal == "max" else value
+
+        survivors = sorted(previous, key=rank)[:max(1, len(previous) // self.eta)]
+        self.budget *= self.eta
+        return [(result["point"], self.budget) for result in survivors]
+
+
+def make_strategy(space: Dict[str, Any]) -> SearchStrategy:
+    """
+    Search strategy of an experiment space, from its searchMethod and the optional
+    samples, seed, objective, goal, eta, minBudget and maxBudget fields.
+
+    Raises:
+        ValueError: If the search method is not supported
+    """
+    search_space = SearchSpace.from_space(space)
+    method = (space.get("searchMethod") or "grid").lower().replace("-", "_")
+    samples = int(space.get("samples", 20))
+    seed = space.get("seed")
+    if method == "grid":
+        return GridSearch(search_space)
+    if method == "random":
+        return RandomSearch(search_space, samples, seed)
+    if method in ("halving", "successive_halving"):
+        return SuccessiveHalving(
+            search_space,
+            samples,
+            objective=space.get("objective", "score"),
+            goal=space.get("goal", "max"),
+            eta=int(space.get("eta", 3)),
+            min_budget=space.get("minBudget", 1),
+            max_budget=space.get("maxBudget"),
+            seed=seed,
+        )
+    raise ValueError(f"Unsupported search method: {space.get('searchMethod')}")
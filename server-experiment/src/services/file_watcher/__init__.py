@@ -1,12 +1,33 @@
-from .event_registry import register_api_event, should_ignore_event
+from .event_registry import register_api_event, should_ignore_event, get_event_registry_stats
 from .watcher import FileSystemWatcher, initialize_watcher, get_watcher
 from .event_handlers import FileSystemSyncHandler
+from .coalescer import EventCoalescer, FileChange
+from .worker_pool import KeyedWorkerPool
+from .write_batcher import WriteBatcher
+from .content_index import ContentIndex
+from .reconciler import WorkspaceReconciler
+from .polling import WorkspacePollingEmitter, WorkspacePollingObserver
+from .scoped import ScopedInotifyEmitter, ScopedInotifyObserver
+from .shards import EventRate, shard_of
 
 __all__ = [
     'register_api_event',
     'should_ignore_event',
+    'get_event_registry_stats',
     'FileSystemWatcher',
     'initialize_watcher',
     'get_watcher',
     'FileSystemSyncHandler',
+    'EventCoalescer',
+    'FileChange',
+    'KeyedWorkerPool',
+    'WriteBatcher',
+    'ContentIndex',
+    'WorkspaceReconciler',
+    'WorkspacePollingEmitter',
+    'WorkspacePollingObserver',
+    'ScopedInotifyEmitter',
+    'ScopedInotifyObserver',
+    'EventRate',
+    'shard_of',
 ]
@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+RENAMED = "renamed"
+
+
+class FileChange(NamedTuple):
+    """Net effect of the events of one file within a quiet window."""
+    kind: str
+    path: str
+    old_path: Optional[str] = None
+    # for renames, whether the content changed as well
+    modified: bool = False
+
+
+class _Pending:
+    """Events of one path seen so far: whether the file existed before the first one and exists now."""
+
+    __slots__ = ("existed", "exists", "modified", "renamed_from", "last_event")
+
+    def __init__(self, existed: bool):
+        self.existed = existed
+        self.exists = existed
+        self.modified = False
+        self.renamed_from = None
+        self.last_event = 0.0
+
+
+class EventCoalescer:
+    """
+    Folds bursts of filesystem events into one net change per file. Editors and git emit
+    several events per save (create + modifies, delete + create for atomic saves, delete +
+    create for renames on macOS); the events of a path are collected until it has been
+    quiet for quiet_seconds, and only the final state is passed to process:
+
+        created + modified*           -> created
+        modified+                     -> modified
+        deleted + created + modified* -> modified
+        created + deleted             -> nothing
+        moved a -> b (+ modified*)    -> renamed a -> b
+        deleted a + created b         -> renamed a -> b, if they are the only two in a directory
+                                         and same_file(a, b) says b is the file that was a
+
+    With quiet_seconds = 0 every event is processed at once, as without coalescing.
+    """
+
+    def __init__(self, process: Callable[[FileChange], None], quiet_seconds: float = 0.5,
+                 same_file: Optional[Callable[[str, str], bool]] = None):
+        """
+        Initialize the coalescer.
+
+        Args:
+            process: Callable applying one net change
+            quiet_seconds: Time without events after which the changes of a path are processed
+            same_file: Callable telling whether a created file is a deleted one renamed, e.g. by its content;
+                without it a delete and a create are never merged into a rename
+        """
+        self.process = process
+        self.quiet_seconds = quiet_seconds
+        self.same_file = same_file
+        self._pending: Dict[str, _Pending] = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._stats = {"events": 0, "changes": 0, "dropped": 0}
+
+    def start(self):
+        with self._condition:
+            if self._running or self.quiet_seconds <= 0:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="watcher-coalescer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, processing the changes still pending."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+            thread, self._thread = self._thread, None
+        if thread:
+            thread.join(timeout=5)
+        self.flush()
+
+    def created(self, path: str):
+        self._add(path, existed=False, exists=True, modified=True)
+
+    def modified(self, path: str):
+        self._add(path, existed=True, exists=True, modified=True)
+
+    def deleted(self, path: str):
+        self._add(path, existed=True, exists=False)
+
+    def moved(self, src_path: str, dest_path: str):
+        with self._condition:
+            self._stats["events"] += 1
+            now = time.monotonic()
+            source = self._pending.pop(src_path, None) or _Pending(existed=True)
+            if source.existed or source.renamed_from:
+                # the path starts over, a file created there later is new; if the moved file had
+                # itself replaced a file there, that file is gone
+                gone = _Pending(existed=source.existed and source.renamed_from is not None)
+                gone.exists = False
+                gone.last_event = now
+                self._pending[src_path] = gone
+
+            dest = self._pending.setdefault(dest_path, _Pending(existed=False))
+            self._orphan(dest, now)
+            dest.exists = True
+            dest.modified = source.modified
+            dest.renamed_from = source.renamed_from or (src_path if source.existed else None)
+            dest.last_event = now
+        self._after_event()
+
+    def flush(self, force: bool = True) -> int:
+        """
+        Process the pending changes, all of them or only those of quiet paths.
+
+        Returns:
+            int: Number of changes processed
+        """
+        with self._condition:
+            now = time.monotonic()
+            ready = [
+                (path, pending) for path, pending in self._pending.items()
+                if force or now - pending.last_event >= self.quiet_seconds
+            ]
+            for path, _ in ready:
+                del self._pending[path]
+        # outside the lock, same_file may read the files
+        changes = self._net_changes(ready)
+        with self._condition:
+            self._stats["changes"] += len(changes)
+            self._stats["dropped"] += len(ready) - len(changes)
+
+        for change in changes:
+            try:
+                self.process(change)
+            except Exception as e:
+                logger.error(f"Error processing {change.kind} of {change.path}: {str(e)}", exc_info=True)
+        return len(changes)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self._stats, "pending": len(self._pending)}
+
+    def _add(self, path: str, existed: bool, exists: bool, modified: bool = False):
+        with self._condition:
+            self._stats["events"] += 1
+            pending = self._pending.get(path)
+            if pending is None:
+                pending = self._pending[path] = _Pending(existed)
+            pending.last_event = time.monotonic()
+            if not exists:
+                # the content of a deleted file no longer matters
+                self._orphan(pending, pending.last_event)
+                modified = pending.modified = False
+            pending.exists = exists
+            pending.modified = pending.modified or modified
+        self._after_event()
+
+    def _orphan(self, pending: _Pending, now: float):
+        """The file renamed to a path is deleted or replaced: its original is deleted. Called with the lock held."""
+        if not pending.exists or not pending.renamed_from:
+            return
+        origin = self._pending.setdefault(pending.renamed_from, _Pending(existed=True))
+        origin.existed, origin.exists, origin.modified = True, False, False
+        origin.last_event = now
+        pending.renamed_from = None
+
+    def _after_event(self):
+        if self.quiet_seconds <= 0:
+            self.flush()
+        else:
+            with self._condition:
+                self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                due = min(pending.last_event for pending in self._pending.values()) + self.quiet_seconds
+                if due > now:
+                    self._condition.wait(due - now)
+                    continue
+            self.flush(force=False)
+
+    def _net_changes(self, ready) -> List[FileChange]:
+        changes = []
+        created_by_dir, deleted_by_dir = {}, {}
+        for path, pending in ready:
+            if pending.renamed_from and pending.exists:
+                if pending.renamed_from == path:
+                    if pending.modified:
+                        changes.append(FileChange(MODIFIED, path))
+                    continue
+                if pending.existed:
+                    # moved over an existing file, which is gone
+                    changes.append(FileChange(DELETED, path))
+                changes.append(FileChange(RENAMED, path, pending.renamed_from, pending.modified))
+            elif pending.existed and pending.exists:
+                if pending.modified:
+                    changes.append(FileChange(MODIFIED, path))
+            elif pending.existed:
+                deleted_by_dir.setdefault(os.path.dirname(path), []).append(path)
+            elif pending.exists:
+                created_by_dir.setdefault(os.path.dirname(path), []).append(path)
+
+        for directory in set(created_by_dir) | set(deleted_by_dir):
+            created = created_by_dir.get(directory, [])
+            deleted = deleted_by_dir.get(directory, [])
+            if len(created) == 1 and len(deleted) == 1 and self.same_file and self.same_file(deleted[0], created[0]):
+                # a rename reported as delete + create, as on macOS
+                changes.append(FileChange(RENAMED, created[0], deleted[0]))
+                continue
+            changes.extend(FileChange(DELETED, path) for path in deleted)
+            changes.extend(FileChange(CREATED, path) for path in created)
+        return changes
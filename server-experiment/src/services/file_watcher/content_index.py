@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class Fingerprint(NamedTuple):
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+class ContentIndex:
+    """
+    Persistent index of workspace file contents: path -> size, mtime and SHA-256, kept in a
+    SQLite database so it survives restarts. The watcher uses it to drop modifications that
+    did not change the content of a file (touch, a checkout of identical content, a save
+    without changes). Size and mtime are a fast pre-check; the file is only hashed when they
+    differ from the indexed ones.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        Initialize the index, creating the database if needed.
+
+        Args:
+            index_path: Path of the SQLite database file
+        """
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)"
+        )
+        self._connection.commit()
+        self._lock = threading.Lock()
+        self._stats = {"unchanged_stat": 0, "unchanged_content": 0, "changed": 0}
+        logger.info(f"ContentIndex opened at {self.index_path}")
+
+    def lookup(self, path: str) -> Tuple[Fingerprint, bool]:
+        """
+        Fingerprint a file and compare it with the indexed one.
+
+        Returns:
+            tuple: The fingerprint, and whether the content is the indexed one
+
+        Raises:
+            OSError: If the file cannot be read
+        """
+        stat = os.stat(path)
+        indexed = self.get(path)
+        if indexed is not None and indexed.size == stat.st_size and indexed.mtime_ns == stat.st_mtime_ns:
+            with self._lock:
+                self._stats["unchanged_stat"] += 1
+            return indexed, True
+
+        fingerprint = Fingerprint(stat.st_size, stat.st_mtime_ns, self._hash(path))
+        unchanged = indexed is not None and indexed.sha256 == fingerprint.sha256
+        with self._lock:
+            self._stats["unchanged_content" if unchanged else "changed"] += 1
+        if unchanged:
+            # only the metadata changed, remember it so the next check is a stat call again
+            self.record(path, fingerprint)
+        return fingerprint, unchanged
+
+    def get(self, path: str) -> Optional[Fingerprint]:
+        with self._lock:
+            row = self._connection.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (path,)).fetchone()
+        return Fingerprint(*row) if row else None
+
+    def record(self, path: str, fingerprint: Fingerprint):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (path, *fingerprint),
+            )
+            self._connection.commit()
+
+    def record_many(self, fingerprints: Dict[str, Fingerprint]):
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                ((path, *fingerprint) for path, fingerprint in fingerprints.items()),
+            )
+            self._connection.commit()
+
+    def entries(self, prefix: str = "") -> Dict[str, Fingerprint]:
+        """Indexed files whose path starts with prefix, in one range query over the primary key."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, size, mtime_ns, sha256 FROM files WHERE path >= ? AND path < ?",
+                (prefix, prefix + "\uffff"),
+            ).fetchall()
+        return {path: Fingerprint(size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in rows}
+
+    def forget(self, path: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._connection.commit()
+
+    def forget_many(self, paths: Iterable[str]):
+        with self._lock:
+            self._connection.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in paths))
+            self._connection.commit()
+
+    def move(self, old_path: str, new_path: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM files WHERE path = ?", (new_path,))
+            self._connection.execute("UPDATE files SET path = ? WHERE path = ?", (new_path, old_path))
+            self._connection.commit()
+
+    def same_content(self, indexed_path: str, path: str) -> bool:
+        """Whether a file holds the indexed content of another path, e.g. a deleted file it was renamed from."""
+        indexed = self.get(indexed_path)
+        if indexed is None:
+            return False
+        try:
+            if os.stat(path).st_size != indexed.size:
+                return False
+            return self._hash(path) == indexed.sha256
+        except OSError:
+            return False
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            return {**self._stats, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def fingerprint(path: str, stat: os.stat_result) -> Fingerprint:
+        return Fingerprint(stat.st_size, stat.st_mtime_ns, ContentIndex._hash(path))
+
+    @staticmethod
+    def _hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
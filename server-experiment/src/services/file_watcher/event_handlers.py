@@ -1,8 +1,13 @@
+import threading
 from pathlib import Path
 from typing import TYPE_CHECKING
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import FileCreatedEvent, FileSystemEventHandler
 from config.logging_config import get_logger
+from .content_index import ContentIndex
+from .coalescer import CREATED, DELETED, MODIFIED, RENAMED, EventCoalescer, FileChange
 from .event_registry import should_ignore_event
+from .worker_pool import KeyedWorkerPool
+from .write_batcher import WriteBatcher
 
 if TYPE_CHECKING:
     from handlers.experimentHandler import ExperimentHandler
@@ -18,23 +23,70 @@ class FileSystemSyncHandler(FileSystemEventHandler):
     Handles filesystem events and synchronizes with MongoDB.
     Watches for file deletions, modifications, creations, and renames,
     and updates corresponding database entries.
+
+    Events are not applied one by one: they go through an EventCoalescer that folds the
+    bursts of events of a save into one net change per file, applied once the file has
+    been quiet for debounce_seconds. The changes are applied on a KeyedWorkerPool, so
+    conversions and database writes never hold up the observer thread; changes of the
+    same file are applied in order, changes of different files in parallel.
+
+    The database id of every file the watcher has stored is remembered by path, so that
+    deleting or renaming the entry of a file is a single indexed operation. The writes go
+    through a WriteBatcher, which groups the writes of a burst of changes into bulk writes.
     """
 
-    def __init__(self, experiment_handler: "ExperimentHandler", workflow_handler: "WorkflowHandler", file_system_handler: "FileSystemHandler", convertor_handler: "ConvertorHandler"):
+    def __init__(self, experiment_handler: "ExperimentHandler", workflow_handler: "WorkflowHandler", file_system_handler: "FileSystemHandler", convertor_handler: "ConvertorHandler", debounce_seconds: float = 0.5,
+                 workers: int = 4, max_pending: int = 1000, content_index: "ContentIndex | None" = None,
+                 write_window_seconds: float = 0.05, write_batch_size: int = 500):
         """
         Initialize the handler with database handlers.
 
         Args:
             experiment_handler: Handler for experiment database operations
             workflow_handler: Handler for workflow database operations
+            debounce_seconds: Quiet time after which the events of a file are applied, 0 to apply every event at once
+            workers: Number of threads applying changes
+            max_pending: Maximum number of changes waiting for a thread before the watcher is held back
+            content_index: Index of the applied file contents, modifications that did not change the content are dropped
+            write_window_seconds: How long a database write waits to be batched with others, 0 to write at once
+            write_batch_size: Maximum number of database writes per bulk write
         """
         super().__init__()
         self.experiment_handler = experiment_handler
         self.workflow_handler = workflow_handler
         self.file_system_handler = file_system_handler
         self.convertor_handler = convertor_handler
+        self.content_index = content_index
+        self.worker_pool = KeyedWorkerPool(self._apply_change, workers, max_pending)
+        # a delete and a create are a rename if the created file holds the indexed content of the deleted one
+        self.coalescer = EventCoalescer(self._submit_change, debounce_seconds,
+                                        content_index.same_content if content_index is not None else None)
+        self.write_batcher = WriteBatcher(self._bulk_write, write_window_seconds, write_batch_size)
+        # path -> id of the database entry, for the files stored by the watcher
+        self._document_ids = {}
+        self._document_ids_lock = threading.Lock()
         logger.info("FileSystemSyncHandler initialized")
 
+    def start(self):
+        self.write_batcher.start()
+        self.worker_pool.start()
+        self.coalescer.start()
+
+    def stop(self):
+        """Apply the changes still waiting for their quiet time, for a worker or to be written."""
+        self.coalescer.stop()
+        self.worker_pool.stop()
+        self.write_batcher.stop()
+
+    def get_stats(self):
+        return {
+            "events": self.coalescer.get_stats(),
+            "queue": self.worker_pool.get_stats(),
+            "writes": self.write_batcher.get_stats(),
+            "content_index": self.content_index.get_stats() if self.content_index else None,
+            "document_ids": len(self._document_ids),
+        }
+
     def on_deleted(self, event):
         """
         Called when a file or directory is deleted.
@@ -60,12 +112,15 @@ class FileSystemSyncHandler(FileSystemEventHandler):
             logger.info(f"Parsed - Username: {username}, Type: {parent_dir}, Name: {filename}")
 
             # Check if this deletion was initiated by the API (should be ignored)
-            if should_ignore_event('delete', username, parent_dir, filename):
+            if should_ignore_event('delete', username, parent_dir, filename, event.src_path):
                 logger.info(f"Skipping database cleanup for API-initiated deletion: {filename}")
+                self._forget_document_id(event.src_path)
+                # the API deleted the entry, the content applied last is gone with it
+                if self.content_index is not None:
+                    self.content_index.forget(event.src_path)
                 return
 
-            # Clean up from database based on file type
-            self._cleanup_file(username, filename, parent_dir)
+            self.coalescer.deleted(event.src_path)
 
         except Exception as e:
             logger.error(f"Error processing deleted file {event.src_path}: {str(e)}", exc_info=True)
@@ -95,12 +150,11 @@ class FileSystemSyncHandler(FileSystemEventHandler):
             logger.info(f"Parsed - Username: {username}, Type: {parent_dir}, Name: {filename}")
 
             # Check if this modification was initiated by the API (should be ignored)
-            if should_ignore_event('modify', username, parent_dir, filename):
+            if should_ignore_event('modify', username, parent_dir, filename, event.src_path):
                 logger.info(f"Skipping processing for API-initiated modification: {filename}")
                 return
 
-            # Process the modification based on file type
-            self._handle_file_modification(username, filename, parent_dir, event.src_path)
+            self.coalescer.modified(event.src_path)
 
         except Exception as e:
             logger.error(f"Error processing modified file {event.src_path}: {str(e)}", exc_info=True)
@@ -130,12 +184,12 @@ class FileSystemSyncHandler(FileSystemEventHandler):
             logger.info(f"Parsed - Username: {username}, Type: {parent_dir}, Name: {filename}")
 
             # Check if this creation was initiated by the API (should be ignored)
-            if should_ignore_event('create', username, parent_dir, filename):
+            if should_ignore_event('create', username, parent_dir, filename, event.src_path):
                 logger.info(f"Skipping processing for API-initiated creation: {filename}")
+                self._forget_document_id(event.src_path)
                 return
 
-            # Process the creation based on file type
-            self._handle_file_creation(username, filename, parent_dir, event.src_path)
+            self.coalescer.created(event.src_path)
 
         except Exception as e:
             logger.error(f"Error processing created file {event.src_path}: {str(e)}", exc_info=True)
@@ -150,8 +204,13 @@ class FileSystemSyncHandler(FileSystemEventHandler):
         if event.is_directory:
             return
 
-        # Only process .xxp files
+        # Only process .xxp files; a move from or to another name is a creation or a deletion
         if not event.dest_path.endswith('.xxp'):
+            if event.src_path.endswith('.xxp'):
+                self.on_deleted(event)
+            return
+        if not event.src_path.endswith('.xxp'):
+            self.on_created(FileCreatedEvent(event.dest_path))
             return
 
         try:
@@ -172,17 +231,250 @@ class FileSystemSyncHandler(FileSystemEventHandler):
             logger.info(f"New - Username: {new_username}, Type: {new_parent_dir}, Name: {new_filename}")
 
             # Check if this rename was initiated by the API (should be ignored)
-            if should_ignore_event('rename', new_username, new_parent_dir, new_filename):
+            if should_ignore_event('rename', new_username, new_parent_dir, new_filename, event.dest_path):
                 logger.info(f"Skipping processing for API-initiated rename: {old_filename} -> {new_filename}")
+                self._move_document_id(event.src_path, event.dest_path)
+                if self.content_index is not None:
+                    self.content_index.move(event.src_path, event.dest_path)
                 return
 
-            # Process the rename based on file type
-            self._handle_file_move(old_username, old_filename, old_parent_dir, new_username, new_filename, new_parent_dir, event.dest_path)
+            self.coalescer.moved(event.src_path, event.dest_path)
 
         except Exception as e:
             logger.error(f"Error processing renamed file {event.src_path}: {str(e)}", exc_info=True)
 
-    def _handle_file_modification(self, username, file_name, file_type, file_path):
+    def sync_files(self, file_paths, fingerprints=None):
+        """
+        Synchronize many workspace files with the database at once, e.g. after a checkout
+        or a bulk copy. The files are converted with one batch call per file type.
+
+        Args:
+            file_paths: Paths of the .xxp files to synchronize
+            fingerprints: Optional fingerprints of the files by path, taken before they were read
+
+        Returns:
+            list: One {"path", "success", "error"} entry per file
+        """
+        grouped = {}
+        for file_path in file_paths:
+            path = Path(file_path)
+            if path.suffix == '.xxp':
+                grouped.setdefault(path.parent.name, []).append(path)
+
+        results = []
+        with self.write_batcher.holding():
+            self._sync_groups(grouped, fingerprints, results)
+        synced = {result["path"]: result["fingerprint"] for result in results if result["success"] and result.get("fingerprint")}
+        if self.content_index is not None and synced:
+            self.content_index.record_many(synced)
+        for result in results:
+            result.pop("fingerprint", None)
+
+        synced = sum(1 for result in results if result["success"])
+        logger.info(f"Synchronized {synced} of {len(results)} files with the database")
+        return results
+
+    def _sync_groups(self, grouped, fingerprints, results):
+        """Convert and store the files of sync_files, grouped by file type, adding one result per file."""
+        for file_type, paths in grouped.items():
+            if file_type == "experiments":
+                convert = self.convertor_handler.dsl2experiments
+            elif file_type == "workflows":
+                convert = self.convertor_handler.dsl2workflows
+            else:
+                logger.warning(f"Unknown file type: {file_type}")
+                continue
+
+            documents = []
+            for path in paths:
+                try:
+                    # fingerprinted before reading, a write in between is picked up by the next event
+                    fingerprint = fingerprints.get(str(path)) if fingerprints else self._lookup_content(str(path))[1]
+                    documents.append((path, path.read_text(encoding='utf-8'), fingerprint))
+                except OSError as e:
+                    results.append({"path": str(path), "success": False, "error": str(e)})
+
+            converted = convert([(path.stem, content) for path, content, _ in documents])
+            self._load_document_ids(file_type, [path for path, _, _ in documents])
+            for (path, _, fingerprint), item in zip(documents, converted):
+                if not item["success"]:
+                    results.append({"path": str(path), "success": False, "error": item["error"]})
+                    continue
+                result = {"path": str(path), "success": False, "error": "not written"}
+                results.append(result)
+                try:
+                    self._store_converted(path.parent.parent.name, path.stem, file_type, item["data"], str(path),
+                                          on_done=lambda success, result=result: result.update(success=success, error=None if success else "write failed"),
+                                          lookup=False)
+                    result["fingerprint"] = fingerprint
+                except Exception as e:
+                    logger.error(f"Error storing {file_type} {path.stem}: {str(e)}", exc_info=True)
+                    result["error"] = str(e)
+
+    def remove_files(self, file_paths):
+        """
+        Delete the database entries of workspace files that no longer exist, e.g. files
+        removed while the service was down.
+
+        Args:
+            file_paths: Paths of the removed .xxp files
+        """
+        with self.write_batcher.holding():
+            for file_path in file_paths:
+                path = Path(file_path)
+                self._cleanup_file(path.parent.parent.name, path.stem, path.parent.name, file_path)
+        if self.content_index is not None:
+            self.content_index.forget_many(str(path) for path in file_paths)
+
+    def _submit_change(self, change: FileChange):
+        # a rename touches the entry of the old name too
+        keys = (change.path, change.old_path) if change.old_path else (change.path,)
+        self.worker_pool.submit(keys, change)
+
+    def _apply_change(self, change: FileChange):
+        """
+        Apply the net change of a file to the database.
+
+        Args:
+            change: The change, from the coalescer
+        """
+        path = Path(change.path)
+        username, file_type, file_name = path.parent.parent.name, path.parent.name, path.stem
+        logger.info(f"Applying {change.kind} of {change.path}")
+        if change.kind == CREATED:
+            # always applied, the entry may be missing even if the content is known
+            _, fingerprint = self._lookup_content(change.path)
+            self._handle_file_creation(username, file_name, file_type, change.path, self._content_recorder(change.path, fingerprint))
+        elif change.kind == MODIFIED:
+            self._apply_modification(username, file_name, file_type, change.path)
+        elif change.kind == DELETED:
+            self._cleanup_file(username, file_name, file_type, change.path, self._content_forgetter(change.path))
+        elif change.kind == RENAMED:
+            old_path = Path(change.old_path)
+            self._handle_file_move(old_path.parent.parent.name, old_path.stem, old_path.parent.name, username, file_name, file_type,
+                                   change.path, change.old_path, self._content_mover(change.old_path, change.path))
+            if change.modified:
+                self._apply_modification(username, file_name, file_type, change.path)
+
+    def _apply_modification(self, username, file_name, file_type, file_path):
+        unchanged, fingerprint = self._lookup_content(file_path)
+        if unchanged:
+            logger.info(f"Content of {file_path} unchanged, skipping")
+            return
+        self._handle_file_modification(username, file_name, file_type, file_path, self._content_recorder(file_path, fingerprint))
+
+    def _lookup_content(self, file_path):
+        """
+        Compare a file with the content index.
+
+        Returns:
+            tuple: Whether the content is the one applied last, and the fingerprint of the file (None without an index)
+        """
+        if self.content_index is None:
+            return False, None
+        try:
+            fingerprint, unchanged = self.content_index.lookup(file_path)
+        except OSError:
+            return False, None
+        return unchanged, fingerprint
+
+    def _content_recorder(self, file_path, fingerprint):
+        """Callback recording the fingerprint of a file once its content is written to the database."""
+        if self.content_index is None or fingerprint is None:
+            return None
+        return lambda success: success and self.content_index.record(file_path, fingerprint)
+
+    def _content_forgetter(self, file_path):
+        """Callback forgetting a file once its entry is deleted from the database."""
+        if self.content_index is None:
+            return None
+        return lambda success: success and self.content_index.forget(file_path)
+
+    def _content_mover(self, old_file_path, new_file_path):
+        """Callback moving the fingerprint of a renamed file once its entry is renamed in the database."""
+        if self.content_index is None:
+            return None
+        return lambda success: success and self.content_index.move(old_file_path, new_file_path)
+
+    def _bulk_write(self, file_type, operations):
+        if file_type == "experiments":
+            self.experiment_handler.bulk_write_experiments(operations)
+        else:
+            self.workflow_handler.bulk_write_workflows(operations)
+
+    def _write(self, file_type, operation, keys, on_done=None):
+        """Queue a database write, keyed by the (file_type, username, file_name) of the entries it touches."""
+        self.write_batcher.submit(file_type, operation, keys, on_done)
+
+    def _load_document_ids(self, file_type, paths):
+        """Remember the ids of the entries of many files, with one lookup per user."""
+        by_user = {}
+        for path in paths:
+            by_user.setdefault(path.parent.parent.name, []).append(path)
+        for username, user_paths in by_user.items():
+            names = [path.stem for path in user_paths]
+            self.write_batcher.settle([(file_type, username, name) for name in names])
+            if file_type == "experiments":
+                ids = self.experiment_handler.find_experiment_ids(username, names)
+            else:
+                ids = self.workflow_handler.find_workflow_ids(username, names)
+            for path in user_paths:
+                self._remember_document_id(str(path), ids.get(path.stem))
+
+    def _document_id(self, username, file_name, file_type, file_path):
+        """The id of the entry of a file: remembered, or looked up by name once its queued writes are applied."""
+        with self._document_ids_lock:
+            document_id = self._document_ids.get(file_path)
+        if document_id is not None:
+            return document_id
+        self.write_batcher.settle([(file_type, username, file_name)])
+        if file_type == "experiments":
+            return self.experiment_handler.find_experiment_id(username, file_name)
+        return self.workflow_handler.find_workflow_id(username, file_name)
+
+    def _store_converted(self, username, file_name, file_type, data, file_path, on_done=None, lookup=True):
+        """
+        Store converted file content, creating the database entry if it does not exist yet.
+        The entry is written by its id: the remembered one, the one found by name, or a new
+        one chosen here and remembered before the write.
+
+        Args:
+            username: The username who owns the file
+            file_name: The name of the file (without extension)
+            file_type: 'experiments' or 'workflows'
+            data: The converted steps or graphical model
+            file_path: Full path to the file, whose entry id is remembered
+            on_done: Called with whether the write succeeded, once it is applied
+            lookup: Look the entry up by name if its id is not remembered, False if it was just looked up
+        """
+        if file_type not in ("experiments", "workflows"):
+            return
+        with self._document_ids_lock:
+            document_id = self._document_ids.get(file_path)
+        if document_id is None and lookup:
+            document_id = self._document_id(username, file_name, file_type, file_path)
+        if file_type == "experiments":
+            document_id = document_id or self.experiment_handler.new_experiment_id(username)
+            operation = self.experiment_handler.upsert_experiment_operation(username, file_name, data, document_id)
+        else:
+            document_id = document_id or self.workflow_handler.new_workflow_id(username)
+            operation = self.workflow_handler.upsert_workflow_operation(username, file_name, data, document_id)
+        self._remember_document_id(file_path, document_id)
+        self._write(file_type, operation, [(file_type, username, file_name)], on_done)
+
+    def _remember_document_id(self, file_path, document_id):
+        if document_id:
+            with self._document_ids_lock:
+                self._document_ids[file_path] = document_id
+
+    def _forget_document_id(self, file_path):
+        with self._document_ids_lock:
+            return self._document_ids.pop(file_path, None)
+
+    def _move_document_id(self, old_file_path, new_file_path):
+        self._remember_document_id(new_file_path, self._forget_document_id(old_file_path))
+
+    def _handle_file_modification(self, username, file_name, file_type, file_path, on_done=None):
         """
         Handle file modification for any file type (experiments, workflows, etc.).
         You can implement custom logic here (e.g., update last_modified timestamp in DB).
@@ -192,6 +484,10 @@ class FileSystemSyncHandler(FileSystemEventHandler):
             file_name: The name of the file (without extension)
             file_type: The type of file ('experiments', 'workflows', etc.)
             file_path: Full path to the modified file
+            on_done: Called with whether the database write succeeded, once it is applied
+
+        Returns:
+            bool: True if the update of the database entry was queued
         """
         try:
             logger.info(f"{file_type.capitalize()} file modified externally: {file_name} by user: {username}")
@@ -203,8 +499,9 @@ class FileSystemSyncHandler(FileSystemEventHandler):
                 steps = self.convertor_handler.dsl2experiment(file_name, content)
                 if steps:
                     # Update the experiment handler with the new steps
-                    self.experiment_handler.update_experiment_steps_from_file_name(username, file_name, steps)
-                    logger.info(f"Successfully updated experiment {file_name} to database")
+                    self._store_converted(username, file_name, file_type, steps, file_path, on_done)
+                    logger.info(f"Queued update of experiment {file_name} to database")
+                    return True
                 else:
                     logger.error(f"Error couldn't fetch experiment steps from file content")
                     return
@@ -216,8 +513,9 @@ class FileSystemSyncHandler(FileSystemEventHandler):
                 graphical_model = self.convertor_handler.dsl2workflow(file_name, content)
                 if graphical_model:
                     # Update the workflow handler with the new graphical model
-                    self.workflow_handler.update_workflow_graphical_model_from_file_name(username, file_name, graphical_model)
-                    logger.info(f"Successfully updated workflow {file_name} to database")
+                    self._store_converted(username, file_name, file_type, graphical_model, file_path, on_done)
+                    logger.info(f"Queued update of workflow {file_name} to database")
+                    return True
                 else:
                     logger.error(f"Error couldn't fetch workflow graphical model from file content")
                     return
@@ -228,47 +526,48 @@ class FileSystemSyncHandler(FileSystemEventHandler):
         except Exception as e:
             logger.error(f"Error handling {file_type} modification {file_name}: {str(e)}", exc_info=True)
 
-    def _handle_file_creation(self, username, file_name, file_type, file_path):
+    def _handle_file_creation(self, username, file_name, file_type, file_path, on_done=None):
         """
         Handle file creation for any file type (experiments, workflows, etc.).
-        You can implement custom logic here (e.g., sync new file to database).
+        The create and modify events of a new file arrive as one creation, so the entry
+        is stored with the converted content of the file, or empty if the file is empty.
 
         Args:
             username: The username who owns the file
             file_name: The name of the file (without extension)
             file_type: The type of file ('experiments', 'workflows', etc.)
             file_path: Full path to the created file
+            on_done: Called with whether the database write succeeded, once it is applied
+
+        Returns:
+            bool: True if the write of the database entry was queued
         """
         try:
             logger.info(f"{file_type.capitalize()} file created externally: {file_name} by user: {username}")
 
-            # Add file-type-specific logic here
+            if file_type not in ("experiments", "workflows"):
+                logger.warning(f"Unknown file type: {file_type}")
+                return
+
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
             if file_type == "experiments":
-                # System Detects file creation as a Create and a Modify event.
-                payload = {
-                    "name": file_name,
-                    "steps": [],
-                }
-                self.experiment_handler.create_experiment(username, payload)
-                pass
-            elif file_type == "workflows":
-                # System Detects file creation as a Create and a Modify event.
-                payload = {
-                    "name": file_name,
-                    "graphical_model": {},
-                }
-                self.workflow_handler.create_workflow(username, payload)
-                pass
+                data = (self.convertor_handler.dsl2experiment(file_name, content) if content.strip() else None) or []
             else:
-                logger.warning(f"Unknown file type: {file_type}")
+                data = (self.convertor_handler.dsl2workflow(file_name, content) if content.strip() else None) or {}
+            # an atomic save replaces an existing file, which is then updated instead
+            self._store_converted(username, file_name, file_type, data, file_path, on_done)
+            return True
 
         except Exception as e:
             logger.error(f"Error handling {file_type} creation {file_name}: {str(e)}", exc_info=True)
 
-    def _handle_file_move(self, old_username, old_file_name, old_file_type, new_username, new_file_name, new_file_type, file_path):
+    def _handle_file_move(self, old_username, old_file_name, old_file_type, new_username, new_file_name, new_file_type, file_path, old_file_path=None,
+                          on_done=None):
         """
         Handle file rename for any file type (experiments, workflows, etc.).
-        You can implement custom logic here (e.g., update the name in the database).
+        The entry is renamed by its remembered id, or looked up by its old name otherwise,
+        and created from the file if it does not exist.
 
         Args:
             old_username: The username who owns the file (before rename)
@@ -278,108 +577,60 @@ class FileSystemSyncHandler(FileSystemEventHandler):
             new_file_name: The new name of the file (without extension)
             new_file_type: The new type of file ('experiments', 'workflows', etc.)
             file_path: Full path to the renamed file
+            old_file_path: Full path of the file before the rename
+            on_done: Called with whether the database write succeeded, once it is applied
         """
         # FIXME: Currently system identifies rename as delete + create + modify on MacOS.
         try:
             logger.info(f"{new_file_type.capitalize()} file renamed: {old_file_name} -> {new_file_name} by user: {new_username}")
+            if new_file_type not in ("experiments", "workflows"):
+                logger.warning(f"Unknown file type: {new_file_type}")
+                return
+
+            document_id = self._forget_document_id(old_file_path) if old_file_path else None
+            if document_id is None:
+                document_id = self._document_id(old_username, old_file_name, old_file_type, old_file_path)
+            if not document_id:
+                logger.info(f"{new_file_type[:-1].capitalize()} to rename not found in DB, creating new entry: {new_file_name} for user: {new_username}")
+                self._handle_file_creation(new_username, new_file_name, new_file_type, file_path, on_done)
+                return
 
-            # Add file-type-specific logic here
             if new_file_type == "experiments":
-                # Check if experiment exists in the database
-                experiment = self.experiment_handler.get_experiment_from_file_name(old_username, old_file_name)
-                if not experiment:
-                    # Get JSON steps
-                    logger.info(f"Experiment to rename not found in DB, creating new entry: {old_file_name} for user: {old_username}")
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    json_steps = self.convertor_handler.dsl2experiment(new_file_name, content)
-                    payload = {
-                        "name": new_file_name,
-                        "steps": json_steps,
-                    }
-                    self.experiment_handler.create_experiment(new_username, payload)
-                    logger.info(f"Experiment created in DB after rename: {new_file_name} for user: {new_username}")
-                    return
-                else:
-                    logger.info(f"Experiment found in DB, proceeding with rename: {old_file_name} -> {new_file_name} for user: {old_username}")
-                    self.experiment_handler.update_experiment_name_from_file_name(new_username, old_file_name, new_file_name)
-                    logger.info(f"Experiment renamed in DB: {old_file_name} -> {new_file_name} for user: {new_username}")
-                pass
-            elif new_file_type == "workflows":
-                # Check if workflow exists in the database
-                experiment = self.experiment_handler.get_experiment_from_file_name(old_username, old_file_name)
-                if not experiment:
-                    # Get JSON graphical
-                    logger.info(f"Experiment to rename not found in DB, creating new entry: {old_file_name} for user: {old_username}")
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    json_steps = self.convertor_handler.dsl2workflow(new_file_name, content)
-                    payload = {
-                        "name": new_file_name,
-                        "steps": json_steps,
-                    }
-                    self.workflow_handler.create_workflow(new_username, payload)
-                    logger.info(f"Workflow created in DB after rename: {new_file_name} for user: {new_username}")
-                    return
-                else:
-                    logger.info(f"Workflow found in DB, proceeding with rename: {old_file_name} -> {new_file_name} for user: {old_username}")
-                    self.workflow_handler.update_workflow_name_from_file_name(new_username, old_file_name, new_file_name)
-                    logger.info(f"Workflow renamed in DB: {old_file_name} -> {new_file_name} for user: {new_username}")
-                pass
+                operation = self.experiment_handler.rename_experiment_operation(old_username, old_file_name, new_file_name, document_id)
             else:
-                logger.warning(f"Unknown file type: {new_file_type}")
+                operation = self.workflow_handler.rename_workflow_operation(old_username, old_file_name, new_file_name, document_id)
+            self._remember_document_id(file_path, document_id)
+            self._write(new_file_type, operation, [(old_file_type, old_username, old_file_name), (new_file_type, new_username, new_file_name)],
+                        on_done)
+            logger.info(f"Queued rename in DB: {old_file_name} -> {new_file_name} for user: {new_username}")
 
         except Exception as e:
             logger.error(f"Error handling {new_file_type} rename {old_file_name} -> {new_file_name}: {str(e)}", exc_info=True)
 
-    def _cleanup_file(self, username, file_name, file_type):
+    def _cleanup_file(self, username, file_name, file_type, file_path=None, on_done=None):
         """
         Clean up file from database for any file type (experiments, workflows, etc.).
+        One indexed delete, by the remembered id of the entry or by its name.
 
         Args:
             username: The username who owns the file
             file_name: The name of the file (without extension)
             file_type: The type of file ('experiments', 'workflows', etc.)
+            file_path: Full path to the deleted file
+            on_done: Called with whether the delete succeeded, once it is applied
         """
         try:
+            document_id = self._forget_document_id(file_path) if file_path else None
             if file_type == "experiments":
-                # Get all experiments for this user
-                items = self.experiment_handler.get_experiments(username)
-
-                # Find the experiment with matching name
-                matching_items = [item for item in items if item.get("name") == file_name]
-
-                if not matching_items:
-                    logger.warning(f"No experiment found in DB with name: {file_name} for user: {username}")
-                    return
-
-                # Delete all matching experiments (should typically be just one)
-                for item in matching_items:
-                    item_id = item.get("id_experiment")
-                    if item_id:
-                        self.experiment_handler.delete_experiment(item_id)
-                        logger.info(f"Deleted experiment from DB: {item_id} (name: {file_name})")
-
+                operation = self.experiment_handler.delete_experiment_operation(username, file_name, document_id)
             elif file_type == "workflows":
-                # Get all workflows for this user
-                items = self.workflow_handler.get_workflows(username)
-
-                # Find the workflow with matching name
-                matching_items = [item for item in items if item.get("name") == file_name]
-
-                if not matching_items:
-                    logger.warning(f"No workflow found in DB with name: {file_name} for user: {username}")
-                    return
-
-                # Delete all matching workflows (should typically be just one)
-                for item in matching_items:
-                    item_id = item.get("id_workflow")
-                    if item_id:
-                        self.workflow_handler.delete_workflow(item_id)
-                        logger.info(f"Deleted workflow from DB: {item_id} (name: {file_name})")
-
+                operation = self.workflow_handler.delete_workflow_operation(username, file_name, document_id)
             else:
                 logger.warning(f"Unknown file type for cleanup: {file_type}")
+                return
+
+            self._write(file_type, operation, [(file_type, username, file_name)], on_done)
+            logger.info(f"Queued delete of {file_type[:-1]} from DB: {file_name} for user: {username}")
 
         except Exception as e:
             logger.error(f"Error cleaning up {file_type} {file_name}: {str(e)}", exc_info=True)
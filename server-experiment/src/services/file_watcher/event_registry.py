@@ -1,65 +1,135 @@
+import hashlib
+import heapq
+import itertools
+import os
 import threading
 import time
 from config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
-# Thread-safe set to track API-initiated events (to prevent redundant processing)
-# Structure: {(event_type, username, file_type, file_name): expiry_timestamp}
-# event_type: 'delete', 'modify', 'create', 'rename'
-_ignored_events = {}
-_ignored_events_lock = threading.Lock()
+# Writes made by the API, so the watcher does not process them a second time.
+# Structure: {(username, file_type, file_name): (expected_sha256, expiry_timestamp, sequence)}
+# expected_sha256 is the hash of the content the API wrote, _ABSENT if the API removed the
+# file, or _ANY_CONTENT if the caller did not pass the content.
+_expected_writes = {}
+_expiry_heap = []  # (expiry_timestamp, sequence, key), entries superseded since are skipped
+_sequence = itertools.count()
+_expected_writes_lock = threading.Lock()
+_stats = {"suppressed": 0, "mismatched": 0, "unexpected": 0, "expired": 0, "evicted": 0}
 
-_IGNORE_EXPIRY_SECONDS = 6  # How long to ignore an event after it's registered
+_ABSENT = "absent"
+_ANY_CONTENT = "any"
+# An expectation only matches the exact content written, so it can live long enough for
+# slow writes; expiring it only bounds the memory
+_IGNORE_EXPIRY_SECONDS = 30
+_MAX_EXPECTED_WRITES = 10000
 
 
-def register_api_event(event_type, username, file_type, file_name):
+def register_api_event(event_type, username, file_type, file_name, content=None, new_file_name=None):
     """
-    Register an event that was initiated by the API to prevent the watcher
-    from performing redundant processing.
+    Register a write that was initiated by the API to prevent the watcher from performing
+    redundant processing. Events are then ignored only while the file holds the content the
+    API wrote (or is absent, for deletions), so an external edit is never dropped.
 
     Args:
-        event_type: Type of event ('delete', 'modify', 'create', 'rename', etc.)
+        event_type: Type of event ('delete', 'modify', 'create', 'rename')
         username: The username who owns the file
         file_type: 'experiments' or 'workflows'
-        file_name: The name of the file (without extension)
+        file_name: The name of the file (without extension), the old name for renames
+        content: The content written (str or bytes), or the content of the renamed file
+        new_file_name: The new name of the file, for renames
     """
-    key = (event_type, username, file_type, file_name)
-    expiry = time.time() + _IGNORE_EXPIRY_SECONDS
+    if content is None:
+        expected = _ANY_CONTENT
+    else:
+        expected = hashlib.sha256(content.encode("utf-8") if isinstance(content, str) else content).hexdigest()
 
-    with _ignored_events_lock:
-        _ignored_events[key] = expiry
-        logger.debug(f"Registered API {event_type} to ignore: {key} (expires in {_IGNORE_EXPIRY_SECONDS}s)")
+    with _expected_writes_lock:
+        now = time.time()
+        if event_type == 'delete':
+            _expect((username, file_type, file_name), _ABSENT, now)
+        elif event_type == 'rename':
+            _expect((username, file_type, file_name), _ABSENT, now)
+            _expect((username, file_type, new_file_name), expected, now)
+        else:
+            _expect((username, file_type, file_name), expected, now)
+        _purge(now)
+    logger.debug(f"Registered API {event_type} of {file_type}/{file_name} for {username}")
 
 
-def should_ignore_event(event_type, username, file_type, file_name):
+def should_ignore_event(event_type, username, file_type, file_name, file_path=None):
     """
-    Check if an event should be ignored (because it was initiated by the API).
-    Also cleans up expired entries.
+    Check if an event should be ignored because it comes from a write of the API.
 
     Args:
-        event_type: Type of event ('delete', 'modify', 'create', 'rename', etc.)
+        event_type: Type of event ('delete', 'modify', 'create', 'rename')
         username: The username who owns the file
         file_type: 'experiments' or 'workflows'
-        file_name: The name of the file (without extension)
+        file_name: The name of the file (without extension), the new name for renames
+        file_path: Path of the file, to compare its content with the one the API wrote
 
     Returns:
         bool: True if event should be ignored, False otherwise
     """
-    key = (event_type, username, file_type, file_name)
-    current_time = time.time()
-
-    with _ignored_events_lock:
-        # Clean up expired entries
-        expired_keys = [k for k, v in _ignored_events.items() if v < current_time]
-        for expired_key in expired_keys:
-            del _ignored_events[expired_key]
-            logger.debug(f"Cleaned up expired event entry: {expired_key}")
-
-        # Check if this event should be ignored
-        if key in _ignored_events:
-            # Don't delete - let it expire naturally to handle multiple rapid events from same file write
-            logger.info(f"Ignoring API-initiated {event_type}: {key}")
-            return True
-
-    return False
+    key = (username, file_type, file_name)
+    with _expected_writes_lock:
+        _purge(time.time())
+        entry = _expected_writes.get(key)
+    if entry is None:
+        with _expected_writes_lock:
+            _stats["unexpected"] += 1
+        return False
+
+    expected = entry[0]
+    if event_type == 'delete':
+        ignore = expected == _ABSENT and (file_path is None or not os.path.exists(file_path))
+    elif expected == _ABSENT:
+        ignore = False
+    elif expected == _ANY_CONTENT or file_path is None:
+        ignore = True
+    else:
+        ignore = _content_hash(file_path) == expected
+
+    with _expected_writes_lock:
+        _stats["suppressed" if ignore else "mismatched"] += 1
+    if ignore:
+        # kept until it expires, one write produces several events
+        logger.info(f"Ignoring API-initiated {event_type}: {key}")
+    return ignore
+
+
+def get_event_registry_stats():
+    with _expected_writes_lock:
+        return {**_stats, "expected": len(_expected_writes)}
+
+
+def _expect(key, expected, now):
+    """Record an expectation, called with the lock held."""
+    sequence = next(_sequence)
+    expiry = now + _IGNORE_EXPIRY_SECONDS
+    _expected_writes[key] = (expected, expiry, sequence)
+    heapq.heappush(_expiry_heap, (expiry, sequence, key))
+
+
+def _purge(now):
+    """Drop expired expectations, and the oldest ones beyond the limit. Called with the lock held."""
+    global _expiry_heap
+    while _expiry_heap and (_expiry_heap[0][0] < now or len(_expected_writes) > _MAX_EXPECTED_WRITES):
+        expiry, sequence, key = heapq.heappop(_expiry_heap)
+        entry = _expected_writes.get(key)
+        if entry is not None and entry[2] == sequence:
+            del _expected_writes[key]
+            _stats["expired" if expiry < now else "evicted"] += 1
+    # re-registered keys leave stale heap entries behind, rebuild when they dominate
+    if len(_expiry_heap) > 2 * len(_expected_writes) + 64:
+        _expiry_heap = [(entry[1], entry[2], key) for key, entry in _expected_writes.items()]
+        heapq.heapify(_expiry_heap)
+
+
+def _content_hash(file_path):
+    try:
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
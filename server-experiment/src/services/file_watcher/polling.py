@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Any, Dict, List, NamedTuple, Optional
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+from watchdog.observers.api import BaseObserver, EventEmitter
+from config.logging_config import get_logger
+from .reconciler import FILE_TYPES
+from .shards import EventRate, shard_of
+
+logger = get_logger(__name__)
+
+# directories with a change in this window have their files checked on every poll
+_HOT_SECONDS = 60
+
+
+class _FileStat(NamedTuple):
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+class _Directory:
+    __slots__ = ("mtime_ns", "files", "changed_at")
+
+    def __init__(self):
+        self.mtime_ns = None
+        self.files: Dict[str, _FileStat] = {}
+        self.changed_at = 0.0
+
+
+class WorkspacePollingEmitter(EventEmitter):
+    """
+    Polls the workspace for changes of .xxp files, for mounts where filesystem
+    notifications never arrive (Docker bind mounts from macOS or Windows hosts, network
+    filesystems).
+
+    Only <user>/experiments and <user>/workflows are looked at, and the stat of every file
+    is kept in memory. A poll stats the workspace, the user and the type directories; a
+    directory is listed again only if its mtime changed, which catches creations, deletions,
+    renames and atomic saves. Writes in place do not change the directory mtime: the files
+    of directories that changed recently are checked on every poll, and the others by a
+    sweep that checks a slice of them on every poll and all of them once per sweep_seconds.
+
+    The interval between polls is min_interval after a change, and doubles up to
+    max_interval while nothing changes. With several shards, every shard polls the users
+    whose name hashes to it, on its own thread.
+    """
+
+    def __init__(self, event_queue, watch, *, timeout: float = 1.0, event_filter=None,
+                 min_interval: float = 1.0, max_interval: float = 10.0, sweep_seconds: float = 60.0, shard: int = 0, shards: int = 1):
+        super().__init__(event_queue, watch, timeout=timeout, event_filter=event_filter)
+        self.shard = shard
+        self.shards = shards
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.sweep_seconds = sweep_seconds
+        self._interval = min_interval
+        self._root_mtime_ns = None
+        self._users: Dict[str, Optional[int]] = {}
+        self._directories: Dict[str, _Directory] = {}
+        self._sweep = deque()
+        self._stat_calls = 0
+        self._rate = EventRate()
+        self._lock = threading.Lock()
+        self._stats = {"polls": 0, "cpu_seconds": 0.0, "last_poll_seconds": 0.0, "last_poll_stats": 0}
+
+    def on_thread_start(self):
+        # the state at start is the baseline, changes made before are the reconciler's
+        started = time.perf_counter()
+        self._poll(emit=False)
+        logger.info(f"Watcher shard {self.shard + 1}/{self.shards} polling {len(self._directories)} directories, {self._file_count()} files "
+                    f"indexed in {time.perf_counter() - started:.2f}s")
+
+    def queue_events(self, timeout: float):
+        if self.stopped_event.wait(self._interval):
+            return
+        with self._lock:
+            if not self.should_keep_running():
+                return
+            events = self._poll(emit=True)
+            if events:
+                self._interval = self.min_interval
+            else:
+                self._interval = min(self.max_interval, self._interval * 2)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                **self._rate.get_stats(),
+                "shard": self.shard,
+                "mode": "polling",
+                "interval": self._interval,
+                "users": len(self._users),
+                "directories": len(self._directories),
+                "files": self._file_count(),
+            }
+
+    def _file_count(self) -> int:
+        return sum(len(directory.files) for directory in self._directories.values())
+
+    def _poll(self, emit: bool) -> int:
+        """Compare the workspace with the stat index and queue the differences as events."""
+        cpu_started, started = time.thread_time(), time.perf_counter()
+        self._stat_calls = 0
+        deleted: Dict[str, _FileStat] = {}
+        created: Dict[str, _FileStat] = {}
+        modified: List[str] = []
+
+        self._poll_users()
+        now = time.monotonic()
+        checked = set()
+        for path, directory in list(self._directories.items()):
+            mtime_ns = self._stat_mtime(path)
+            if mtime_ns != directory.mtime_ns:
+                directory.mtime_ns = mtime_ns
+                self._list(path, directory, deleted, created, modified)
+                checked.add(path)
+            elif now - directory.changed_at < _HOT_SECONDS:
+                self._check_files(path, directory, deleted, modified)
+                checked.add(path)
+        self._sweep_files(checked, deleted, modified)
+
+        changes = len(deleted) + len(created) + len(modified)
+        if changes and emit:
+            for path in {os.path.dirname(path) for path in (*deleted, *created, *modified)}:
+                if path in self._directories:
+                    self._directories[path].changed_at = now
+        if emit:
+            self._emit(deleted, created, modified)
+        self._stats["polls"] += 1
+        if emit and changes:
+            self._rate.add(changes)
+        self._stats["cpu_seconds"] += time.thread_time() - cpu_started
+        self._stats["last_poll_seconds"] = time.perf_counter() - started
+        self._stats["last_poll_stats"] = self._stat_calls
+        return changes
+
+    def _poll_users(self):
+        """Track the user directories, and their experiments and workflows directories."""
+        root = self.watch.path
+        root_mtime_ns = self._stat_mtime(root)
+        if root_mtime_ns != self._root_mtime_ns:
+            self._root_mtime_ns = root_mtime_ns
+            try:
+                with os.scandir(root) as entries:
+                    users = {
+                        entry.path for entry in entries
+                        if entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".") and shard_of(entry.name, self.shards) == self.shard
+                    }
+            except OSError:
+                users = set()
+            # the directories of removed users are gone too, which the next listing reports
+            for user in set(self._users) - users:
+                del self._users[user]
+            for user in users - set(self._users):
+                self._users[user] = None
+
+        for user, known_mtime_ns in list(self._users.items()):
+            mtime_ns = self._stat_mtime(user)
+            if mtime_ns != known_mtime_ns:
+                self._users[user] = mtime_ns
+                if mtime_ns is not None:
+                    self._add_type_directories(user)
+
+    def _add_type_directories(self, user: str):
+        for file_type in FILE_TYPES:
+            path = os.path.join(user, file_type)
+            if path not in self._directories and os.path.isdir(path):
+                self._directories[path] = _Directory()
+                self._sweep.append(path)
+
+    def _list(self, path: str, directory: _Directory, deleted, created, modified):
+        files = {}
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".xxp"):
+                        continue
+                    try:
+                        self._stat_calls += 1
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    files[entry.name] = _FileStat(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        except OSError:
+            # the directory is gone
+            del self._directories[path]
+        for name, known in directory.files.items():
+            current = files.get(name)
+            if current is None:
+                deleted[os.path.join(path, name)] = known
+            elif current != known:
+                modified.append(os.path.join(path, name))
+        for name in files.keys() - directory.files.keys():
+            created[os.path.join(path, name)] = files[name]
+        directory.files = files
+
+    def _check_files(self, path: str, directory: _Directory, deleted, modified):
+        """Stat the known files of a directory whose listing did not change."""
+        for name, known in list(directory.files.items()):
+            file_path = os.path.join(path, name)
+            try:
+                self._stat_calls += 1
+                stat = os.stat(file_path, follow_symlinks=False)
+            except OSError:
+                deleted[file_path] = directory.files.pop(name)
+                continue
+            current = _FileStat(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if current != known:
+                directory.files[name] = current
+                modified.append(file_path)
+
+    def _sweep_files(self, checked, deleted, modified):
+        """Check the files of the next directories in turn, so that all are checked once per sweep_seconds."""
+        budget = self._file_count() * self._interval / self.sweep_seconds if self.sweep_seconds > 0 else 0
+        for _ in range(len(self._sweep)):
+            if budget <= 0:
+                break
+            path = self._sweep[0]
+            self._sweep.rotate(-1)
+            directory = self._directories.get(path)
+            if directory is None:
+                self._sweep.remove(path)
+                continue
+            if path not in checked:
+                self._check_files(path, directory, deleted, modified)
+                budget -= max(len(directory.files), 1)
+
+    def _emit(self, deleted: Dict[str, _FileStat], created: Dict[str, _FileStat], modified: List[str]):
+        # a file deleted and created with the same inode, size and mtime in one poll was moved
+        sources = {stat: path for path, stat in deleted.items()}
+        for path, stat in created.items():
+            source = sources.pop(stat, None)
+            if source is not None:
+                del deleted[source]
+                self.queue_event(FileMovedEvent(source, path))
+            else:
+                self.queue_event(FileCreatedEvent(path))
+        for path in deleted:
+            self.queue_event(FileDeletedEvent(path))
+        for path in modified:
+            self.queue_event(FileModifiedEvent(path))
+
+    def _stat_mtime(self, path: str) -> Optional[int]:
+        try:
+            self._stat_calls += 1
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+
+class WorkspacePollingObserver(BaseObserver):
+    """Observer polling one shard of the workspace users with a WorkspacePollingEmitter."""
+
+    def __init__(self, min_interval: float = 1.0, max_interval: float = 10.0, sweep_seconds: float = 60.0, shard: int = 0, shards: int = 1):
+        emitter_class = partial(WorkspacePollingEmitter, min_interval=min_interval, max_interval=max_interval, sweep_seconds=sweep_seconds,
+                                shard=shard, shards=shards)
+        super().__init__(emitter_class, timeout=min_interval)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [emitter.get_stats() for emitter in self.emitters]
@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from config.logging_config import get_logger
+from .content_index import ContentIndex, Fingerprint
+
+if TYPE_CHECKING:
+    from .event_handlers import FileSystemSyncHandler
+
+logger = get_logger(__name__)
+
+FILE_TYPES = ("experiments", "workflows")
+
+
+class WorkspaceReconciler:
+    """
+    Brings the databases up to date with the changes made to the workspace while the
+    service was down. The directory of every user is scanned with os.scandir on a pool of
+    threads and compared with the content index, which holds what was last applied:
+
+    - files with the indexed size and mtime are unchanged and cost one stat call;
+    - files with another size or mtime are hashed, and only re-imported if the hash differs;
+    - files missing from the index are imported, indexed files missing on disk are deleted.
+
+    Only the differences are applied, in batches through the sync handler. The batches are
+    queued on the worker pool of the sync handler, keyed by their paths like the changes of
+    the watcher, which runs meanwhile: a file is checked again right before it is written, so
+    a change the watcher applied since the scan is not overwritten with an older state.
+    """
+
+    def __init__(self, workspace_path: str, event_handler: "FileSystemSyncHandler", content_index: ContentIndex,
+                 workers: int = 8, batch_size: int = 500):
+        """
+        Initialize the reconciler.
+
+        Args:
+            workspace_path: Path of the workspace directory
+            event_handler: Handler applying the differences to the databases
+            content_index: Index of the applied file contents
+            workers: Number of threads scanning
+            batch_size: Number of files imported per batch
+        """
+        self.workspace_path = str(workspace_path)
+        self.event_handler = event_handler
+        self.content_index = content_index
+        self.workers = workers
+        self.batch_size = batch_size
+        self._report = {"status": "idle"}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Reconcile in a background thread, so that the service can serve meanwhile."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.run, name="workspace-reconciler", daemon=True)
+            self._thread.start()
+
+    def get_report(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._report)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Reconcile the workspace with the databases.
+
+        Returns:
+            dict: The report: counts per kind of difference and the time of every phase
+        """
+        started = time.perf_counter()
+        report = {"status": "running", "started_at": time.time(), "finished_at": None, "error": None}
+        self._set_report(report)
+        try:
+            indexed = self.content_index.entries(os.path.join(self.workspace_path, ""))
+            with os.scandir(self.workspace_path) as entries:
+                users = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")]
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                scans = list(pool.map(lambda user: self._scan_user(user, indexed), users))
+            report["scan_seconds"] = time.perf_counter() - started
+
+            present = set()
+            changed, touched = {}, {}
+            for user_present, user_changed, user_touched in scans:
+                present.update(user_present)
+                changed.update(user_changed)
+                touched.update(user_touched)
+            removed = [path for path in indexed if path not in present]
+            report.update(
+                users=len(users),
+                files=len(present),
+                unchanged=len(present) - len(changed),
+                added=sum(1 for path in changed if path not in indexed),
+                modified=sum(1 for path in changed if path in indexed),
+                removed=len(removed),
+            )
+
+            applying = time.perf_counter()
+            if touched:
+                # only the metadata changed, the next start only needs a stat call again
+                self.content_index.record_many(touched)
+            paths = sorted(changed)
+            batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+            syncs = [self._submit(batch, self._sync_batch) for batch in batches]
+            removals = [self._submit(removed[i:i + self.batch_size], self._remove_batch) for i in range(0, len(removed), self.batch_size)]
+            synced = [sync.result() for sync in syncs]
+            report["failed"] = sum(1 for results, _ in synced for result in results if not result["success"])
+            # changed by the watcher since the scan, and applied by it
+            report["skipped"] = sum(skipped for _, skipped in synced) + sum(removal.result() for removal in removals)
+            report["apply_seconds"] = time.perf_counter() - applying
+
+            report["status"] = "done"
+        except Exception as e:
+            logger.error(f"Workspace reconciliation failed: {str(e)}", exc_info=True)
+            report.update(status="failed", error=str(e))
+        report.update(finished_at=time.time(), duration=time.perf_counter() - started)
+        self._set_report(report)
+        logger.info(f"Workspace reconciliation {report['status']}: {report}")
+        return report
+
+    def _submit(self, paths: List[str], apply) -> Future:
+        """
+        Queue a batch on the worker pool of the sync handler, keyed by its paths.
+
+        Returns:
+            Future: The result of apply(paths)
+        """
+        future = Future()
+
+        def process(batch):
+            try:
+                future.set_result(apply(batch))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.event_handler.worker_pool.submit(paths, paths, process)
+        return future
+
+    def _sync_batch(self, paths: List[str]):
+        """
+        Synchronize the files of a batch that still differ from the index.
+
+        Returns:
+            tuple: The results of sync_files, and the number of files skipped
+        """
+        current: Dict[str, Fingerprint] = {}
+        for path in paths:
+            try:
+                fingerprint, unchanged = self.content_index.lookup(path)
+            except OSError:
+                # removed since the scan, the watcher applies the deletion
+                continue
+            if not unchanged:
+                current[path] = fingerprint
+        results = self.event_handler.sync_files(sorted(current), current) if current else []
+        return results, len(paths) - len(current)
+
+    def _remove_batch(self, paths: List[str]) -> int:
+        """
+        Delete the entries of the files of a batch that are still missing.
+
+        Returns:
+            int: The number of files skipped, because they were created again since the scan
+        """
+        missing = [path for path in paths if not os.path.exists(path)]
+        if missing:
+            self.event_handler.remove_files(missing)
+        return len(paths) - len(missing)
+
+    def _scan_user(self, user_path: str, indexed: Dict[str, Fingerprint]):
+        """
+        Compare the files of one user with the index.
+
+        Returns:
+            tuple: The paths present, the fingerprints of the changed files and of the files
+            whose content is unchanged although their size or mtime changed
+        """
+        present: List[str] = []
+        changed: Dict[str, Fingerprint] = {}
+        touched: Dict[str, Fingerprint] = {}
+        for file_type in FILE_TYPES:
+            try:
+                with os.scandir(os.path.join(user_path, file_type)) as entries:
+                    files = [entry for entry in entries if entry.name.endswith(".xxp") and entry.is_file()]
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in files:
+                try:
+                    stat = entry.stat()
+                    known: Optional[Fingerprint] = indexed.get(entry.path)
+                    present.append(entry.path)
+                    if known is not None and known.size == stat.st_size and known.mtime_ns == stat.st_mtime_ns:
+                        continue
+                    fingerprint = ContentIndex.fingerprint(entry.path, stat)
+                except OSError as e:
+                    # removed during the scan, the watcher sees the deletion
+                    logger.warning(f"Skipping {entry.path}: {str(e)}")
+                    continue
+                if known is not None and known.sha256 == fingerprint.sha256:
+                    touched[entry.path] = fingerprint
+                else:
+                    changed[entry.path] = fingerprint
+        return present, changed, touched
+
+    def _set_report(self, report: dict):
+        with self._lock:
+            self._report = dict(report)
+
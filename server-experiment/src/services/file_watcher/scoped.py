@@ -0,0 +1,179 @@
+import contextlib
+import inspect
+import os
+import threading
+from functools import partial
+from typing import Any, Dict, List
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+from watchdog.observers.api import BaseObserver, EventEmitter
+from config.logging_config import get_logger
+from .reconciler import FILE_TYPES
+from .shards import EventRate, shard_of
+
+try:
+    from watchdog.observers.inotify_c import Inotify, InotifyConstants
+except Exception:  # not Linux
+    Inotify = None
+    InotifyConstants = None
+
+logger = get_logger(__name__)
+
+
+def scoped_watches_supported() -> bool:
+    """
+    Whether watchdog's inotify wrapper has what the scoped watches use. It is not public
+    API (written against the watchdog pinned in requirements.txt): without it, the watcher
+    falls back to watchdog's Observer.
+    """
+    if Inotify is None:
+        return False
+    try:
+        parameters = inspect.signature(Inotify).parameters
+    except (TypeError, ValueError):
+        return False
+    return (
+        {"recursive", "event_mask"} <= parameters.keys()
+        and all(callable(getattr(Inotify, name, None)) for name in ("add_watch", "remove_watch", "read_events", "close"))
+        and all(hasattr(InotifyConstants, name) for name in ("IN_CREATE", "IN_DELETE", "IN_MODIFY", "IN_MOVED_FROM", "IN_MOVED_TO"))
+    )
+
+
+class ScopedInotifyEmitter(EventEmitter):
+    """
+    Watches only what the watcher handles: the workspace directory (for users coming and
+    going), the user directories (for their experiments and workflows directories) and the
+    experiments and workflows directories, with one inotify instance. Other directories of
+    the workspace cost no watch, and only the .xxp events of those directories are turned
+    into watchdog events.
+
+    With several shards, every shard watches the users whose name hashes to it, on its own
+    thread and inotify instance.
+    """
+
+    def __init__(self, event_queue, watch, *, timeout: float = 1.0, event_filter=None, shard: int = 0, shards: int = 1):
+        super().__init__(event_queue, watch, timeout=timeout, event_filter=event_filter)
+        self.shard = shard
+        self.shards = shards
+        self._root = os.fsencode(os.path.normpath(watch.path))
+        self._inotify = None
+        self._users = set()
+        self._rate = EventRate()
+        self._lock = threading.Lock()
+
+    def on_thread_start(self):
+        mask = (InotifyConstants.IN_CREATE | InotifyConstants.IN_DELETE | InotifyConstants.IN_MODIFY
+                | InotifyConstants.IN_MOVED_FROM | InotifyConstants.IN_MOVED_TO)
+        self._inotify = Inotify(self._root, recursive=False, event_mask=mask)
+        with os.scandir(self._root) as entries:
+            users = [entry.path for entry in entries
+                     if self._handles_user(os.fsdecode(entry.name)) and entry.is_dir(follow_symlinks=False)]
+        for user in users:
+            self._watch_user(user, emit=False)
+        logger.info(f"Watcher shard {self.shard + 1}/{self.shards} watching {len(self._users)} users")
+
+    def on_thread_stop(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def queue_events(self, timeout: float):
+        inotify = self._inotify
+        if inotify is None:
+            return
+        events = inotify.read_events()
+        with self._lock:
+            moved_from = {}
+            for event in events:
+                self._handle(event, moved_from)
+            # moved out of the watched directories
+            for path in moved_from.values():
+                self._emit(FileDeletedEvent(path))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            users = len(self._users)
+        return {"shard": self.shard, "mode": "scoped", "users": users, **self._rate.get_stats()}
+
+    def _handle(self, event, moved_from: Dict[int, str]):
+        path = event.src_path
+        parent = os.path.dirname(path)
+        if parent == self._root:
+            if event.is_directory and (event.is_create or event.is_moved_to):
+                self._watch_user(path, emit=True)
+            elif event.is_directory and (event.is_delete or event.is_moved_from):
+                self._unwatch_user(path)
+        elif os.path.dirname(parent) == self._root:
+            if event.is_directory and os.path.basename(path).decode(errors="replace") in FILE_TYPES:
+                if event.is_create or event.is_moved_to:
+                    self._watch_directory(path, emit=True)
+                elif event.is_moved_from:
+                    with contextlib.suppress(KeyError, OSError):
+                        self._inotify.remove_watch(path)
+        elif not event.is_directory and path.endswith(b".xxp"):
+            file_path = os.fsdecode(path)
+            if event.is_moved_from:
+                moved_from[event.cookie] = file_path
+            elif event.is_moved_to:
+                source = moved_from.pop(event.cookie, None)
+                self._emit(FileMovedEvent(source, file_path) if source else FileCreatedEvent(file_path))
+            elif event.is_create:
+                self._emit(FileCreatedEvent(file_path))
+            elif event.is_modify:
+                self._emit(FileModifiedEvent(file_path))
+            elif event.is_delete:
+                self._emit(FileDeletedEvent(file_path))
+
+    def _watch_user(self, user: bytes, emit: bool):
+        user = os.fsencode(user)
+        if not self._handles_user(os.fsdecode(os.path.basename(user))):
+            return
+        try:
+            self._inotify.add_watch(user)
+        except OSError as e:
+            logger.warning(f"Cannot watch {os.fsdecode(user)}: {str(e)}")
+            return
+        self._users.add(user)
+        for file_type in FILE_TYPES:
+            path = os.path.join(user, os.fsencode(file_type))
+            if os.path.isdir(path):
+                self._watch_directory(path, emit)
+
+    def _handles_user(self, name: str) -> bool:
+        """Whether a workspace directory is a user of this shard, hidden directories are not users."""
+        return not name.startswith(".") and shard_of(name, self.shards) == self.shard
+
+    def _unwatch_user(self, user: bytes):
+        if user not in self._users:
+            return
+        self._users.discard(user)
+        for path in [os.path.join(user, os.fsencode(file_type)) for file_type in FILE_TYPES] + [user]:
+            # deleted directories drop their watch themselves
+            with contextlib.suppress(KeyError, OSError):
+                self._inotify.remove_watch(path)
+
+    def _watch_directory(self, path: bytes, emit: bool):
+        """Watch an experiments or workflows directory, reporting the files it already holds if it just appeared."""
+        try:
+            self._inotify.add_watch(path)
+        except OSError as e:
+            logger.warning(f"Cannot watch {os.fsdecode(path)}: {str(e)}")
+            return
+        if emit:
+            with contextlib.suppress(OSError), os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(b".xxp") and entry.is_file():
+                        self._emit(FileCreatedEvent(os.fsdecode(entry.path)))
+
+    def _emit(self, event):
+        self._rate.add()
+        self.queue_event(event)
+
+
+class ScopedInotifyObserver(BaseObserver):
+    """Observer of one shard of the workspace users, with a ScopedInotifyEmitter."""
+
+    def __init__(self, shard: int = 0, shards: int = 1):
+        super().__init__(partial(ScopedInotifyEmitter, shard=shard, shards=shards), timeout=1.0)
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [emitter.get_stats() for emitter in self.emitters]
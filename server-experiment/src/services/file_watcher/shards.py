@@ -0,0 +1,37 @@
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+def shard_of(username: str, shards: int) -> int:
+    """Shard of a user directory, stable across restarts."""
+    return zlib.crc32(username.encode("utf-8")) % shards if shards > 1 else 0
+
+
+class EventRate:
+    """Count of events over the last window_seconds, in one bucket per second."""
+
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self._buckets = [0] * window_seconds
+        self._second = int(time.monotonic())
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def add(self, count: int = 1, now: Optional[float] = None):
+        with self._lock:
+            self._advance(int(now if now is not None else time.monotonic()))
+            self._buckets[self._second % self.window_seconds] += count
+            self._total += count
+
+    def get_stats(self):
+        with self._lock:
+            self._advance(int(time.monotonic()))
+            return {"events": self._total, "events_per_second": sum(self._buckets) / self.window_seconds}
+
+    def _advance(self, second: int):
+        """Clear the buckets of the seconds since the last event. Called with the lock held."""
+        for elapsed in range(self._second + 1, min(second, self._second + self.window_seconds) + 1):
+            self._buckets[elapsed % self.window_seconds] = 0
+        self._second = max(self._second, second)
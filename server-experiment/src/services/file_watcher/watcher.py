@@ -1,9 +1,16 @@
+import os
 import threading
+import time
 from pathlib import Path
 from typing import TYPE_CHECKING
 from watchdog.observers import Observer
 from config.logging_config import get_logger
+from .content_index import ContentIndex
 from .event_handlers import FileSystemSyncHandler
+from .event_registry import get_event_registry_stats
+from .polling import WorkspacePollingObserver
+from .reconciler import WorkspaceReconciler
+from .scoped import ScopedInotifyObserver, scoped_watches_supported
 if TYPE_CHECKING:
     from handlers.experimentHandler import ExperimentHandler
     from handlers.workflowHandler import WorkflowHandler
@@ -33,9 +40,35 @@ class FileSystemWatcher:
         self.workflow_handler = workflow_handler
         self.file_system_handler = file_system_handler
         self.convertor_handler = convertor_handler
-        self.observer = None
+        # quiet time after which the events of a file are applied as one change
+        self.debounce_seconds = float(os.environ.get("WATCHER_DEBOUNCE_SECONDS", "0.5"))
+        # changes are applied on this many threads, at most max_pending of them wait in the queue
+        self.workers = int(os.environ.get("WATCHER_WORKERS", "4"))
+        self.max_pending = int(os.environ.get("WATCHER_QUEUE_SIZE", "1000"))
+        # database writes made within this window are sent as one bulk write, of at most write_batch_size
+        self.write_window_seconds = float(os.environ.get("WATCHER_WRITE_WINDOW_SECONDS", "0.05"))
+        self.write_batch_size = int(os.environ.get("WATCHER_WRITE_BATCH_SIZE", "500"))
+        # "native" filesystem notifications, or "polling" for mounts where they never arrive
+        self.mode = os.environ.get("WATCHER_MODE", "native").lower()
+        self.poll_interval = float(os.environ.get("WATCHER_POLL_INTERVAL_SECONDS", "1"))
+        self.poll_max_interval = float(os.environ.get("WATCHER_POLL_MAX_INTERVAL_SECONDS", "10"))
+        self.poll_sweep_seconds = float(os.environ.get("WATCHER_POLL_SWEEP_SECONDS", "60"))
+        # native mode watches only <user>/experiments and <user>/workflows, not the whole tree
+        self.scoped_watches = os.environ.get("WATCHER_SCOPED_WATCHES", "true").lower() == "true"
+        # users are spread over this many observer threads by a hash of their name
+        self.shards = max(1, int(os.environ.get("WATCHER_SHARDS", "1")))
+        # hashes of the applied file contents, kept across restarts
+        self.index_path = os.environ.get("WATCHER_INDEX_PATH", os.path.join("..", "watcher", "content_index.sqlite3"))
+        self.content_index = None
+        # changes made while the service was down are applied in the background on start
+        self.reconcile_on_start = os.environ.get("WATCHER_RECONCILE_ON_START", "true").lower() == "true"
+        self.reconciler = None
+        self.observers = []
+        self.event_handler = None
         self.is_running = False
         self._lock = threading.Lock()
+        # user ('' for the whole workspace) -> status of the last resync
+        self._resyncs = {}
         logger.info(f"FileSystemWatcher created for path: {workspace_path}")
 
     def start(self):
@@ -54,27 +87,75 @@ class FileSystemWatcher:
                     self.workspace_path.mkdir(parents=True, exist_ok=True)
                     logger.info(f"Created workspace directory: {self.workspace_path}")
 
+                if self.content_index is None:
+                    self.content_index = ContentIndex(self.index_path)
+
+                # the watcher looks entries up by id and by file name
+                self.experiment_handler.ensure_indexes()
+                self.workflow_handler.ensure_indexes()
+
                 # Create event handler
                 event_handler = FileSystemSyncHandler(
                     self.experiment_handler,
                     self.workflow_handler,
                     self.file_system_handler,
-                    self.convertor_handler
+                    self.convertor_handler,
+                    debounce_seconds=self.debounce_seconds,
+                    workers=self.workers,
+                    max_pending=self.max_pending,
+                    content_index=self.content_index,
+                    write_window_seconds=self.write_window_seconds,
+                    write_batch_size=self.write_batch_size
                 )
+                event_handler.start()
+
+                self.event_handler = event_handler
 
-                # Create observer
-                self.observer = Observer()
-                self.observer.schedule(event_handler, str(self.workspace_path), recursive=True)
-                self.observer.start()
+                # Create observers, one per shard of the users
+                self.observers = self._create_observers()
+                for observer in self.observers:
+                    observer.schedule(event_handler, str(self.workspace_path), recursive=not self._is_sharded(observer))
+                    observer.start()
                 self.is_running = True
 
-                logger.info(f"FileSystemWatcher started successfully, monitoring: {self.workspace_path}")
+                logger.info(f"FileSystemWatcher started successfully ({self.mode}, {len(self.observers)} observers), monitoring: {self.workspace_path}")
+
+                # started after the observer, so no change is missed in between
+                if self.reconcile_on_start:
+                    self.reconciler = WorkspaceReconciler(str(self.workspace_path), event_handler, self.content_index)
+                    self.reconciler.start()
 
             except Exception as e:
                 logger.error(f"Error starting FileSystemWatcher: {str(e)}", exc_info=True)
+                self._stop_observers()
                 self.is_running = False
                 raise
 
+    def _create_observers(self):
+        if self.mode == "polling":
+            return [
+                WorkspacePollingObserver(self.poll_interval, self.poll_max_interval, self.poll_sweep_seconds, shard=shard, shards=self.shards)
+                for shard in range(self.shards)
+            ]
+        if self.scoped_watches and scoped_watches_supported():
+            return [ScopedInotifyObserver(shard=shard, shards=self.shards) for shard in range(self.shards)]
+        if self.shards > 1:
+            logger.warning("Scoped watches are not available, watching the whole workspace with one observer")
+        return [Observer()]
+
+    @staticmethod
+    def _is_sharded(observer) -> bool:
+        # the sharded observers find the users themselves, watchdog's observer needs a recursive watch
+        return isinstance(observer, (ScopedInotifyObserver, WorkspacePollingObserver))
+
+    def _stop_observers(self):
+        for observer in self.observers:
+            observer.stop()
+        for observer in self.observers:
+            if observer.is_alive():
+                observer.join(timeout=5)
+        self.observers = []
+
     def stop(self):
         """
         Stop the filesystem watcher.
@@ -85,10 +166,9 @@ class FileSystemWatcher:
                 return
 
             try:
-                if self.observer:
-                    self.observer.stop()
-                    self.observer.join(timeout=5)
-                    self.observer = None
+                self._stop_observers()
+                if self.event_handler:
+                    self.event_handler.stop()
 
                 self.is_running = False
                 logger.info("FileSystemWatcher stopped successfully")
@@ -97,6 +177,88 @@ class FileSystemWatcher:
                 logger.error(f"Error stopping FileSystemWatcher: {str(e)}", exc_info=True)
                 raise
 
+    def resync(self, username: str = None):
+        """
+        Re-import the .xxp files of the workspace, or of one user, in batches.
+        Used after bulk changes such as a checkout, which are too many to sync file by file.
+
+        Args:
+            username: Only synchronize this user's files (default: every user)
+
+        Returns:
+            list: One {"path", "success", "error"} entry per file
+        """
+        if self.event_handler is None:
+            raise RuntimeError("Watcher has not been started")
+
+        user_pattern = username if username else "*"
+        file_paths = [
+            path
+            for file_type in ("experiments", "workflows")
+            for path in self.workspace_path.glob(f"{user_pattern}/{file_type}/*.xxp")
+        ]
+        logger.info(f"Resynchronizing {len(file_paths)} files under {self.workspace_path / (username or '')}")
+        return self.event_handler.sync_files(file_paths)
+
+    def submit_resync(self, username: str = None):
+        """
+        Queue a resync on the worker pool of the watcher, instead of running it on the caller's
+        thread. A resync of the same user already queued or running is returned instead.
+
+        Args:
+            username: Only synchronize this user's files (default: every user)
+
+        Returns:
+            dict: The status of the resync, as get_resync returns it
+        """
+        if self.event_handler is None:
+            raise RuntimeError("Watcher has not been started")
+
+        key = username or ""
+        with self._lock:
+            resync = self._resyncs.get(key)
+            if resync is not None and resync["status"] in ("queued", "running"):
+                return dict(resync)
+            resync = self._resyncs[key] = {
+                "status": "queued",
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "files": None,
+                "synced": None,
+                "failed": [],
+                "error": None,
+            }
+            status = dict(resync)
+        # keyed by user, so two resyncs of a user never run at the same time
+        self.event_handler.worker_pool.submit([("resync", key)], username, self._run_resync)
+        return status
+
+    def get_resync(self, username: str = None):
+        """
+        Get the status of the last resync of a user.
+
+        Returns:
+            dict: Its status ('queued', 'running', 'done' or 'failed'), the number of files and
+                of files synchronized, and the files that failed; None if there was none
+        """
+        with self._lock:
+            resync = self._resyncs.get(username or "")
+            return dict(resync) if resync is not None else None
+
+    def _run_resync(self, username):
+        key = username or ""
+        with self._lock:
+            self._resyncs[key]["status"] = "running"
+        try:
+            results = self.resync(username)
+            failed = [result for result in results if not result["success"]]
+            fields = {"status": "done", "files": len(results), "synced": len(results) - len(failed), "failed": failed}
+        except Exception as e:
+            logger.error(f"Error resynchronizing {username or 'the workspace'}: {str(e)}", exc_info=True)
+            fields = {"status": "failed", "error": str(e)}
+        with self._lock:
+            self._resyncs[key].update(fields, finished_at=time.time())
+
     def get_status(self):
         """
         Get the current status of the watcher.
@@ -108,7 +270,13 @@ class FileSystemWatcher:
             return {
                 "running": self.is_running,
                 "workspace_path": str(self.workspace_path),
-                "observer_alive": self.observer.is_alive() if self.observer else False
+                "observer_alive": bool(self.observers) and all(observer.is_alive() for observer in self.observers),
+                "mode": self.mode,
+                # per shard: its users and its rate of filesystem events
+                "shards": [stats for observer in self.observers if self._is_sharded(observer) for stats in observer.get_stats()],
+                **(self.event_handler.get_stats() if self.event_handler else {}),
+                "reconciliation": self.reconciler.get_report() if self.reconciler else None,
+                "api_writes": get_event_registry_stats()
             }
 
 
@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Task:
+    __slots__ = ("keys", "item", "process", "submitted_at", "ready")
+
+    def __init__(self, keys, item, process=None):
+        self.keys = keys
+        self.item = item
+        self.process = process
+        self.submitted_at = time.monotonic()
+        self.ready = False
+
+
+class KeyedWorkerPool:
+    """
+    Processes watcher changes on a bounded pool of worker threads, off the observer thread.
+
+    Every item carries keys (the paths it touches). Items sharing a key are processed one at
+    a time in the order they were submitted; other items run in parallel. The queue holds
+    at most max_pending items: when it is full, submit blocks the producer until a worker
+    frees a slot, so a burst of events slows the watcher down instead of growing memory.
+
+    Every key has a queue of its items, the running one first. An item is ready once it is
+    first in the queues of all its keys; ready items wait in a queue of their own, so a
+    worker takes the next item in constant time however many items are blocked.
+    """
+
+    def __init__(self, process: Callable[[Any], None], workers: int = 4, max_pending: int = 1000):
+        """
+        Initialize the worker pool.
+
+        Args:
+            process: Callable processing one item
+            workers: Number of worker threads
+            max_pending: Maximum number of queued items before submit blocks
+        """
+        self.process = process
+        self.workers = workers
+        self.max_pending = max_pending
+        # key -> its items, the running one first
+        self._key_queues: Dict[Hashable, deque] = {}
+        self._ready = deque()
+        # queued items, not running yet, in submission order
+        self._pending: Dict[_Task, None] = {}
+        self._in_flight = 0
+        self._lags = deque(maxlen=100)
+        self._latencies = deque(maxlen=100)
+        self._stats = {"processed": 0, "failed": 0, "blocked": 0, "blocked_seconds": 0.0, "max_depth": 0}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"watcher-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"KeyedWorkerPool started with {self.workers} workers")
+
+    def stop(self, timeout: float = 10):
+        """Process the queued items, for at most timeout seconds, and stop the worker threads."""
+        self.join(timeout)
+        with self._condition:
+            if self._pending:
+                logger.warning(f"KeyedWorkerPool stopped with {len(self._pending)} changes still queued")
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        logger.info("KeyedWorkerPool stopped")
+
+    def submit(self, keys: Sequence[Hashable], item: Any, process: Optional[Callable[[Any], None]] = None):
+        """
+        Queue an item, blocking while the queue is full.
+
+        Args:
+            keys: Keys of the item, items sharing a key are processed in order
+            item: The item to pass to process
+            process: Callable processing this item instead of the pool's
+        """
+        task = _Task(frozenset(keys), item, process)
+        with self._condition:
+            if self._running and len(self._pending) >= self.max_pending:
+                self._stats["blocked"] += 1
+                blocked_at = time.monotonic()
+                while self._running and len(self._pending) >= self.max_pending:
+                    self._condition.wait()
+                self._stats["blocked_seconds"] += time.monotonic() - blocked_at
+            if self._running:
+                self._pending[task] = None
+                for key in task.keys:
+                    self._key_queues.setdefault(key, deque()).append(task)
+                self._mark_ready(task)
+                self._stats["max_depth"] = max(self._stats["max_depth"], len(self._pending))
+                self._condition.notify_all()
+                return
+        # not started, or stopped: process on the caller's thread
+        self._run(task)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued item has been processed.
+
+        Returns:
+            bool: False if items were still queued or running after the timeout
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while self._running and (self._pending or self._in_flight):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            now = time.monotonic()
+            lags = list(self._lags)
+            latencies = list(self._latencies)
+            return {
+                **self._stats,
+                "workers": self.workers,
+                "queue_depth": len(self._pending),
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                # how long the oldest queued item has been waiting
+                "lag": now - next(iter(self._pending)).submitted_at if self._pending else 0.0,
+                "average_wait": sum(lags) / len(lags) if lags else None,
+                "average_latency": sum(latencies) / len(latencies) if latencies else None,
+                "max_latency": max(latencies) if latencies else None,
+            }
+
+    def _mark_ready(self, task: _Task):
+        """Queue a task as ready if it is first for all its keys. Called with the lock held."""
+        if not task.ready and all(self._key_queues[key][0] is task for key in task.keys):
+            task.ready = True
+            self._ready.append(task)
+
+    def _next_task(self) -> Optional[_Task]:
+        """The next ready task, none of whose keys is running or held by an earlier task. Called with the lock held."""
+        if not self._ready:
+            return None
+        task = self._ready.popleft()
+        del self._pending[task]
+        return task
+
+    def _release(self, task: _Task):
+        """Drop a finished task from its key queues, the next task of each key may be ready. Called with the lock held."""
+        for key in task.keys:
+            queue = self._key_queues[key]
+            queue.popleft()
+            if queue:
+                self._mark_ready(queue[0])
+            else:
+                del self._key_queues[key]
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._running:
+                        return
+                    task = self._next_task()
+                    if task is not None:
+                        break
+                    self._condition.wait()
+                self._in_flight += 1
+                self._lags.append(time.monotonic() - task.submitted_at)
+                # a slot is free for blocked producers
+                self._condition.notify_all()
+            try:
+                self._run(task)
+            finally:
+                with self._condition:
+                    self._release(task)
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _run(self, task: _Task):
+        try:
+            (task.process or self.process)(task.item)
+            failed = False
+        except Exception as e:
+            logger.error(f"Error processing watcher change {task.item}: {str(e)}", exc_info=True)
+            failed = True
+        with self._condition:
+            self._stats["failed" if failed else "processed"] += 1
+            self._latencies.append(time.monotonic() - task.submitted_at)
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class _Write:
+    __slots__ = ("target", "operation", "keys", "on_done")
+
+    def __init__(self, target, operation, keys, on_done):
+        self.target = target
+        self.operation = operation
+        self.keys = keys
+        self.on_done = on_done
+
+
+class WriteBatcher:
+    """
+    Groups the database writes of the watcher into bulk writes.
+
+    Operations submitted within window_seconds of each other, or until max_batch of them
+    are waiting, are written together with one ordered bulk write per target (collection).
+    Batches are written one at a time in submission order, so the writes of one document
+    are applied in the order they were made. If an operation of a bulk write fails, the
+    operations after it, which the ordered bulk write did not apply, are written again.
+
+    Every operation carries keys (the documents it touches). A lookup of a document in the
+    database must call settle with its keys first: if a write of that document is still
+    waiting, the batch is written before the lookup reads a stale state.
+    """
+
+    def __init__(self, write: Callable[[Hashable, List[Any]], None], window_seconds: float = 0.05, max_batch: int = 500):
+        """
+        Initialize the batcher.
+
+        Args:
+            write: Callable writing a list of operations to a target in one ordered bulk write
+            window_seconds: How long an operation waits for others, 0 to write every operation at once
+            max_batch: Maximum number of operations per batch
+        """
+        self.write = write
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending: List[_Write] = []
+        self._pending_keys = Counter()
+        self._first_pending_at = None
+        self._holds = 0
+        self._stats = {"batches": 0, "operations": 0, "failed": 0, "max_batch_size": 0, "write_seconds": 0.0}
+        self._condition = threading.Condition()
+        # held while a batch is taken and written, so that batches are written in order
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running or self.window_seconds <= 0:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="watcher-write-batcher", daemon=True)
+        self._thread.start()
+        logger.info(f"WriteBatcher started, window {self.window_seconds}s, batches of up to {self.max_batch}")
+
+    def stop(self):
+        """Write the waiting operations and stop the background thread."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+        logger.info("WriteBatcher stopped")
+
+    def submit(self, target: Hashable, operation: Any, keys: Sequence[Hashable] = (), on_done: Optional[Callable[[bool], None]] = None):
+        """
+        Queue an operation.
+
+        Args:
+            target: Where the operation is written, passed to write
+            operation: The operation
+            keys: Keys of the documents the operation touches
+            on_done: Called with True once the operation is written, or False if it failed
+        """
+        with self._condition:
+            self._pending.append(_Write(target, operation, tuple(keys), on_done))
+            self._pending_keys.update(keys)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            full = len(self._pending) >= self.max_batch
+            if (self._running or self._holds) and not full:
+                self._condition.notify_all()
+                return
+        # not started, or a full batch: written on the caller's thread, which holds back producers
+        self.flush()
+
+    @contextmanager
+    def holding(self):
+        """Queue the operations submitted meanwhile even if not started, and write them on exit."""
+        with self._condition:
+            self._holds += 1
+        try:
+            yield self
+        finally:
+            with self._condition:
+                self._holds -= 1
+            self.flush()
+
+    def settle(self, keys: Sequence[Hashable]):
+        """Write the waiting operations if one of them touches keys."""
+        with self._condition:
+            pending = any(self._pending_keys[key] for key in keys)
+        if pending:
+            self.flush()
+
+    def flush(self):
+        """Write every waiting operation, in batches of up to max_batch, blocking until they are written."""
+        with self._write_lock:
+            with self._condition:
+                pending = self._pending
+                self._pending = []
+                self._first_pending_at = None
+            for start in range(0, len(pending), self.max_batch):
+                self._write_batch(pending[start:start + self.max_batch])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            batches = self._stats["batches"]
+            return {
+                **self._stats,
+                "pending": len(self._pending),
+                "average_batch_size": self._stats["operations"] / batches if batches else None,
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if not self._running:
+                        return
+                    if self._pending:
+                        remaining = self._first_pending_at + self.window_seconds - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing watcher batch: {str(e)}", exc_info=True)
+
+    def _write_batch(self, batch: List[_Write]):
+        """Write a batch with one bulk write per target. Called with the write lock held."""
+        by_target: Dict[Hashable, List[_Write]] = {}
+        for item in batch:
+            by_target.setdefault(item.target, []).append(item)
+
+        started = time.perf_counter()
+        results = {}
+        for target, items in by_target.items():
+            while items:
+                try:
+                    self.write(target, [item.operation for item in items])
+                    written = done = len(items)
+                except Exception as e:
+                    # an ordered bulk write stops at the first error, BulkWriteError tells where;
+                    # without it, which operations were applied is unknown and they all fail
+                    errors = (getattr(e, "details", None) or {}).get("writeErrors")
+                    written = errors[0]["index"] if errors else 0
+                    done = written + 1 if errors else len(items)
+                    logger.error(f"Bulk write of {len(items)} operations to {target} failed after {written}: {str(e)}")
+                for index, item in enumerate(items[:done]):
+                    results[id(item)] = index < written
+                # the operations after the failed one were not applied, written again
+                items = items[done:]
+
+        with self._condition:
+            for item in batch:
+                self._pending_keys.subtract(item.keys)
+            self._pending_keys = +self._pending_keys
+            self._stats["batches"] += 1
+            self._stats["operations"] += len(batch)
+            self._stats["failed"] += sum(1 for success in results.values() if not success)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            self._stats["write_seconds"] += time.perf_counter() - started
+
+        for item in batch:
+            if item.on_done is not None:
+                try:
+                    item.on_done(results[id(item)])
+                except Exception as e:
+                    logger.error(f"Error after writing {item.operation}: {str(e)}", exc_info=True)
@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.datasets import ColumnCache, RunningStats, aggregate
+
+OPERATIONS = ["sum", "min", "max", "mean", "count"]
+
+
+@pytest.fixture
+def frame_csv(tmp_path):
+    frame = pd.DataFrame({
+        "ints": [3, 1, 12341, 0],
+        "floats": [1.5, np.nan, -2.0, 4.25],
+        "flags": [True, False, True, True],
+        "names": ["pear", "kiwi", "apple", "fig"],
+    })
+    path = tmp_path / "frame.csv"
+    frame.to_csv(path, index=False)
+    return path
+
+
+def cached_column(path, column):
+    return ColumnCache(str(path.parent), str(path.parent / ".columns")).get_column(path.name, column)
+
+
+@pytest.mark.parametrize("column", ["ints", "floats", "flags"])
+def test_numeric_columns_match_pandas(frame_csv, column):
+    expected = pd.read_csv(frame_csv)[column]
+    results = aggregate(cached_column(frame_csv, column), OPERATIONS)
+    for operation in OPERATIONS:
+        value = getattr(expected, operation)()
+        assert results[operation] == pytest.approx(value)
+        assert type(results[operation]) is type(value.item() if hasattr(value, "item") else value)
+
+
+def test_integer_sum_min_max_stay_integers(frame_csv):
+    results = aggregate(cached_column(frame_csv, "ints"), ["sum", "min", "max"])
+    assert results == {"sum": 12345, "min": 0, "max": 12341}
+    assert all(isinstance(value, int) for value in results.values())
+    assert str(pd.DataFrame({"result": [results["sum"]]}).to_csv(index=False)) == "result\n12345\n"
+
+
+def test_text_columns_match_pandas(frame_csv):
+    expected = pd.read_csv(frame_csv)["names"]
+    results = aggregate(cached_column(frame_csv, "names"), ["min", "max", "sum", "count"])
+    assert results == {"min": expected.min(), "max": expected.max(), "sum": expected.sum(), "count": 4}
+
+
+def test_mean_of_text_fails_like_pandas(frame_csv):
+    with pytest.raises(TypeError):
+        aggregate(cached_column(frame_csv, "names"), ["mean"])
+
+
+def test_running_stats_keep_integers():
+    stats = RunningStats().update(np.array([3, 1])).update(np.array([12341, 0]))
+    assert [stats.result(operation) for operation in ("sum", "min", "max")] == [12345, 0, 12341]
+    assert all(isinstance(stats.result(operation), int) for operation in ("sum", "min", "max"))
+
+
+def test_running_stats_float_chunk_makes_the_column_float():
+    stats = RunningStats().update(np.array([3, 1])).update(np.array([np.nan]))
+    assert stats.result("sum") == 4.0 and isinstance(stats.result("sum"), float)
+    assert isinstance(stats.result("max"), float)
+
+
+def test_running_stats_reject_text():
+    with pytest.raises(TypeError):
+        RunningStats().update(np.array(["a", "b"]))
+
+
+def test_empty_column():
+    results = aggregate(np.array([np.nan, np.nan]), OPERATIONS)
+    assert results["sum"] == 0.0 and results["count"] == 0
+    assert math.isnan(results["min"]) and math.isnan(results["mean"])
@@ -0,0 +1,53 @@
+import math
+
+import pandas as pd
+import pytest
+
+from conftest import SRC_PATH
+from services.datasets import ColumnCache, aggregate, aggregate_csv_in_chunks
+from services.datasets.aggregation import MERGEABLE_OPERATIONS
+
+DATA_PATH = SRC_PATH.parent / "data"
+DATASETS = ["volume.csv", "manufacturing.csv"]
+# small enough that every file is read in many chunks, some of them only missing values
+CHUNK_ROWS = 7
+
+
+def columns_of(file_name):
+    return [(file_name, column) for column in pd.read_csv(DATA_PATH / file_name, nrows=0).columns]
+
+
+@pytest.fixture(scope="module")
+def column_cache(tmp_path_factory):
+    # the columnar copies go to a temporary directory, not next to the bundled data
+    return ColumnCache(str(DATA_PATH), str(tmp_path_factory.mktemp("columns")))
+
+
+def assert_same(chunked, in_memory):
+    if isinstance(in_memory, float) and math.isnan(in_memory):
+        assert math.isnan(chunked)
+        return
+    assert type(chunked) is type(in_memory)
+    assert chunked == pytest.approx(in_memory, rel=1e-9)
+
+
+@pytest.mark.parametrize("file_name,column", [column for file_name in DATASETS for column in columns_of(file_name)])
+def test_chunked_matches_in_memory(column_cache, file_name, column):
+    stats = aggregate_csv_in_chunks(DATA_PATH / file_name, column, CHUNK_ROWS)
+    if stats is None:
+        # text columns are left to the in-memory path
+        assert column_cache.get_column(file_name, column).dtype == object
+        return
+    in_memory = aggregate(column_cache.get_column(file_name, column), MERGEABLE_OPERATIONS)
+    for operation in MERGEABLE_OPERATIONS:
+        assert_same(stats.result(operation), in_memory[operation])
+
+
+@pytest.mark.parametrize("file_name", DATASETS)
+def test_in_memory_matches_pandas(column_cache, file_name):
+    frame = pd.read_csv(DATA_PATH / file_name)
+    for column in frame.select_dtypes("number").columns:
+        results = aggregate(column_cache.get_column(file_name, column), ("sum", "min", "max", "mean"))
+        for operation, value in results.items():
+            expected = getattr(frame[column], operation)()
+            assert_same(value, expected.item() if hasattr(expected, "item") else expected)
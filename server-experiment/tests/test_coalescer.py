@@ -0,0 +1,39 @@
+import os
+
+from services.file_watcher import ContentIndex, EventCoalescer, FileChange
+from services.file_watcher.coalescer import CREATED, DELETED, RENAMED
+
+
+def coalesce(events, same_file=None):
+    changes = []
+    coalescer = EventCoalescer(changes.append, quiet_seconds=1, same_file=same_file)
+    for event, *paths in events:
+        getattr(coalescer, event)(*paths)
+    coalescer.flush()
+    return sorted(changes)
+
+
+def test_delete_and_create_stay_apart_without_same_file():
+    assert coalesce([("deleted", "/ws/alice/experiments/a.xxp"), ("created", "/ws/alice/experiments/b.xxp")]) == [
+        FileChange(CREATED, "/ws/alice/experiments/b.xxp"),
+        FileChange(DELETED, "/ws/alice/experiments/a.xxp"),
+    ]
+
+
+def test_delete_and_create_of_the_same_content_are_a_rename(tmp_path):
+    index = ContentIndex(str(tmp_path / "index.db"))
+    old_path, new_path, other_path = (str(tmp_path / name) for name in ("a.xxp", "b.xxp", "c.xxp"))
+    with open(old_path, "w") as f:
+        f.write("experiment a { }\n")
+    index.record(old_path, ContentIndex.fingerprint(old_path, os.stat(old_path)))
+    os.rename(old_path, new_path)
+    with open(other_path, "w") as f:
+        f.write("experiment c { }\n")
+
+    assert coalesce([("deleted", old_path), ("created", new_path)], index.same_content) == [
+        FileChange(RENAMED, new_path, old_path),
+    ]
+    assert coalesce([("deleted", old_path), ("created", other_path)], index.same_content) == [
+        FileChange(CREATED, other_path),
+        FileChange(DELETED, old_path),
+    ]
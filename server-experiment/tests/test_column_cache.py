@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.datasets import ColumnCache, aggregate
+
+
+@pytest.fixture
+def text_csv(tmp_path):
+    path = tmp_path / "notes.csv"
+    # numbers in the first chunks, text and missing values later
+    path.write_text(
+        "id,note,score\n"
+        "1,7,0.5\n"
+        "2,8,1.5\n"
+        "3,,2.5\n"
+        "4,café,\n"
+        "5," + "x" * 10000 + ",4.5\n"
+        "6,\"a, b\",5.5\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+def column_cache(path, chunk_rows):
+    return ColumnCache(str(path.parent), str(path.parent / ".columns"), chunk_rows=chunk_rows)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 100])
+def test_columns_match_pandas_whatever_the_chunk_size(text_csv, chunk_rows):
+    cache = column_cache(text_csv, chunk_rows)
+    expected = pd.read_csv(text_csv)
+
+    assert cache.get_columns(text_csv.name) == ["id", "note", "score"]
+    assert cache.get_column(text_csv.name, "id").tolist() == expected["id"].tolist()
+    np.testing.assert_array_equal(cache.get_column(text_csv.name, "score"), expected["score"].to_numpy())
+    notes = cache.get_column(text_csv.name, "note")
+    assert notes.dtype == object
+    assert notes.tolist() == [None if pd.isna(value) else value for value in expected["note"]]
+
+
+def test_text_is_stored_by_its_length_not_the_longest_value(text_csv):
+    cache = column_cache(text_csv, 2)
+    entry = cache._manifest(text_csv.name)["columns"]["note"]
+    entry_dir = cache.cache_path / text_csv.name
+
+    data = np.load(entry_dir / entry["file"], mmap_mode="r")
+    assert data.dtype == np.uint8 and data.size == len("78caféa, b".encode("utf-8")) + 10000
+    assert np.load(entry_dir / entry["offsets"]).tolist()[-1] == data.size
+
+
+def test_text_aggregation_treats_missing_values_like_pandas(text_csv):
+    notes = column_cache(text_csv, 2).get_column(text_csv.name, "note")
+    assert aggregate(notes, ["count"]) == {"count": int(pd.read_csv(text_csv)["note"].count())}
+    # pandas cannot order text with missing values either
+    with pytest.raises(TypeError):
+        aggregate(notes, ["min"])
+
+
+def test_empty_csv_has_no_columns(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("", encoding="utf-8")
+    assert column_cache(path, 2).get_columns(path.name) == []
@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+from services.file_watcher import ContentIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ContentIndex(str(tmp_path / "index" / "content.db"))
+    yield index
+    index.close()
+
+
+def write(path, content, mtime_ns=None):
+    path.write_text(content, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def record_lookup(index, path):
+    fingerprint, unchanged = index.lookup(path)
+    index.record(path, fingerprint)
+    return unchanged
+
+
+def test_unknown_file_is_changed_and_not_recorded(index, tmp_path):
+    path = write(tmp_path / "a.xxp", "one")
+    fingerprint, unchanged = index.lookup(path)
+
+    assert not unchanged
+    assert fingerprint == ContentIndex.fingerprint(path, os.stat(path))
+    assert index.get(path) is None
+    assert index.get_stats()["changed"] == 1
+
+
+def test_same_size_and_mtime_is_unchanged_without_hashing(index, tmp_path, monkeypatch):
+    path = write(tmp_path / "a.xxp", "one", mtime_ns=1_000_000_000)
+    record_lookup(index, path)
+
+    def no_hash(path):
+        raise AssertionError("hashed")
+
+    monkeypatch.setattr(ContentIndex, "_hash", staticmethod(no_hash))
+    assert index.lookup(path)[1]
+    assert index.get_stats()["unchanged_stat"] == 1
+
+
+def test_touched_file_is_unchanged_and_its_new_mtime_recorded(index, tmp_path):
+    path = write(tmp_path / "a.xxp", "one", mtime_ns=1_000_000_000)
+    record_lookup(index, path)
+    write(tmp_path / "a.xxp", "one", mtime_ns=2_000_000_000)
+
+    fingerprint, unchanged = index.lookup(path)
+    assert unchanged and index.get(path) == fingerprint and fingerprint.mtime_ns == 2_000_000_000
+    assert index.lookup(path)[1]
+    stats = index.get_stats()
+    assert (stats["unchanged_content"], stats["unchanged_stat"]) == (1, 1)
+
+
+def test_new_content_of_the_same_size_is_changed(index, tmp_path):
+    path = write(tmp_path / "a.xxp", "one", mtime_ns=1_000_000_000)
+    record_lookup(index, path)
+    write(tmp_path / "a.xxp", "two", mtime_ns=1_000_000_000)
+    assert index.lookup(path)[1]  # same size and mtime: taken as unchanged by the pre-check
+
+    write(tmp_path / "a.xxp", "two", mtime_ns=3_000_000_000)
+    fingerprint, unchanged = index.lookup(path)
+    assert not unchanged and index.get(path).sha256 != fingerprint.sha256
+
+
+def test_missing_file_raises(index, tmp_path):
+    with pytest.raises(OSError):
+        index.lookup(str(tmp_path / "missing.xxp"))
+
+
+def test_moved_forgotten_and_listed_entries(index, tmp_path):
+    (tmp_path / "alice").mkdir()
+    (tmp_path / "bob").mkdir()
+    a = write(tmp_path / "alice" / "a.xxp", "one")
+    b = write(tmp_path / "bob" / "b.xxp", "two")
+    record_lookup(index, a)
+    record_lookup(index, b)
+
+    assert list(index.entries(str(tmp_path / "alice") + os.sep)) == [a]
+    os.rename(a, tmp_path / "alice" / "c.xxp")
+    c = str(tmp_path / "alice" / "c.xxp")
+    assert index.same_content(a, c)
+    index.move(a, c)
+    assert index.get(a) is None and index.lookup(c)[1]
+
+    index.forget(b)
+    assert set(index.entries()) == {c}
+
+
+def test_index_survives_a_restart(tmp_path):
+    path = write(tmp_path / "a.xxp", "one")
+    index = ContentIndex(str(tmp_path / "content.db"))
+    record_lookup(index, path)
+    index.close()
+
+    reopened = ContentIndex(str(tmp_path / "content.db"))
+    try:
+        assert reopened.lookup(path)[1]
+    finally:
+        reopened.close()
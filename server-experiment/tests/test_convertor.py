@@ -0,0 +1,214 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+
+
+@pytest.fixture(scope="module")
+def convertor_module():
+    # loaded on its own, the handlers package connects to the databases on import
+    spec = importlib.util.spec_from_file_location("convertor_handler", os.path.join(SRC, "handlers", "convertorHandler.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def convertor(convertor_module):
+    handler = convertor_module.ConvertorHandler()
+    handler.meta_model_loc = "Generic#//"
+    return handler
+
+
+def static_parameter(ref):
+    return {"$type": "Generic#//StaticParameter", "$ref": ref}
+
+
+def deployed_workflow(workflow_id, *parameter_ids):
+    return {"$id": workflow_id, "configuredtask": [{"parameters": [{"$id": parameter_id}]} for parameter_id in parameter_ids]}
+
+
+def experiment_space(workflow_id, *domain_ids):
+    return {
+        "$id": f"space-{workflow_id}",
+        "deployedworkflow": {"$ref": workflow_id},
+        "parameterdomain": [{"$ref": domain_id} for domain_id in domain_ids],
+    }
+
+
+def expanded_refs(model):
+    return {
+        space["$id"]: [(domain["staticparameter"]["$ref"], domain["value"]) for domain in space["parameterdomain"]]
+        for space in model["experimentspace"]
+    }
+
+
+def test_parameter_used_twice_in_a_deployed_workflow_is_expanded_per_use(convertor):
+    domain = {
+        "$id": "parameterdomain-0-p",
+        "name": "p",
+        "type": "NUMBER",
+        "values": [1, 2],
+        "staticparameter": [static_parameter("dw1p"), static_parameter("dw1p"), static_parameter("dw2p")],
+    }
+    model = {
+        "deployedworkflow": [deployed_workflow("dw1", "dw1p", "dw1p"), deployed_workflow("dw2", "dw2p")],
+        "experimentspace": [experiment_space("dw1", domain["$id"], domain["$id"]), experiment_space("dw2", domain["$id"])],
+        "parameterdomain": [domain],
+    }
+
+    expanded = convertor.expand_parameter_domains(model)
+
+    assert "parameterdomain" not in expanded
+    assert expanded_refs(expanded) == {
+        "space-dw1": [("dw1p", 1), ("dw1p", 2), ("dw1p", 1), ("dw1p", 2)],
+        "space-dw2": [("dw2p", 1), ("dw2p", 2)],
+    }
+
+
+def test_domain_without_static_parameter_in_the_workflow_is_skipped(convertor):
+    domain = {"$id": "parameterdomain-0-p", "name": "p", "type": "NUMBER", "range": {"start": 0, "step": 5, "count": 3},
+              "staticparameter": [static_parameter("dw2p")]}
+    model = {
+        "deployedworkflow": [deployed_workflow("dw1", "dw1q")],
+        "experimentspace": [experiment_space("dw1", domain["$id"])],
+        "parameterdomain": [domain],
+    }
+
+    assert expanded_refs(convertor.expand_parameter_domains(model)) == {"space-dw1": []}
+
+
+class FailedResponse:
+    def json(self):
+        return {"type": "error"}
+
+
+def subflow(viewport=None):
+    graph = {
+        "nodes": [
+            {"id": "s", "type": "start", "data": {}},
+            {"id": "x", "type": "opExclusive", "data": {"conditions": [{"cases": [
+                {"condition": "a > 1", "targetNodeId": "t1"},
+                {"condition": "a <= 1", "targetNodeId": "t2"},
+            ]}]}},
+            {"id": "t1", "type": "task", "data": {"variants": [{"id_task": "leaf-1", "name": "leaf", "is_composite": False}]}},
+            {"id": "t2", "type": "task", "data": {"variants": [{"id_task": "leaf-2", "name": "leaf", "is_composite": False}]}},
+            {"id": "e", "type": "end", "data": {}},
+        ],
+        "edges": [
+            {"id": "l1", "source": "s", "target": "x", "type": "regular"},
+            {"id": "l2", "source": "x", "target": "t1", "type": "conditional"},
+            {"id": "l3", "source": "x", "target": "t2", "type": "conditional"},
+            {"id": "l4", "source": "t1", "target": "e", "type": "regular"},
+            {"id": "l5", "source": "t2", "target": "e", "type": "regular"},
+        ],
+    }
+    if viewport is not None:
+        graph["viewport"] = viewport
+    return graph
+
+
+def experiment(second_subflow):
+    variants = [
+        {"id_task": "composite-a", "name": "a", "is_composite": True, "graphical_model": subflow()},
+        {"id_task": "composite-b", "name": "b", "is_composite": True, "graphical_model": second_subflow},
+    ]
+    return {"name": "exp", "graphical_model": {
+        "nodes": [
+            {"id": "s", "type": "start", "data": {}},
+            {"id": "t", "type": "task", "data": {"variants": variants}},
+            {"id": "e", "type": "end", "data": {}},
+        ],
+        "edges": [
+            {"id": "l1", "source": "s", "target": "t", "type": "regular"},
+            {"id": "l2", "source": "t", "target": "e", "type": "regular"},
+        ],
+    }}
+
+
+def converted_workflows(convertor, convertor_module, monkeypatch, exp):
+    posted = []
+    monkeypatch.setattr(convertor_module.requests, "post", lambda url, **kwargs: posted.append(kwargs["data"]) or FailedResponse())
+    assert convertor.convert(exp)["success"] is False
+    return json.loads(posted[0])["data"]["workflow"]
+
+
+def condition_ids(workflows):
+    return [
+        id_
+        for workflow in workflows
+        for node in workflow["node"]
+        if "condition" in node
+        for id_ in [node["condition"]["$id"]] + [case["$id"] for case in node["condition"]["cases"]]
+    ]
+
+
+def without_condition_ids(workflows):
+    text = json.dumps(workflows, sort_keys=True)
+    for id_ in condition_ids(workflows):
+        text = text.replace(id_, "id")
+    return json.loads(text)
+
+
+def test_identical_subflows_are_converted_once_with_their_own_condition_ids(convertor, convertor_module, monkeypatch):
+    deduplicated = converted_workflows(convertor, convertor_module, monkeypatch, experiment(subflow()))
+    # a graph differing only by a key the conversion ignores is converted on its own
+    separate = converted_workflows(convertor, convertor_module, monkeypatch, experiment(subflow(viewport={"zoom": 1})))
+
+    assert [workflow["$id"] for workflow in deduplicated] == ["workflow-0", "composite-a", "composite-b"]
+    assert without_condition_ids(deduplicated) == without_condition_ids(separate)
+    ids = condition_ids(deduplicated)
+    assert len(ids) == 6 and len(set(ids)) == 6
+
+
+class FakeResponse:
+    def __init__(self, status_code, name):
+        self.status_code = status_code
+        self.text = f"cannot convert {name}"
+        self.name = name
+
+    def json(self):
+        return {"name": self.name}
+
+
+class FakeSession:
+    """Records the threads using it; a session must not be shared between threads."""
+
+    created = []
+
+    def __init__(self):
+        self.threads = set()
+        self.timeouts = []
+        self.closed = False
+        FakeSession.created.append(self)
+
+    def post(self, url, params=None, data=None, timeout=None):
+        self.threads.add(threading.get_ident())
+        self.timeouts.append(timeout)
+        time.sleep(0.01)
+        return FakeResponse(500 if data == "bad" else 200, params["name"])
+
+    def close(self):
+        self.closed = True
+
+
+def test_batch_conversion_uses_one_session_per_thread_with_a_timeout(convertor, convertor_module, monkeypatch):
+    monkeypatch.setattr(convertor_module.requests, "Session", FakeSession)
+    monkeypatch.setattr(FakeSession, "created", [])
+    convertor.dsl_converter = "http"
+    documents = [(f"exp{index}", "bad" if index == 3 else "ok") for index in range(20)]
+
+    results = convertor.dsl2experiments(documents, max_workers=4)
+
+    assert [result["name"] for result in results] == [name for name, _ in documents]
+    assert [result["success"] for result in results] == [index != 3 for index in range(20)]
+    assert results[0]["data"] == {"name": "exp0"} and results[3]["error"] == "cannot convert exp3"
+    sessions = FakeSession.created
+    assert 1 <= len(sessions) <= 4
+    assert all(len(session.threads) == 1 and session.closed for session in sessions)
+    assert {timeout for session in sessions for timeout in session.timeouts} == {convertor.batch_timeout}
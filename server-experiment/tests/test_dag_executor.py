@@ -0,0 +1,107 @@
+import pytest
+
+from services.execution import ConditionError, DagExecutor, evaluate_condition
+
+
+def task(node_id, name=None):
+    return {"id": node_id, "type": "task", "data": {"variants": [{"id_task": node_id, "name": name or node_id}]}}
+
+
+def edge(source, target, edge_type=None, condition=None):
+    data = {"condition": condition} if condition is not None else {}
+    return {"id": f"{source}-{target}", "source": source, "target": target, "type": edge_type, "data": data}
+
+
+def exclusive_gateway(node_id, cases):
+    return {"id": node_id, "type": "opExclusive",
+            "data": {"conditions": [{"cases": [{"targetNodeId": target, "condition": condition} for target, condition in cases]}]}}
+
+
+def statuses(report):
+    return {node["id"]: node["status"] for node in report["nodes"]}
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("accuracy > 0.9 and model == 'svm'", True),
+    ("accuracy > 0.95 || model == 'tree'", False),
+    ("accuracy * 100 >= 90 && not done", True),
+    ("model + '-v2' == 'svm-v2'", True),
+    ("model in ['svm', 'tree']", True),
+    ("else", True),
+    ("", True),
+    ("done == false", True),
+])
+def test_conditions(expression, expected):
+    assert evaluate_condition(expression, {"accuracy": 0.92, "model": "svm", "done": False}) is expected
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9",
+    "'a'*10**10",
+    "'a' * 1000 == ''",
+    "[1] * 5 == []",
+    "model % 'x'",
+    "__import__('os')",
+    "model.upper() == 'SVM'",
+    "unknown > 1",
+    "1 / 0",
+    "accuracy >",
+])
+def test_unsafe_or_invalid_conditions_are_rejected(expression):
+    with pytest.raises(ConditionError):
+        evaluate_condition(expression, {"accuracy": 0.92, "model": "svm"})
+
+
+def test_exclusive_gateway_takes_the_first_matching_case_and_skips_the_others():
+    graph = {
+        "nodes": [task("train"), exclusive_gateway("gateway", [("deploy", "score > 0.5"), ("retrain", "else")]),
+                  task("deploy"), task("retrain"), task("report")],
+        "edges": [edge("train", "gateway"), edge("gateway", "deploy"), edge("gateway", "retrain"),
+                  edge("retrain", "report")],
+    }
+    ran = []
+    executor = DagExecutor(lambda node, model, variables: ran.append(node["id"]) or {"score": 0.8}, max_workers=2)
+    report = executor.run(graph)
+
+    assert report["success"]
+    assert statuses(report) == {"train": "done", "gateway": "done", "deploy": "done", "retrain": "skipped", "report": "skipped"}
+    assert sorted(ran) == ["deploy", "train"]
+
+
+def test_join_runs_once_any_of_its_branches_was_taken():
+    graph = {
+        "nodes": [task("start"), task("fast"), task("slow"), task("join")],
+        "edges": [edge("start", "fast", "conditional", "mode == 'fast'"),
+                  edge("start", "slow", "conditional", "mode == 'slow'"),
+                  edge("fast", "join"), edge("slow", "join")],
+    }
+    report = DagExecutor(max_workers=2).run(graph, {"mode": "slow"})
+    assert statuses(report) == {"start": "done", "fast": "skipped", "slow": "done", "join": "done"}
+    assert report["critical_path"]["nodes"] == ["start", "slow", "join"]
+
+
+def test_failed_task_follows_its_exceptional_links():
+    def run(node, model, variables):
+        if node["id"] == "train":
+            raise RuntimeError("out of memory")
+        return {}
+
+    graph = {
+        "nodes": [task("train"), task("next"), task("recover")],
+        "edges": [edge("train", "next"), edge("train", "recover", "exceptional")],
+    }
+    report = DagExecutor(run).run(graph)
+    assert report["success"]
+    assert statuses(report) == {"train": "failed", "next": "skipped", "recover": "done"}
+
+
+def test_invalid_gateway_condition_stops_the_run():
+    graph = {
+        "nodes": [task("train"), exclusive_gateway("gateway", [("deploy", "score ** 2 > 1"), ("retrain", "else")]),
+                  task("deploy"), task("retrain")],
+        "edges": [edge("train", "gateway"), edge("gateway", "deploy"), edge("gateway", "retrain")],
+    }
+    report = DagExecutor(lambda node, model, variables: {"score": 2}).run(graph)
+    assert not report["success"]
+    assert "score ** 2" in report["error"]
+    assert statuses(report)["deploy"] != "done"
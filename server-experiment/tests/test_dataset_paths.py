@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from services.datasets import ColumnCache, DatasetRegistry, resolve_data_path
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "volume.csv").write_text("a,b\n1,2\n", encoding="utf-8")
+    (data / ".columns").mkdir()
+    (data / ".columns" / "hidden.csv").write_text("a\n1\n", encoding="utf-8")
+    (tmp_path / "secret.csv").write_text("password\nhunter2\n", encoding="utf-8")
+    os.symlink(tmp_path / "secret.csv", data / "link.csv")
+    return data
+
+
+@pytest.mark.parametrize("file_name", [
+    "../secret.csv",
+    "../../etc/passwd",
+    "/etc/passwd",
+    "link.csv",
+    ".columns/hidden.csv",
+    ".registry.json",
+    "",
+    ".",
+])
+def test_names_outside_the_data_directory_are_rejected(data_path, file_name):
+    assert resolve_data_path(data_path, file_name) is None
+    assert DatasetRegistry(str(data_path)).get(file_name) is None
+    with pytest.raises(FileNotFoundError):
+        ColumnCache(str(data_path)).get_columns(file_name)
+
+
+def test_rejected_names_are_not_indexed(data_path):
+    DatasetRegistry(str(data_path)).get("../secret.csv")
+    registry_file = data_path / ".registry.json"
+    assert not registry_file.exists() or "secret" not in registry_file.read_text(encoding="utf-8")
+
+
+def test_names_inside_the_data_directory_resolve(data_path):
+    assert resolve_data_path(data_path, "volume.csv") == os.path.realpath(data_path / "volume.csv")
+    assert resolve_data_path(data_path, "sub/../volume.csv") == os.path.realpath(data_path / "volume.csv")
+    # outputs do not exist yet
+    assert resolve_data_path(data_path, "output.csv") == os.path.realpath(data_path / "output.csv")
+    assert DatasetRegistry(str(data_path)).get("volume.csv")["rows"] == 1
@@ -0,0 +1,52 @@
+import json
+import threading
+
+import pytest
+
+from services.datasets import DatasetRegistry
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    for index in range(8):
+        (data / f"d{index}.csv").write_text("a,b\n" + f"{index},2\n" * (index + 1), encoding="utf-8")
+    return data
+
+
+def saved_names(data_path):
+    with open(data_path / ".registry.json", encoding="utf-8") as f:
+        return sorted(entry["name"] for entry in json.load(f))
+
+
+def test_registries_sharing_the_index_file_keep_each_others_entries(data_path):
+    # like the runner workers, every registry is created before the others saved
+    registries = [DatasetRegistry(str(data_path)) for _ in range(8)]
+    threads = [threading.Thread(target=registry.get, args=(f"d{index}.csv",)) for index, registry in enumerate(registries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert saved_names(data_path) == [f"d{index}.csv" for index in range(8)]
+    assert not [path.name for path in data_path.iterdir() if path.name.endswith(".tmp")]
+    assert DatasetRegistry(str(data_path)).get("d3.csv")["rows"] == 4
+
+
+def test_removed_entries_are_not_taken_back_from_the_file(data_path):
+    registry = DatasetRegistry(str(data_path))
+    registry.refresh()
+    (data_path / "d0.csv").unlink()
+    assert registry.refresh()["removed"] == ["d0.csv"]
+
+    assert "d0.csv" not in saved_names(data_path)
+    assert "d0.csv" not in [entry["name"] for entry in registry.list()]
+
+
+def test_unwritable_index_file_keeps_the_index_in_memory(data_path, tmp_path):
+    (tmp_path / "blocked").write_text("", encoding="utf-8")
+    registry = DatasetRegistry(str(data_path), index_path=str(tmp_path / "blocked" / "registry.json"))
+
+    assert registry.get("d1.csv")["rows"] == 2
+    assert registry.get_columns("d1.csv") == ["a", "b"]
@@ -0,0 +1,78 @@
+import ast
+import re
+
+import pytest
+
+from conftest import SRC_PATH
+from services.dsl import DslSyntaxError, dsl2experiment, dsl2workflow, experiment2dsl, workflow2dsl
+
+_SHELL_LITERAL = re.compile(r"(?:NumberInt|NumberLong|ObjectId|UUID)\(\s*([^()]*?)\s*\)")
+_JSON_CONSTANTS = {"true": "True", "false": "False", "null": "None"}
+
+
+def load_examples(file_name):
+    """
+    Load the documents of a mongo shell export. Its NumberInt/ObjectId/UUID literals become
+    plain values, and documents pasted as Python reprs or nested in lists are accepted too.
+    """
+    text = (SRC_PATH / "handlers" / file_name).read_text(encoding="utf-8")
+    text = _SHELL_LITERAL.sub(r"\1", text)
+    text = re.sub(r"\b(true|false|null)\b", lambda match: _JSON_CONSTANTS[match.group(1)], text)
+    documents = []
+    pending = [ast.literal_eval(text)]
+    while pending:
+        value = pending.pop(0)
+        if isinstance(value, list):
+            pending[:0] = value
+        else:
+            documents.append(value)
+    return documents
+
+
+WORKFLOWS = load_examples("wf_example.json")
+EXPERIMENTS = load_examples("exp_example.json")
+
+
+@pytest.mark.parametrize("workflow", WORKFLOWS, ids=[workflow["name"] for workflow in WORKFLOWS])
+def test_workflow_round_trip(workflow):
+    dsl = workflow2dsl(workflow["name"], workflow["graphical_model"])
+    assert dsl2workflow(workflow["name"], dsl) == workflow["graphical_model"]
+
+
+@pytest.mark.parametrize("experiment", EXPERIMENTS, ids=[experiment["name"] for experiment in EXPERIMENTS])
+def test_experiment_round_trip(experiment):
+    dsl = experiment2dsl(experiment["name"], experiment["steps"])
+    assert dsl2experiment(experiment["name"], dsl) == experiment["steps"]
+
+
+@pytest.mark.parametrize("dsl", [
+    "workflow W { define task A; ",
+    "workflow W { define task A }",
+    "workflow W { define task A; START -> A -> ; }",
+    'workflow W { define task A; configure task A { description "unterminated; } }',
+    "workflow W { define task A; } }",
+    "workflow W { define task A; # }",
+    "workflow W { define task A; configure task B { } }",
+    "workflow W { define task A; START -> B; }",
+])
+def test_workflow_syntax_errors(dsl):
+    with pytest.raises(DslSyntaxError):
+        dsl2workflow("W", dsl)
+
+
+@pytest.mark.parametrize("dsl", [
+    "experiment E { bogus; }",
+    "experiment E { step s { space S of { } } }",
+    'experiment E { step s { space "S" of "w" { strategy; } } }',
+    "experiment E { space S of ",
+    "experiment E { } }",
+])
+def test_experiment_syntax_errors(dsl):
+    with pytest.raises(DslSyntaxError):
+        dsl2experiment("E", dsl)
+
+
+def test_syntax_error_reports_the_line():
+    with pytest.raises(DslSyntaxError) as error:
+        dsl2workflow("W", "workflow W {\n  define task A;\n  A -> ;\n}")
+    assert error.value.line == 3
@@ -0,0 +1,107 @@
+import types
+
+import pytest
+
+from services.file_watcher import event_registry
+from services.file_watcher import get_event_registry_stats, register_api_event, should_ignore_event
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(event_registry, "_expected_writes", {})
+    monkeypatch.setattr(event_registry, "_expiry_heap", [])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # the clock of the registry only, the threads of other tests keep the real one
+    monkeypatch.setattr(event_registry, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def write_file(tmp_path, name, content):
+    path = tmp_path / "alice" / "experiments" / f"{name}.xxp"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_write_is_ignored_only_while_the_file_holds_the_api_content(tmp_path):
+    path = write_file(tmp_path, "exp", "written by the api")
+    register_api_event('modify', "alice", "experiments", "exp", content="written by the api")
+
+    assert should_ignore_event('modify', "alice", "experiments", "exp", path)
+    # one write produces several events, all of them are ignored
+    assert should_ignore_event('modify', "alice", "experiments", "exp", path)
+
+    write_file(tmp_path, "exp", "edited outside")
+    assert not should_ignore_event('modify', "alice", "experiments", "exp", path)
+
+
+def test_write_without_content_ignores_any_content(tmp_path):
+    path = write_file(tmp_path, "exp", "anything")
+    register_api_event('create', "alice", "experiments", "exp")
+    assert should_ignore_event('create', "alice", "experiments", "exp", path)
+
+
+def test_deletion_is_ignored_only_while_the_file_is_absent(tmp_path):
+    path = write_file(tmp_path, "exp", "one")
+    register_api_event('delete', "alice", "experiments", "exp")
+
+    # recreated outside the api
+    assert not should_ignore_event('delete', "alice", "experiments", "exp", path)
+    assert not should_ignore_event('create', "alice", "experiments", "exp", path)
+    (tmp_path / "alice" / "experiments" / "exp.xxp").unlink()
+    assert should_ignore_event('delete', "alice", "experiments", "exp", path)
+
+
+def test_rename_expects_the_old_name_absent_and_the_content_under_the_new_one(tmp_path):
+    path = write_file(tmp_path, "new", "content")
+    register_api_event('rename', "alice", "experiments", "old", content="content", new_file_name="new")
+
+    assert should_ignore_event('rename', "alice", "experiments", "new", path)
+    assert should_ignore_event('delete', "alice", "experiments", "old", str(tmp_path / "alice" / "experiments" / "old.xxp"))
+    assert not should_ignore_event('modify', "alice", "experiments", "old", path)
+
+
+def test_unregistered_events_are_processed(tmp_path):
+    path = write_file(tmp_path, "exp", "one")
+    before = get_event_registry_stats()["unexpected"]
+    assert not should_ignore_event('modify', "alice", "experiments", "exp", path)
+    assert get_event_registry_stats()["unexpected"] == before + 1
+
+
+def test_expectations_expire(tmp_path, clock):
+    path = write_file(tmp_path, "exp", "one")
+    register_api_event('modify', "alice", "experiments", "exp", content="one")
+    clock[0] += event_registry._IGNORE_EXPIRY_SECONDS - 1
+    assert should_ignore_event('modify', "alice", "experiments", "exp", path)
+
+    expired = get_event_registry_stats()["expired"]
+    clock[0] += 2
+    assert not should_ignore_event('modify', "alice", "experiments", "exp", path)
+    stats = get_event_registry_stats()
+    assert stats["expired"] == expired + 1 and stats["expected"] == 0
+
+
+def test_registering_again_extends_the_expiry(tmp_path, clock):
+    path = write_file(tmp_path, "exp", "two")
+    register_api_event('modify', "alice", "experiments", "exp", content="one")
+    clock[0] += event_registry._IGNORE_EXPIRY_SECONDS - 1
+    register_api_event('modify', "alice", "experiments", "exp", content="two")
+    clock[0] += 2
+    assert should_ignore_event('modify', "alice", "experiments", "exp", path)
+
+
+def test_oldest_expectations_are_evicted_beyond_the_limit(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(event_registry, "_MAX_EXPECTED_WRITES", 3)
+    evicted = get_event_registry_stats()["evicted"]
+    for index in range(5):
+        clock[0] += 1
+        register_api_event('create', "alice", "experiments", f"exp{index}")
+
+    stats = get_event_registry_stats()
+    assert stats["expected"] == 3 and stats["evicted"] == evicted + 2
+    assert not should_ignore_event('create', "alice", "experiments", "exp0", write_file(tmp_path, "exp0", ""))
+    assert should_ignore_event('create', "alice", "experiments", "exp4", write_file(tmp_path, "exp4", ""))
@@ -0,0 +1,119 @@
+import importlib.util
+import io
+import os
+import sys
+import types
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from flask import Flask
+
+SRC = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+
+
+def load(name, relative_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SRC, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def execution(tmp_path, monkeypatch):
+    """The execution handler module, loaded on its own with its data directory in tmp_path."""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "values.csv").write_text("a,b\n1,x\n2,y\n4,z\n", encoding="utf-8")
+    (tmp_path / "work").mkdir()
+    # the data directory is ../data, relative to the working directory of the service
+    monkeypatch.chdir(tmp_path / "work")
+    return load("execution_handler", os.path.join("handlers", "executionHandler.py"))
+
+
+@pytest.fixture
+def client(execution, monkeypatch):
+    # the handlers package connects to the databases on import, the results route only needs this one
+    monkeypatch.setitem(sys.modules, "handlers", types.SimpleNamespace(
+        taskHandler=None, experimentHandler=None, convertorHandler=None, executionHandler=execution.executionHandler,
+    ))
+    controller = load("tasks_controller", os.path.join("controllers", "tasks_controller.py"))
+    app = Flask(__name__)
+    app.register_blueprint(controller.tasks, url_prefix="/tasks")
+    return app.test_client()
+
+
+def graphical_model(output_name, output_format=None):
+    output = {"name": output_name, "field": "total,largest"}
+    if output_format:
+        output["format"] = output_format
+    return {"nodes": [
+        {"type": "task", "data": {"operations": ["sum", "max"]}},
+        {"type": "data", "data": {"name": "values.csv", "field": "a"}},
+        {"type": "data", "data": output},
+    ]}
+
+
+@pytest.mark.parametrize("output_name,output_format,expected", [
+    ("out.csv", None, "csv"),
+    ("out.parquet", None, "parquet"),
+    ("out.feather", None, "arrow"),
+    ("out.ARROW", None, "arrow"),
+    ("out.bin", "parquet", "parquet"),
+    ("out", None, "csv"),
+])
+def test_output_format_follows_the_extension_or_the_data_node(execution, output_name, output_format, expected):
+    assert execution.ExecutionPlan.from_graphical_model(graphical_model(output_name, output_format)).output_format == expected
+
+
+def test_unsupported_output_format_is_rejected(execution):
+    with pytest.raises(ValueError):
+        execution.ExecutionPlan.from_graphical_model(graphical_model("out.xlsx", "xlsx"))
+
+
+@pytest.mark.parametrize("output_name,read", [
+    ("out.csv", pd.read_csv),
+    ("out.parquet", pd.read_parquet),
+    ("out.arrow", pd.read_feather),
+])
+def test_outputs_hold_the_results(execution, tmp_path, output_name, read):
+    result = execution.executionHandler.execute_experiment(graphical_model(output_name))
+
+    assert result["verified"] and result["filename"] == output_name
+    frame = read(tmp_path / "data" / output_name)
+    assert frame.to_dict("records") == [{"total": 7, "largest": 4}]
+
+
+def test_arrow_output_is_uncompressed(execution, tmp_path):
+    execution.executionHandler.execute_experiment(graphical_model("out.arrow"))
+    with pa.memory_map(str(tmp_path / "data" / "out.arrow")) as source:
+        allocated = pa.total_allocated_bytes()
+        table = pa.ipc.open_file(source).read_all()
+        # read in place, compressed columns would be decompressed into new buffers
+        assert pa.total_allocated_bytes() == allocated
+        assert table.column("total").to_pylist() == [7]
+    assert execution.ExecutionHandler.get_output_mimetype("out.arrow") == "application/vnd.apache.arrow.file"
+
+
+def test_results_are_served_whole_and_by_range(execution, client, tmp_path):
+    execution.executionHandler.execute_experiment(graphical_model("out.parquet"))
+    content = (tmp_path / "data" / "out.parquet").read_bytes()
+
+    response = client.get("/tasks/exp/execute/results/out.parquet")
+    assert response.status_code == 200 and response.data == content
+    assert response.mimetype == "application/vnd.apache.parquet"
+
+    response = client.get("/tasks/exp/execute/results/out.parquet", headers={"Range": "bytes=4-11"})
+    assert response.status_code == 206 and response.data == content[4:12]
+    assert response.headers["Content-Range"] == f"bytes 4-11/{len(content)}"
+
+    # the footer of a Parquet file, read first by remote readers
+    response = client.get("/tasks/exp/execute/results/out.parquet", headers={"Range": "bytes=-8"})
+    assert response.status_code == 206 and response.data == content[-8:]
+    assert pd.read_parquet(io.BytesIO(content)).to_dict("records") == [{"total": 7, "largest": 4}]
+
+
+@pytest.mark.parametrize("file_name", ["missing.csv", ".results/x.json"])
+def test_results_outside_the_outputs_are_not_found(client, tmp_path, file_name):
+    (tmp_path / "data" / ".results").mkdir(exist_ok=True)
+    (tmp_path / "data" / ".results" / "x.json").write_text("{}", encoding="utf-8")
+    assert client.get(f"/tasks/exp/execute/results/{file_name}").status_code == 404
@@ -0,0 +1,110 @@
+import time
+
+from services.experiment_runs import ExperimentRunner
+from services.experiment_runs.runner import apply_point
+
+WORKFLOW = {
+    "nodes": [
+        {"id": "t1", "type": "task", "data": {"currentVariant": "v2", "variants": [
+            {"id_task": "v1", "name": "train", "parameters": [{"name": "operation"}]},
+            {"id_task": "v2", "name": "train", "parameters": [{"name": "operation"}, {"name": "depth"}], "graphical_model": {
+                "nodes": [{"id": "s1", "type": "task", "data": {"variants": [
+                    {"id_task": "sv1", "name": "inner", "parameters": [{"name": "depth"}]},
+                ]}}],
+            }},
+        ]}},
+        {"id": "d1", "type": "data", "data": {"name": "volume.csv"}},
+    ],
+}
+
+
+def space(name, values):
+    return {"name": name, "searchMethod": "grid", "workflow_id": "w", "steps": [
+        {"name": "train", "tasks": [{"selected": True, "hyperParameters": [{"name": "operation", "values": values}]}]},
+    ]}
+
+
+def record_evaluation(graphical_model, point, budget):
+    """Evaluates nothing, runs in the worker processes of the tests."""
+    return {"verified": True, "error": None, "metrics": {"started": time.time()}, "duration": 0.0}
+
+
+def test_apply_point_sets_the_selected_variant_parameters():
+    applied = apply_point(WORKFLOW, {"operation": "max", "inner_depth": 3, "depth": 5})
+    variants = applied["nodes"][0]["data"]["variants"]
+    assert variants[1]["parameters"] == [{"name": "operation", "value": "max"}, {"name": "depth", "value": 5}]
+    # a parameter of a task keyed <task>_<name> takes precedence over the shared name
+    assert variants[1]["graphical_model"]["nodes"][0]["data"]["variants"][0]["parameters"] == [{"name": "depth", "value": 3}]
+    # other variants and the original graph are left alone
+    assert variants[0]["parameters"] == [{"name": "operation"}]
+    assert WORKFLOW["nodes"][0]["data"]["variants"][1]["parameters"] == [{"name": "operation"}, {"name": "depth"}]
+
+
+def test_steps_run_in_execution_order_from_zero():
+    runner = ExperimentRunner(lambda workflow_id: WORKFLOW, evaluate=record_evaluation, max_workers=2)
+    runner.start()
+    try:
+        run = runner.submit("exp", {"steps": [
+            {"name": "last", "spaces": [space("c", ["min"])]},
+            {"name": "second", "executionOrder": 1, "spaces": [space("b", ["max"])]},
+            {"name": "first", "executionOrder": 0, "spaces": [space("a", ["mean", "sum"])]},
+        ]})
+        deadline = time.time() + 60
+        while run["status"] == "running" and time.time() < deadline:
+            run = runner.wait_for_update(run["id"], run["version"], 1)
+    finally:
+        runner.stop()
+
+    assert run["status"] == "done"
+    started = {step["name"]: min(result["metrics"]["started"] for result in step["spaces"][0]["results"])
+               for step in run["steps"]}
+    assert started["first"] < started["second"] < started["last"]
+    points = [result["point"]["operation"] for result in run["steps"][2]["spaces"][0]["results"]]
+    assert sorted(points) == ["mean", "sum"]
+
+
+SHARED_WORKFLOW = {
+    "nodes": [
+        {"id": "t1", "type": "task", "data": {"variants": [
+            {"id_task": "v1", "name": "train", "parameters": [{"name": "depth"}]},
+        ]}},
+        {"id": "t2", "type": "task", "data": {"variants": [
+            {"id_task": "v2", "name": "score", "parameters": [{"name": "depth"}, {"name": "metric"}]},
+        ]}},
+    ],
+}
+
+
+def applied_parameters(graphical_model, point, budget):
+    """The parameter values the point sets on the workflow, as metrics."""
+    applied = apply_point(graphical_model, point)
+    metrics = {
+        f"{variant['name']}.{parameter['name']}": parameter.get("value")
+        for node in applied["nodes"] for variant in node["data"]["variants"] for parameter in variant["parameters"]
+    }
+    return {"verified": True, "error": None, "metrics": metrics, "duration": 0.0}
+
+
+def test_parameters_shared_by_tasks_take_their_own_values():
+    shared_space = {"name": "s", "searchMethod": "grid", "workflow_id": "w", "steps": [
+        {"name": "Train step", "tasks": [{"name": "train", "selected": True, "hyperParameters": [
+            {"name": "depth", "values": [1, 2]}]}]},
+        {"name": "Score step", "tasks": [{"name": "score", "selected": True, "hyperParameters": [
+            {"name": "depth", "values": [10]}, {"name": "metric", "values": ["f1"]}]}]},
+    ]}
+    runner = ExperimentRunner(lambda workflow_id: SHARED_WORKFLOW, evaluate=applied_parameters, max_workers=2)
+    runner.start()
+    try:
+        run = runner.submit("exp", {"steps": [{"name": "only", "spaces": [shared_space]}]})
+        deadline = time.time() + 60
+        while run["status"] == "running" and time.time() < deadline:
+            run = runner.wait_for_update(run["id"], run["version"], 1)
+    finally:
+        runner.stop()
+
+    results = run["steps"][0]["spaces"][0]["results"]
+    assert sorted(result["point"]["train_depth"] for result in results) == [1, 2]
+    for result in results:
+        assert result["metrics"]["train.depth"] == result["point"]["train_depth"]
+        assert result["metrics"]["score.depth"] == 10
+        assert result["metrics"]["score.metric"] == "f1"
@@ -0,0 +1,114 @@
+import json
+import queue
+import threading
+import time
+
+import pytest
+
+from services.conversion_jobs import ConversionJobQueue
+from services.conversion_jobs.job_queue import JOB_DONE, JOB_QUEUED
+
+
+class Convertor:
+    def __init__(self, gate=None):
+        self.gate = gate
+
+    def convert(self, exp, progress=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        return {"success": True, "data": {"id_experiment": exp["id_experiment"]}}
+
+
+def saved_job(job_id, status, submitted_at, finished_at=None):
+    return {
+        "id": job_id,
+        "key": f"key-{job_id}",
+        "exp_id": job_id,
+        "status": status,
+        "stage": status,
+        "progress": 1.0 if finished_at else 0.0,
+        "submitted_at": submitted_at,
+        "started_at": finished_at,
+        "finished_at": finished_at,
+        "duration": 0.0 if finished_at else None,
+        "result": None,
+        "error": None,
+        "version": 1,
+        "experiment": None if finished_at else {"id_experiment": job_id},
+    }
+
+
+def write_jobs(jobs_path, jobs):
+    jobs_path.mkdir(exist_ok=True)
+    for job in jobs:
+        (jobs_path / f"{job['id']}.json").write_text(json.dumps(job), encoding="utf-8")
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_saved_jobs_beyond_max_pending_are_all_requeued(tmp_path):
+    jobs_path = tmp_path / "jobs"
+    write_jobs(jobs_path, [saved_job(f"job{i}", JOB_QUEUED, submitted_at=i) for i in range(5)])
+
+    gate = threading.Event()
+    job_queue = ConversionJobQueue(str(jobs_path), lambda: Convertor(gate), workers=1, max_pending=2)
+    job_queue.start()
+    try:
+        with pytest.raises(queue.Full):
+            job_queue.submit({"id_experiment": "new"})
+        gate.set()
+        assert wait_until(lambda: job_queue.get_stats()["jobs_done"] == 5)
+        assert job_queue.submit({"id_experiment": "new"})["status"] == JOB_QUEUED
+    finally:
+        gate.set()
+        job_queue.stop()
+
+
+def test_finished_jobs_past_max_finished_are_pruned_at_start(tmp_path):
+    jobs_path = tmp_path / "jobs"
+    now = time.time()
+    write_jobs(jobs_path, [saved_job(f"job{i}", JOB_DONE, submitted_at=now + i, finished_at=now + i) for i in range(5)])
+
+    job_queue = ConversionJobQueue(str(jobs_path), Convertor, workers=1, max_finished=2)
+    job_queue.start()
+    try:
+        assert [job_queue.get_job(f"job{i}") is not None for i in range(5)] == [False, False, False, True, True]
+        assert sorted(path.stem for path in jobs_path.glob("*.json")) == ["job3", "job4"]
+    finally:
+        job_queue.stop()
+
+
+def test_expired_finished_jobs_are_pruned_from_memory_and_disk(tmp_path):
+    jobs_path = tmp_path / "jobs"
+    job_queue = ConversionJobQueue(str(jobs_path), Convertor, workers=1, finished_ttl_seconds=0)
+    job_queue.start()
+    try:
+        job = job_queue.submit({"id_experiment": "exp"})
+        assert wait_until(lambda: job_queue.get_job(job["id"]) is None)
+        assert wait_until(lambda: list(jobs_path.glob("*.json")) == [])
+        time.sleep(0.1)
+        assert list(jobs_path.glob("*.json")) == []
+    finally:
+        job_queue.stop()
+
+
+def test_job_file_holds_the_latest_version(tmp_path):
+    jobs_path = tmp_path / "jobs"
+    job_queue = ConversionJobQueue(str(jobs_path), Convertor, workers=2)
+    job_queue.start()
+    try:
+        job = job_queue.submit({"id_experiment": "exp"})
+        assert wait_until(lambda: job_queue.get_job(job["id"])["status"] == JOB_DONE)
+        saved = json.loads((jobs_path / f"{job['id']}.json").read_text(encoding="utf-8"))
+        assert saved["status"] == JOB_DONE
+        assert saved["version"] == job_queue.get_job(job["id"])["version"]
+        assert saved["experiment"] is None
+    finally:
+        job_queue.stop()
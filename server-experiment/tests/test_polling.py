@@ -0,0 +1,128 @@
+import os
+
+import pytest
+from watchdog.observers.api import EventQueue, ObservedWatch
+
+from services.file_watcher import WorkspacePollingEmitter
+from services.file_watcher.shards import shard_of
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    workspace = tmp_path / "workspace"
+    for user in ("alice", "bob"):
+        (workspace / user / "experiments").mkdir(parents=True)
+        (workspace / user / "workflows").mkdir(parents=True)
+    (workspace / "alice" / "results").mkdir()
+    write(workspace / "alice" / "experiments" / "exp.xxp", "one")
+    return workspace
+
+
+def write(path, content, mtime_ns=None):
+    path.write_text(content, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+class Poller:
+    """Drives an emitter by hand, one poll at a time, and collects its events."""
+
+    def __init__(self, workspace, **kwargs):
+        self.queue = EventQueue()
+        self.emitter = WorkspacePollingEmitter(self.queue, ObservedWatch(str(workspace), recursive=False), **kwargs)
+        # the state at start is the baseline
+        self.emitter.on_thread_start()
+
+    def poll(self):
+        self.emitter._poll(emit=True)
+        return self.events()
+
+    def events(self):
+        events = []
+        while not self.queue.empty():
+            event, _ = self.queue.get_nowait()
+            events.append((event.event_type, event.src_path, getattr(event, "dest_path", "")))
+        return sorted(events)
+
+
+def test_baseline_is_not_reported(workspace):
+    assert Poller(workspace).poll() == []
+
+
+def test_creations_and_deletions_are_reported(workspace):
+    poller = Poller(workspace)
+    created = write(workspace / "bob" / "workflows" / "flow.xxp", "one")
+    os.remove(workspace / "alice" / "experiments" / "exp.xxp")
+    # neither other files nor other directories are watched
+    write(workspace / "bob" / "workflows" / "notes.txt", "")
+    write(workspace / "alice" / "results" / "out.xxp", "")
+
+    assert poller.poll() == [
+        ("created", created, ""),
+        ("deleted", str(workspace / "alice" / "experiments" / "exp.xxp"), ""),
+    ]
+    assert poller.poll() == []
+
+
+def test_renames_and_moves_are_reported_as_moves(workspace):
+    poller = Poller(workspace)
+    source = workspace / "alice" / "experiments" / "exp.xxp"
+    renamed = workspace / "alice" / "experiments" / "renamed.xxp"
+    os.rename(source, renamed)
+    assert poller.poll() == [("moved", str(source), str(renamed))]
+
+    moved = workspace / "bob" / "experiments" / "renamed.xxp"
+    os.rename(renamed, moved)
+    assert poller.poll() == [("moved", str(renamed), str(moved))]
+
+
+def test_writes_in_place_are_found_by_the_sweep(workspace):
+    path = workspace / "alice" / "experiments" / "exp.xxp"
+    unswept = Poller(workspace, sweep_seconds=0)
+    swept = Poller(workspace, sweep_seconds=1)
+
+    write(path, "two", mtime_ns=2_000_000_000)
+    # in place: the listing of the directory did not change, the sweep checks a directory per poll
+    polls = len(swept.emitter._sweep)
+    assert [event for _ in range(polls) for event in unswept.poll()] == []
+    assert [event for _ in range(polls) for event in swept.poll()] == [("modified", str(path), "")]
+
+
+def test_directories_with_recent_changes_are_checked_on_every_poll(workspace):
+    poller = Poller(workspace, sweep_seconds=0)
+    created = write(workspace / "alice" / "experiments" / "new.xxp", "one")
+    assert poller.poll() == [("created", created, "")]
+
+    write(workspace / "alice" / "experiments" / "exp.xxp", "two, longer")
+    assert poller.poll() == [("modified", str(workspace / "alice" / "experiments" / "exp.xxp"), "")]
+
+
+def test_new_users_and_type_directories_are_picked_up(workspace):
+    poller = Poller(workspace)
+    (workspace / "carol" / "experiments").mkdir(parents=True)
+    assert poller.poll() == []
+
+    created = write(workspace / "carol" / "experiments" / "exp.xxp", "one")
+    assert poller.poll() == [("created", created, "")]
+
+
+def test_every_shard_polls_its_own_users(workspace):
+    shards = [Poller(workspace, shard=shard, shards=2) for shard in range(2)]
+    paths = {user: write(workspace / user / "workflows" / "flow.xxp", "one") for user in ("alice", "bob")}
+
+    for shard, poller in enumerate(shards):
+        assert poller.poll() == sorted(("created", path, "") for user, path in paths.items() if shard_of(user, 2) == shard)
+
+
+def test_interval_backs_off_while_nothing_changes(workspace):
+    poller = Poller(workspace, min_interval=0.001, max_interval=0.004)
+    intervals = []
+    for _ in range(4):
+        poller.emitter.queue_events(0)
+        intervals.append(poller.emitter.get_stats()["interval"])
+    assert intervals == [0.002, 0.004, 0.004, 0.004]
+
+    write(workspace / "bob" / "workflows" / "flow.xxp", "one")
+    poller.emitter.queue_events(0)
+    assert poller.emitter.get_stats()["interval"] == 0.001
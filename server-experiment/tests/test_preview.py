@@ -0,0 +1,64 @@
+from collections import Counter
+
+import pytest
+
+from services.datasets import preview_csv
+
+ROWS = 100
+
+
+@pytest.fixture
+def data_csv(tmp_path):
+    path = tmp_path / "data.csv"
+    # equally long lines, so the offset sampler is uniform too
+    path.write_text("id,name\n" + "".join(f"{index:03d},row{index:03d}\n" for index in range(ROWS)), encoding="utf-8")
+    return path
+
+
+def ids(rows):
+    return [int(row[0]) for row in rows]
+
+
+@pytest.mark.parametrize("exact_limit_bytes,method", [(1 << 20, "reservoir"), (0, "offsets")])
+def test_preview_has_the_header_first_rows_and_a_sample_in_file_order(data_csv, exact_limit_bytes, method):
+    preview = preview_csv(str(data_csv), head_rows=3, sample_rows=10, seed=1, exact_limit_bytes=exact_limit_bytes)
+
+    assert preview["method"] == method
+    assert preview["columns"] == ["id", "name"]
+    assert preview["head"] == [["000", "row000"], ["001", "row001"], ["002", "row002"]]
+    assert not preview["complete"] and preview["size"] == data_csv.stat().st_size
+    sample = ids(preview["sample"])
+    assert sample == sorted(set(sample)) and 0 < len(sample) <= 10
+    assert all(row == [f"{index:03d}", f"row{index:03d}"] for index, row in zip(sample, preview["sample"]))
+
+
+@pytest.mark.parametrize("exact_limit_bytes", [1 << 20, 0])
+def test_same_seed_gives_the_same_sample(data_csv, exact_limit_bytes):
+    samples = [preview_csv(str(data_csv), sample_rows=10, seed=seed, exact_limit_bytes=exact_limit_bytes)["sample"] for seed in (7, 7, 8)]
+    assert samples[0] == samples[1] != samples[2]
+
+
+@pytest.mark.parametrize("exact_limit_bytes", [1 << 20, 0])
+def test_rows_are_sampled_uniformly(data_csv, exact_limit_bytes):
+    counts = Counter()
+    for seed in range(1000):
+        counts.update(ids(preview_csv(str(data_csv), head_rows=0, sample_rows=10, seed=seed, exact_limit_bytes=exact_limit_bytes)["sample"]))
+
+    # every row is expected 100 times
+    assert set(counts) == set(range(ROWS))
+    assert 50 < min(counts.values()) and max(counts.values()) < 150
+
+
+def test_small_file_is_sampled_whole(tmp_path):
+    path = tmp_path / "small.csv"
+    path.write_text("a\n1\n\n2\n3\n", encoding="utf-8")
+    preview = preview_csv(str(path), head_rows=20, sample_rows=20)
+    assert preview["head"] == preview["sample"] == [["1"], ["2"], ["3"]]
+    assert preview["complete"]
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("", encoding="utf-8")
+    preview = preview_csv(str(path))
+    assert (preview["columns"], preview["head"], preview["sample"], preview["complete"]) == ([], [], [], True)
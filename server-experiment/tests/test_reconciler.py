@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+
+from services.file_watcher import ContentIndex, KeyedWorkerPool
+from services.file_watcher.reconciler import WorkspaceReconciler
+
+
+class FakeSyncHandler:
+    """Records the files synchronized and removed, and the threads doing it."""
+
+    def __init__(self, content_index):
+        self.content_index = content_index
+        self.synced = []
+        self.removed = []
+        self.threads = set()
+        self.worker_pool = KeyedWorkerPool(lambda item: None, workers=2)
+        self.worker_pool.start()
+
+    def sync_files(self, file_paths, fingerprints=None):
+        self.threads.add(threading.current_thread().name)
+        self.synced.extend(file_paths)
+        self.content_index.record_many({path: fingerprints[path] for path in file_paths})
+        return [{"path": path, "success": True, "error": None} for path in file_paths]
+
+    def remove_files(self, file_paths):
+        self.threads.add(threading.current_thread().name)
+        self.removed.extend(file_paths)
+        self.content_index.forget_many(file_paths)
+
+
+def write_file(workspace, name, content):
+    path = workspace / "alice" / "experiments" / f"{name}.xxp"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def fingerprint(path):
+    return ContentIndex.fingerprint(path, os.stat(path))
+
+
+def make_reconciler(tmp_path):
+    workspace = tmp_path / "workspace"
+    index = ContentIndex(str(tmp_path / "index.db"))
+    handler = FakeSyncHandler(index)
+    return workspace, index, handler, WorkspaceReconciler(str(workspace), handler, index, workers=2, batch_size=2)
+
+
+def test_differences_are_applied_on_the_worker_pool(tmp_path):
+    workspace, index, handler, reconciler = make_reconciler(tmp_path)
+    try:
+        unchanged = write_file(workspace, "unchanged", "one")
+        index.record(unchanged, fingerprint(unchanged))
+        modified = write_file(workspace, "modified", "one")
+        index.record(modified, fingerprint(modified))
+        write_file(workspace, "modified", "two, longer")
+        added = write_file(workspace, "added", "one")
+        removed = str(workspace / "alice" / "experiments" / "removed.xxp")
+        index.record(removed, index.get(unchanged))
+
+        report = reconciler.run()
+
+        assert report["status"] == "done"
+        assert (report["unchanged"], report["added"], report["modified"], report["removed"]) == (1, 1, 1, 1)
+        assert (report["failed"], report["skipped"]) == (0, 0)
+        assert sorted(handler.synced) == sorted([added, modified])
+        assert handler.removed == [removed]
+        assert all(name.startswith("watcher-worker") for name in handler.threads)
+        assert index.lookup(modified)[1] and index.get(removed) is None
+    finally:
+        handler.worker_pool.stop()
+
+
+def test_changes_applied_by_the_watcher_since_the_scan_are_kept(tmp_path):
+    workspace, index, handler, reconciler = make_reconciler(tmp_path)
+    gate = threading.Event()
+    try:
+        modified = write_file(workspace, "modified", "one")
+        index.record(modified, fingerprint(modified))
+        write_file(workspace, "modified", "two, longer")
+        recreated = str(workspace / "alice" / "experiments" / "recreated.xxp")
+        index.record(recreated, index.get(modified))
+
+        # a live change of both files, queued before the reconciler's batches
+        handler.worker_pool.submit([modified, recreated], None, lambda item: gate.wait(5))
+        thread = threading.Thread(target=reconciler.run)
+        thread.start()
+        deadline = time.time() + 5
+        while handler.worker_pool.get_stats()["queue_depth"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        # the watcher applies the modification and the creation
+        index.record(modified, fingerprint(modified))
+        write_file(workspace, "recreated", "three")
+        index.record(recreated, fingerprint(recreated))
+        gate.set()
+        thread.join(5)
+
+        report = reconciler.get_report()
+        assert report["status"] == "done"
+        assert (report["modified"], report["removed"], report["skipped"]) == (1, 1, 2)
+        assert handler.synced == [] and handler.removed == []
+        assert index.get(recreated) is not None
+    finally:
+        gate.set()
+        handler.worker_pool.stop()
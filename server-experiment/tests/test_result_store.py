@@ -0,0 +1,79 @@
+import json
+import os
+
+from services.datasets import ResultStore
+
+
+def entry_of_size(size, **fields):
+    """An entry whose JSON encoding is exactly size bytes."""
+    entry = {"results": {}, **fields, "pad": ""}
+    entry["pad"] = "x" * (size - len(json.dumps(entry).encode("utf-8")))
+    return entry
+
+
+def test_key_depends_on_every_input(tmp_path):
+    store_key = ResultStore(str(tmp_path)).key
+    key = store_key("sha", "a", ["sum", "max"], "1")
+    assert key == store_key("sha", "a", ("sum", "max"), "1")
+    others = [
+        store_key("sha2", "a", ["sum", "max"], "1"),
+        store_key("sha", "b", ["sum", "max"], "1"),
+        store_key("sha", "a", ["max", "sum"], "1"),
+        store_key("sha", "a", ["sum"], "1"),
+        store_key("sha", "a", ["sum", "max"], "2"),
+    ]
+    assert len({key, *others}) == 6
+
+
+def test_stored_results_are_hits(tmp_path):
+    store = ResultStore(str(tmp_path))
+    assert store.get("k") is None
+    store.put("k", {"results": {"sum": 3}, "compute_seconds": 1.5})
+
+    assert store.get("k") == {"results": {"sum": 3}, "compute_seconds": 1.5}
+    stats = store.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"], stats["saved_seconds"]) == (1, 1, 0.5, 1.5)
+    assert stats["entries"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_beyond_the_bound(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=300)
+    for key in ("a", "b", "c"):
+        store.put(key, entry_of_size(100))
+    assert store.get("a") is not None
+
+    store.put("d", entry_of_size(100))
+
+    assert store.get("b") is None
+    assert all(store.get(key) is not None for key in ("a", "c", "d"))
+    stats = store.get_stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (3, 300, 1)
+    assert sorted(path.stem for path in tmp_path.glob("*.json")) == ["a", "c", "d"]
+
+
+def test_entry_larger_than_the_store_is_not_stored(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=100)
+    store.put("a", entry_of_size(50))
+    store.put("big", entry_of_size(101))
+    assert store.get("big") is None and store.get("a") is not None
+
+
+def test_recency_survives_a_restart(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=300)
+    for age, key in enumerate(("c", "b", "a")):
+        store.put(key, entry_of_size(100))
+        # c was used last, a least recently
+        os.utime(tmp_path / f"{key}.json", (1000 - age, 1000 - age))
+
+    restarted = ResultStore(str(tmp_path), max_bytes=300)
+    assert restarted.get_stats()["bytes"] == 300
+    restarted.put("d", entry_of_size(100))
+    assert restarted.get("c") is not None and restarted.get("a") is None
+
+
+def test_entry_removed_from_disk_is_a_miss(tmp_path):
+    store = ResultStore(str(tmp_path))
+    store.put("a", entry_of_size(100))
+    os.remove(tmp_path / "a.json")
+    assert store.get("a") is None
+    assert store.get_stats()["entries"] == 0
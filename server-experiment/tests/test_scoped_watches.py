@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+from watchdog.events import FileSystemEventHandler
+
+from services.file_watcher import ScopedInotifyObserver
+from services.file_watcher.scoped import scoped_watches_supported
+
+pytestmark = pytest.mark.skipif(not scoped_watches_supported(), reason="needs watchdog's inotify wrapper")
+
+
+class Recorder(FileSystemEventHandler):
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        with self._lock:
+            self.events.append((event.event_type, event.src_path, getattr(event, "dest_path", "")))
+
+    def wait_for(self, expected, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if expected <= set(self.events):
+                    return True
+            time.sleep(0.02)
+        return False
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    workspace = tmp_path / "workspace"
+    for user in ("alice", ".trash"):
+        (workspace / user / "experiments").mkdir(parents=True)
+        (workspace / user / "results").mkdir(parents=True)
+    return workspace
+
+
+@pytest.fixture
+def observe(workspace):
+    observers = []
+
+    def observe(shard=0, shards=1):
+        recorder = Recorder()
+        observer = ScopedInotifyObserver(shard, shards)
+        observer.schedule(recorder, str(workspace), recursive=False)
+        observer.start()
+        observers.append(observer)
+        return observer, recorder
+
+    yield observe
+    for observer in observers:
+        observer.stop()
+        observer.join()
+
+
+def test_only_xxp_files_of_experiments_and_workflows_are_reported(workspace, observe):
+    observer, recorder = observe()
+    experiment = workspace / "alice" / "experiments" / "exp.xxp"
+    experiment.write_text("experiment exp { }\n", encoding="utf-8")
+    (workspace / "alice" / "experiments" / "notes.txt").write_text("notes", encoding="utf-8")
+    (workspace / "alice" / "results" / "run.xxp").write_text("", encoding="utf-8")
+    experiment.rename(workspace / "alice" / "experiments" / "renamed.xxp")
+
+    assert recorder.wait_for({
+        ("created", str(experiment), ""),
+        ("moved", str(experiment), str(workspace / "alice" / "experiments" / "renamed.xxp")),
+    })
+    assert {path for _, path, _ in recorder.events} == {str(experiment)}
+    assert observer.get_stats()[0]["users"] == 1
+
+
+def test_hidden_directories_are_not_users(workspace, observe):
+    _, recorder = observe()
+    (workspace / ".trash" / "experiments" / "old.xxp").write_text("", encoding="utf-8")
+    (workspace / ".cache" / "experiments").mkdir(parents=True)
+    (workspace / ".cache" / "experiments" / "cached.xxp").write_text("", encoding="utf-8")
+    marker = workspace / "alice" / "experiments" / "marker.xxp"
+    marker.write_text("", encoding="utf-8")
+
+    assert recorder.wait_for({("created", str(marker), "")})
+    assert {path for _, path, _ in recorder.events} == {str(marker)}
+
+
+def test_new_user_directories_are_watched(workspace, observe):
+    _, recorder = observe()
+    (workspace / "bob" / "workflows").mkdir(parents=True)
+    time.sleep(0.2)
+    workflow = workspace / "bob" / "workflows" / "wf.xxp"
+    workflow.write_text("workflow wf { }\n", encoding="utf-8")
+
+    assert recorder.wait_for({("created", str(workflow), "")})
+
+
+def test_users_are_split_between_shards(workspace, observe):
+    (workspace / "bob" / "experiments").mkdir(parents=True)
+    observers = [observe(shard, 2)[0] for shard in range(2)]
+
+    def users():
+        return sum(observer.get_stats()[0]["users"] for observer in observers)
+
+    deadline = time.time() + 5
+    while users() < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.1)
+    assert users() == 2
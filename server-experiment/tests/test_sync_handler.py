@@ -0,0 +1,135 @@
+import itertools
+
+from watchdog.events import FileDeletedEvent, FileMovedEvent
+
+from services.file_watcher import ContentIndex, FileChange, FileSystemSyncHandler, event_registry, get_event_registry_stats, register_api_event
+from services.file_watcher.coalescer import CREATED, MODIFIED, RENAMED
+
+
+class FakeExperimentHandler:
+    """Experiments by id, with the bulk write operations as plain tuples."""
+
+    def __init__(self):
+        self.experiments = {}
+        self.fail = False
+        self._ids = itertools.count()
+
+    def new_experiment_id(self, username):
+        return f"{username}-{next(self._ids)}"
+
+    def find_experiment_id(self, username, name):
+        return next((id_ for id_, exp in self.experiments.items() if exp["name"] == name), None)
+
+    def find_experiment_ids(self, username, names):
+        return {exp["name"]: id_ for id_, exp in self.experiments.items() if exp["name"] in names}
+
+    def upsert_experiment_operation(self, username, name, steps, experiment_id=None):
+        return ("upsert", experiment_id, name, steps)
+
+    def rename_experiment_operation(self, username, old_name, new_name, experiment_id=None):
+        return ("rename", experiment_id, new_name, None)
+
+    def bulk_write_experiments(self, operations):
+        if self.fail:
+            raise RuntimeError("write failed")
+        for kind, experiment_id, name, steps in operations:
+            if kind == "upsert":
+                self.experiments.setdefault(experiment_id, {})["steps"] = steps
+            self.experiments.setdefault(experiment_id, {})["name"] = name
+
+
+class FakeConvertor:
+    def dsl2experiment(self, name, content):
+        return [content.strip()]
+
+
+def make_handler(content_index=None):
+    return FileSystemSyncHandler(FakeExperimentHandler(), None, None, FakeConvertor(), debounce_seconds=0,
+                                 content_index=content_index, write_window_seconds=0)
+
+
+def write_file(workspace, name, content):
+    path = workspace / "alice" / "experiments" / f"{name}.xxp"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_created_entry_keeps_the_remembered_id(tmp_path):
+    handler = make_handler()
+    path = write_file(tmp_path, "exp", "one")
+    handler._apply_change(FileChange(CREATED, path))
+    write_file(tmp_path, "exp", "two")
+    handler._apply_change(FileChange(MODIFIED, path))
+
+    experiments = handler.experiment_handler.experiments
+    assert list(experiments) == ["alice-0"]
+    assert experiments["alice-0"]["steps"] == ["two"]
+    assert handler._document_ids[path] == "alice-0"
+
+
+def test_existing_entry_is_written_by_its_id(tmp_path):
+    handler = make_handler()
+    handler.experiment_handler.experiments["alice-api"] = {"name": "exp", "steps": []}
+    path = write_file(tmp_path, "exp", "one")
+    handler._apply_change(FileChange(MODIFIED, path))
+
+    assert list(handler.experiment_handler.experiments) == ["alice-api"]
+    assert handler._document_ids[path] == "alice-api"
+
+
+def test_content_index_is_moved_only_once_the_rename_is_written(tmp_path):
+    index = ContentIndex(str(tmp_path / "index.db"))
+    handler = make_handler(index)
+    old_path = write_file(tmp_path, "old", "one")
+    handler._apply_change(FileChange(CREATED, old_path))
+    assert index.get(old_path) is not None
+
+    new_path = str(tmp_path / "alice" / "experiments" / "new.xxp")
+    (tmp_path / "alice" / "experiments" / "old.xxp").rename(new_path)
+    handler.experiment_handler.fail = True
+    handler._apply_change(FileChange(RENAMED, new_path, old_path))
+    assert index.get(old_path) is not None and index.get(new_path) is None
+
+    handler.experiment_handler.fail = False
+    handler._apply_change(FileChange(RENAMED, new_path, old_path))
+    assert index.get(old_path) is None and index.get(new_path) is not None
+
+
+def test_applied_change_is_not_checked_against_the_registry_again(tmp_path):
+    handler = make_handler()
+    path = write_file(tmp_path, "exp", "one")
+    before = get_event_registry_stats()
+    handler._apply_change(FileChange(MODIFIED, path))
+    assert get_event_registry_stats() == before
+
+
+def test_api_deletion_forgets_the_indexed_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_registry, "_expected_writes", {})
+    index = ContentIndex(str(tmp_path / "index.db"))
+    handler = make_handler(index)
+    path = write_file(tmp_path, "exp", "one")
+    handler._apply_change(FileChange(CREATED, path))
+
+    register_api_event('delete', "alice", "experiments", "exp")
+    (tmp_path / "alice" / "experiments" / "exp.xxp").unlink()
+    handler.on_deleted(FileDeletedEvent(path))
+
+    assert index.get(path) is None and path not in handler._document_ids
+
+
+def test_api_rename_moves_the_indexed_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_registry, "_expected_writes", {})
+    index = ContentIndex(str(tmp_path / "index.db"))
+    handler = make_handler(index)
+    old_path = write_file(tmp_path, "old", "one")
+    handler._apply_change(FileChange(CREATED, old_path))
+    fingerprint = index.get(old_path)
+
+    register_api_event('rename', "alice", "experiments", "old", content="one", new_file_name="new")
+    new_path = str(tmp_path / "alice" / "experiments" / "new.xxp")
+    (tmp_path / "alice" / "experiments" / "old.xxp").rename(new_path)
+    handler.on_moved(FileMovedEvent(old_path, new_path))
+
+    assert index.get(old_path) is None and index.get(new_path) == fingerprint
+    assert handler._document_ids[new_path] == "alice-0"
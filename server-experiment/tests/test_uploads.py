@@ -0,0 +1,61 @@
+import hashlib
+import io
+
+import pytest
+
+from services.datasets import ColumnCache, DatasetRegistry, UploadConflict, UploadError, UploadManager
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    return UploadManager(str(data_path), DatasetRegistry(str(data_path)), ColumnCache(str(data_path)))
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def upload_chunks(uploads, name, chunks, checksum=None):
+    data = b"".join(chunks)
+    upload = uploads.create(name, len(data), checksum or sha256(data))
+    offset = 0
+    for chunk in chunks:
+        uploads.write_chunk(upload["id"], offset, io.BytesIO(chunk), len(chunk), sha256(chunk))
+        offset += len(chunk)
+    return upload
+
+
+def test_indexed_upload_registers_the_schema_and_columns(uploads):
+    upload = upload_chunks(uploads, "values.csv", [b"a,b\n1,x\n2,", b"y\n3,z\n"])
+    entry = uploads.complete(upload["id"])
+    assert entry["rows"] == 3
+    assert entry["checksum"] == sha256(b"a,b\n1,x\n2,y\n3,z\n")
+    assert list(uploads.column_cache.get_column("values.csv", "a")) == [1, 2, 3]
+
+
+def test_checksum_covers_the_chunks_after_parsing_stopped(uploads):
+    data = b'a,b\n1,"x\ny"\n2,z\n3,w\n'
+    # inside the quoted value, after its newline: the first chunk cannot be parsed
+    split = data.index(b"\ny") + 1
+    upload = upload_chunks(uploads, "quoted.csv", [data[:split], data[split:]])
+    entry = uploads.complete(upload["id"])
+    assert entry["checksum"] == sha256(data)
+    assert (uploads.data_path / "quoted.csv").read_bytes() == data
+
+
+def test_file_with_another_checksum_is_rejected(uploads):
+    upload = upload_chunks(uploads, "values.csv", [b"a\n1\n"], checksum=sha256(b"a\n2\n"))
+    with pytest.raises(UploadError):
+        uploads.complete(upload["id"])
+    assert not (uploads.data_path / "values.csv").exists()
+
+
+def test_chunk_must_continue_the_upload(uploads):
+    upload = uploads.create("values.csv", 8)
+    with pytest.raises(UploadConflict):
+        uploads.write_chunk(upload["id"], 4, io.BytesIO(b"1\n2\n"), 4, sha256(b"1\n2\n"))
+    with pytest.raises(UploadError):
+        uploads.write_chunk(upload["id"], 0, io.BytesIO(b"a\n1\n"), 4, sha256(b"other"))
+    assert uploads.get(upload["id"])["received"] == 0
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from services.file_watcher import KeyedWorkerPool
+
+
+def test_items_of_a_key_are_processed_in_order():
+    processed = []
+    lock = threading.Lock()
+
+    def process(item):
+        time.sleep(0.001)
+        with lock:
+            processed.append(item)
+
+    pool = KeyedWorkerPool(process, workers=4)
+    pool.start()
+    try:
+        for index in range(200):
+            pool.submit([f"file{index % 5}"], (index % 5, index))
+        assert pool.join(10)
+    finally:
+        pool.stop()
+    for key in range(5):
+        items = [index for item_key, index in processed if item_key == key]
+        assert items == sorted(items) and len(items) == 40
+
+
+def test_an_item_with_several_keys_waits_for_each_of_them():
+    events = []
+    gate = threading.Event()
+
+    def process(item):
+        if item == "a1":
+            gate.wait(5)
+        events.append(item)
+
+    pool = KeyedWorkerPool(process, workers=3)
+    pool.start()
+    try:
+        pool.submit(["a"], "a1")
+        pool.submit(["b"], "b1")
+        pool.submit(["a", "b"], "rename")
+        pool.submit(["b"], "b2")
+        pool.submit(["c"], "c1")
+        deadline = time.time() + 5
+        while "c1" not in events and time.time() < deadline:
+            time.sleep(0.01)
+        # only a1 blocks, the items of other keys not held by it are processed
+        assert set(events) == {"b1", "c1"}
+        gate.set()
+        assert pool.join(5)
+    finally:
+        pool.stop()
+    assert events.index("a1") < events.index("rename") < events.index("b2")
+
+
+def test_items_are_processed_on_the_caller_thread_before_start():
+    processed = []
+    pool = KeyedWorkerPool(lambda item: processed.append((item, threading.current_thread())), workers=2)
+    pool.submit(["a"], 1)
+    assert processed == [(1, threading.current_thread())]
+    assert pool.get_stats()["processed"] == 1
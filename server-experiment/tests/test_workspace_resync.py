@@ -0,0 +1,70 @@
+import threading
+import time
+
+from services.file_watcher import FileSystemWatcher, KeyedWorkerPool
+
+
+class FakeSyncHandler:
+    def __init__(self, gate):
+        self.gate = gate
+        self.synced = []
+        self.worker_pool = KeyedWorkerPool(lambda item: None, workers=2)
+        self.worker_pool.start()
+
+    def sync_files(self, file_paths):
+        self.gate.wait(5)
+        self.synced.append(sorted(str(path) for path in file_paths))
+        return [{"path": str(path), "success": not path.stem.startswith("bad"), "error": None} for path in file_paths]
+
+
+def make_watcher(tmp_path, gate):
+    for name in ("exp.xxp", "bad.xxp"):
+        (tmp_path / "alice" / "experiments").mkdir(parents=True, exist_ok=True)
+        (tmp_path / "alice" / "experiments" / name).write_text("", encoding="utf-8")
+    watcher = FileSystemWatcher(str(tmp_path), None, None, None, None)
+    watcher.event_handler = FakeSyncHandler(gate)
+    return watcher
+
+
+def wait_for_status(watcher, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resync = watcher.get_resync("alice")
+        if resync and resync["status"] == status:
+            return resync
+        time.sleep(0.01)
+    return watcher.get_resync("alice")
+
+
+def test_resync_runs_on_the_worker_pool(tmp_path):
+    gate = threading.Event()
+    watcher = make_watcher(tmp_path, gate)
+    try:
+        assert watcher.get_resync("alice") is None
+        resync = watcher.submit_resync("alice")
+        assert resync["status"] == "queued"
+        assert wait_for_status(watcher, "running")["finished_at"] is None
+
+        # a second request while the first one runs gets the running one
+        assert watcher.submit_resync("alice")["status"] == "running"
+        gate.set()
+        resync = wait_for_status(watcher, "done")
+        assert resync["files"] == 2 and resync["synced"] == 1
+        assert [failed["path"] for failed in resync["failed"]] == [str(tmp_path / "alice" / "experiments" / "bad.xxp")]
+        assert len(watcher.event_handler.synced) == 1
+    finally:
+        gate.set()
+        watcher.event_handler.worker_pool.stop()
+
+
+def test_failed_resync_reports_the_error(tmp_path):
+    gate = threading.Event()
+    gate.set()
+    watcher = make_watcher(tmp_path, gate)
+    watcher.event_handler.sync_files = lambda file_paths: 1 / 0
+    try:
+        watcher.submit_resync("alice")
+        resync = wait_for_status(watcher, "failed")
+        assert resync["status"] == "failed" and "division" in resync["error"]
+    finally:
+        watcher.event_handler.worker_pool.stop()
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from services.file_watcher import WriteBatcher
+
+
+class BulkWriteError(Exception):
+    """Like pymongo's: details hold the index of the operation that failed."""
+
+    def __init__(self, index):
+        super().__init__(f"write error at {index}")
+        self.details = {"writeErrors": [{"index": index}]}
+
+
+class Collection:
+    def __init__(self, rejected=(), down=False):
+        self.rejected = set(rejected)
+        self.down = down
+        self.applied = []
+        self.bulk_writes = []
+
+    def write(self, target, operations):
+        self.bulk_writes.append(list(operations))
+        if self.down:
+            raise ConnectionError("no connection")
+        for index, operation in enumerate(operations):
+            if operation in self.rejected:
+                raise BulkWriteError(index)
+            self.applied.append(operation)
+
+
+def submit_all(batcher, operations):
+    results = {}
+    with batcher.holding():
+        for operation in operations:
+            batcher.submit("experiments", operation, [operation],
+                           on_done=lambda success, operation=operation: results.__setitem__(operation, success))
+    return results
+
+
+def test_operations_after_a_failed_one_are_written():
+    collection = Collection(rejected={3})
+    results = submit_all(WriteBatcher(collection.write, window_seconds=0), range(8))
+    assert collection.applied == [0, 1, 2, 4, 5, 6, 7]
+    assert results == {operation: operation != 3 for operation in range(8)}
+
+
+def test_operations_fail_when_the_bulk_write_fails_as_a_whole():
+    collection = Collection(down=True)
+    batcher = WriteBatcher(collection.write, window_seconds=0)
+    results = submit_all(batcher, range(4))
+    assert results == {operation: False for operation in range(4)}
+    assert len(collection.bulk_writes) == 1
+    assert batcher.get_stats()["failed"] == 4
+
+
+@pytest.mark.parametrize("max_batch", [1, 3, 10])
+def test_operations_queued_during_a_write_are_written_in_batches_of_up_to_max_batch(max_batch):
+    gate = threading.Event()
+    collection = Collection()
+
+    def write(target, operations):
+        gate.wait(5)
+        collection.write(target, operations)
+
+    batcher = WriteBatcher(write, window_seconds=0, max_batch=max_batch)
+    first = threading.Thread(target=batcher.submit, args=("experiments", -1))
+    first.start()
+    with batcher.holding():
+        # queued while the first write holds the write lock
+        threads = [threading.Thread(target=batcher.submit, args=("experiments", operation)) for operation in range(20)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while batcher.get_stats()["pending"] < 20 and time.time() < deadline:
+            time.sleep(0.01)
+        gate.set()
+        for thread in [first, *threads]:
+            thread.join(5)
+    assert sorted(collection.applied) == list(range(-1, 20))
+    assert max(len(operations) for operations in collection.bulk_writes) <= max_batch